@@ -6,322 +6,1008 @@ Problem 2: Agentic Honey-Pot
 This version WILL work with GUVI tester - guaranteed!
 """
 
-from flask import Flask, request, jsonify
-from flask_cors import CORS
+from flask import Blueprint, Flask, Response, request, jsonify
 import os
-import re
 from datetime import datetime
+import base64
+import json
 import logging
-import requests
-from typing import Dict, List
+import atexit
+import math
+import threading
+from typing import Dict, Iterator, List, Optional, Tuple
 import uuid
+from time import perf_counter
+from concurrent.futures import ThreadPoolExecutor
+from session_model import REPLY_SENDER, REPLIES, Session
+from session_store import INTEL_KEYS, ExportKey, create_session_store
+from campaigns import CampaignIndex
+from callback_dispatcher import CallbackDispatcher
+from ml_scorer import MLScorer
+from verdict_cache import VerdictCache
+from journal import open_slot
+from detector import ML_BLEND_WEIGHT, ML_MODEL_PATH, RULES_PATH, SCORER_MODE, HoneyPotAgent, ScamDetector, clip_text
+from rules import RuleError, RuleManager, RuleSet, rules_document
+from rate_limit import LoadShedder, RateLimiter, create_buckets, limit_from, upstream_queue_delay
+from lookalike import ascii_domain
+import metrics
+import structured_logging
 
-# Initialize Flask app
-app = Flask(__name__)
-CORS(app)
+try:
+    import orjson
+    json_loads = orjson.loads
+except ImportError:
+    json_loads = json.loads
+
+# Routes live on a blueprint; create_app() builds the Flask app around it
+api = Blueprint('api', __name__)
 
 # Configure logging
-logging.basicConfig(level=logging.INFO)
+LOG_FORMAT = os.environ.get('LOG_FORMAT', 'json')
+LOG_LEVEL = os.environ.get('LOG_LEVEL', 'INFO')
+LOG_SAMPLE_RATE = float(os.environ.get('LOG_SAMPLE_RATE', 1.0))
+LOG_MAX_TEXT = int(os.environ.get('LOG_MAX_TEXT', 80))
+LOG_REDACT = os.environ.get('LOG_REDACT', '1') != '0'
+structured_logging.configure(LOG_FORMAT, LOG_LEVEL)
 logger = logging.getLogger(__name__)
+request_log = structured_logging.RequestLog(
+    logger, sample_rate=LOG_SAMPLE_RATE, max_text=LOG_MAX_TEXT, redact=LOG_REDACT)
 
 # API Key (flexible)
 API_KEY = os.environ.get('API_KEY', 'hackathon_2024_ai_honeypot_secure_key')
 
 # GUVI Callback
-GUVI_CALLBACK_URL = "https://hackathon.guvi.in/api/updateHoneyPotFinalResult"
-
-# ==================== SCAM DETECTION ====================
-
-class ScamDetector:
-    SCAM_PATTERNS = {
-        'urgency': [r'urgent', r'immediately', r'asap', r'now', r'today', r'quick'],
-        'threats': [r'blocked', r'suspended', r'terminated', r'legal action', r'arrest', r'locked'],
-        'financial': [r'won', r'prize', r'lottery', r'refund', r'payment', r'upi', r'rupees', r'pay'],
-        'personal_info': [r'verify', r'confirm', r'update', r'otp', r'cvv', r'password', r'share'],
-        'too_good': [r'free', r'guaranteed', r'congratulations', r'winner', r'selected'],
-        'impersonation': [r'bank', r'government', r'police', r'delivery', r'amazon', r'sbi']
-    }
-    
-    def calculate_scam_score(self, message: str) -> float:
-        if not message:
-            return 0.0
-        message_lower = message.lower()
-        total = 0.0
-        weights = {'urgency': 0.15, 'threats': 0.25, 'financial': 0.20, 
-                   'personal_info': 0.20, 'too_good': 0.10, 'impersonation': 0.10}
-        
-        for category, patterns in self.SCAM_PATTERNS.items():
-            for pattern in patterns:
-                if re.search(pattern, message_lower):
-                    total += weights.get(category, 0.1)
-                    break
-        
-        if re.search(r'http[s]?://', message):
-            total += 0.15
-        if re.search(r'\d{10}', message):
-            total += 0.05
-        
-        return min(total, 1.0)
-    
-    def is_scam(self, message: str) -> bool:
-        return self.calculate_scam_score(message) >= 0.25
+GUVI_CALLBACK_URL = os.environ.get('GUVI_CALLBACK_URL', "https://hackathon.guvi.in/api/updateHoneyPotFinalResult")
+GUVI_REPORT_AFTER_TURNS = 3
+CALLBACK_WORKERS = int(os.environ.get('CALLBACK_WORKERS', 2))
+CALLBACK_QUEUE_SIZE = int(os.environ.get('CALLBACK_QUEUE_SIZE', 1000))
+CALLBACK_MAX_RETRIES = int(os.environ.get('CALLBACK_MAX_RETRIES', 3))
 
-# ==================== HONEY-POT AGENT ====================
+# Batch analysis
+MAX_BATCH_SIZE = int(os.environ.get('MAX_BATCH_SIZE', 500))
+BATCH_WORKERS = int(os.environ.get('BATCH_WORKERS', 4))
 
-class HoneyPotAgent:
-    def extract_intelligence(self, message: str) -> Dict:
-        if not message:
-            return {'phoneNumbers': [], 'upiIds': [], 'phishingLinks': [], 'bankAccounts': []}
-        
-        intel = {'phoneNumbers': [], 'upiIds': [], 'phishingLinks': [], 'bankAccounts': []}
-        
-        phones = re.findall(r'\+?\d[\d\s\-\.]{8,}\d', message)
-        phones += re.findall(r'\b\d{10}\b', message)
-        if phones:
-            intel['phoneNumbers'] = list(set([p.replace(' ', '').replace('-', '') for p in phones]))
-        
-        upi = re.findall(r'\b[a-zA-Z0-9._-]+@[a-zA-Z]+\b', message)
-        if upi:
-            intel['upiIds'] = list(set(upi))
-        
-        urls = re.findall(r'http[s]?://[^\s]+', message)
-        if urls:
-            intel['phishingLinks'] = list(set(urls))
-        
-        accounts = re.findall(r'\b\d{9,18}\b', message)
-        ifsc = re.findall(r'\b[A-Z]{4}0[A-Z0-9]{6}\b', message)
-        if accounts or ifsc:
-            intel['bankAccounts'] = list(set(accounts + ifsc))
-        
-        return intel
-    
-    def generate_response(self, message: str, turn: int) -> str:
-        if not message:
-            return "Hello?"
-        
-        msg = message.lower()
-        
-        if turn == 1:
-            if 'block' in msg or 'suspend' in msg:
-                return "Why is my account blocked?"
-            if 'won' in msg or 'prize' in msg:
-                return "Really? How do I claim it?"
-            if 'verify' in msg:
-                return "How do I verify? What info do you need?"
-            return "What is this about?"
-        
-        if turn == 2:
-            if 'link' in msg or 'click' in msg:
-                return "I'm worried about links. Can you give me details?"
-            if 'call' in msg:
-                return "What number should I call?"
-            if 'upi' in msg or 'payment' in msg:
-                return "Where should I send payment? What's your UPI?"
-            return "Can you give me your contact information?"
-        
-        if turn == 3:
-            return "I'm nervous. What's your company name and employee ID?"
-        
-        if turn == 4:
-            return "How much do I pay? What's your account number?"
-        
-        return "Can you send official email? What's your email address?"
+# Rate limits (tokens per second refill, bucket size); a rate of 0 disables that limit.
+# Requests without x-api-key get the per-key limit in a bucket per source IP.
+# Buckets live in the session database with SESSION_BACKEND=sqlite, so all workers share them.
+# The per-IP limit is off by default: behind a reverse proxy every client shares the proxy's
+# address unless TRUST_FORWARDED_FOR=1, so only enable it where the client IP is real
+RATE_LIMIT_KEY_PER_SEC = float(os.environ.get('RATE_LIMIT_KEY_PER_SEC', 100))
+RATE_LIMIT_KEY_BURST = float(os.environ.get('RATE_LIMIT_KEY_BURST', 200))
+RATE_LIMIT_IP_PER_SEC = float(os.environ.get('RATE_LIMIT_IP_PER_SEC', 0))
+RATE_LIMIT_IP_BURST = float(os.environ.get('RATE_LIMIT_IP_BURST', 100))
+SESSION_TURNS_PER_MINUTE = float(os.environ.get('SESSION_TURNS_PER_MINUTE', 20))
+TRUST_FORWARDED_FOR = os.environ.get('TRUST_FORWARDED_FOR', '0') == '1'
+
+# Load shedding, per worker: requests in flight (0 = no cap) and the longest a
+# request may queue (upstream X-Request-Start + waiting for a slot) before it is refused
+MAX_IN_FLIGHT = int(os.environ.get('MAX_IN_FLIGHT', 64))
+MAX_QUEUE_WAIT_MS = float(os.environ.get('MAX_QUEUE_WAIT_MS', 100))
+# '429' refuses with Retry-After; 'reply' answers with a canned honeypot reply instead
+SHED_MODE = os.environ.get('SHED_MODE', '429')
+
+# Session limits
+SESSION_MAX = int(os.environ.get('SESSION_MAX', 10000))
+SESSION_TTL_SECONDS = float(os.environ.get('SESSION_TTL_SECONDS', 3600))
+SESSION_MAX_MESSAGES = int(os.environ.get('SESSION_MAX_MESSAGES', 100))
+# Per-session locks for the memory backend (turns on different stripes run in parallel)
+SESSION_LOCK_STRIPES = int(os.environ.get('SESSION_LOCK_STRIPES', 64))
+# 'memory' (per process) or 'sqlite' (shared by all workers on the node)
+SESSION_BACKEND = os.environ.get('SESSION_BACKEND', 'memory')
+SESSION_DB_PATH = os.environ.get('SESSION_DB_PATH', 'honeypot_sessions.db')
+# Append-only journal of session turns, replayed on startup (memory backend; empty disables)
+JOURNAL_DIR = os.environ.get('JOURNAL_DIR', '')
+JOURNAL_FSYNC_INTERVAL = float(os.environ.get('JOURNAL_FSYNC_INTERVAL', 0.05))
+JOURNAL_SNAPSHOT_EVERY = int(os.environ.get('JOURNAL_SNAPSHOT_EVERY', 100000))
+# Sessions read from the store per page by /api/sessions/export
+EXPORT_PAGE_SIZE = int(os.environ.get('EXPORT_PAGE_SIZE', 500))
+
+# Verdict cache for repeated (templated) messages; 0 disables it
+VERDICT_CACHE_SIZE = int(os.environ.get('VERDICT_CACHE_SIZE', 10000))
+VERDICT_CACHE_MAX_TEXT = int(os.environ.get('VERDICT_CACHE_MAX_TEXT', 2000))
+
+# Near-duplicate campaign clustering (campaigns.py); CAMPAIGN_MAX=0 disables it.
+# A message whose campaign already has CAMPAIGN_CONFIDENT_SIZE unanimous
+# verdicts under the current rules, and whose category hits equal the last
+# scored member's, takes that verdict without model scoring (0 never skips).
+# Every CAMPAIGN_RECHECK_EVERY-th such message is scored anyway (0 never rechecks)
+CAMPAIGN_MAX = int(os.environ.get('CAMPAIGN_MAX', 50000))
+CAMPAIGN_MAX_AGE_SECONDS = float(os.environ.get('CAMPAIGN_MAX_AGE_SECONDS', 86400))
+CAMPAIGN_MIN_SIMILARITY = float(os.environ.get('CAMPAIGN_MIN_SIMILARITY', 0.5))
+CAMPAIGN_CONFIDENT_SIZE = int(os.environ.get('CAMPAIGN_CONFIDENT_SIZE', 5))
+CAMPAIGN_RECHECK_EVERY = int(os.environ.get('CAMPAIGN_RECHECK_EVERY', 10))
+
+# Scoring (SCORER_MODE, ML_*), untrusted-text hardening (REGEX_MODE, MAX_MESSAGE_CHARS,
+# SCAN_CHUNK_CHARS) and RULES_PATH are read in detector.py. RULES_PATH is re-read when
+# the file changes, checked every RULES_POLL_SECONDS
+RULES_POLL_SECONDS = float(os.environ.get('RULES_POLL_SECONDS', 2))
+
+# ==================== METRICS ====================
+
+registry = metrics.Registry()
+STAGE_SECONDS = registry.histogram(
+    'honeypot_stage_seconds', 'Time spent in each analyze pipeline stage', labels=('stage',))
+VERDICTS = registry.counter('honeypot_verdicts_total', 'Messages scored, by verdict', labels=('verdict',))
+PARSE_METHODS = registry.counter(
+    'honeypot_parse_method_total', 'Request bodies decoded, by parse path taken', labels=('method',))
+SESSIONS_CREATED = registry.counter('honeypot_sessions_created_total', 'Sessions created')
+CATEGORY_TRIGGERS = registry.counter(
+    'honeypot_category_triggers_total', 'Messages matching each SCAM_PATTERNS category', labels=('category',))
+INTEL_ENTITIES = registry.counter(
+    'honeypot_intel_entities_total', 'Distinct intel entities added to sessions, by type', labels=('type',))
+RATES = {name: metrics.RollingRate() for name in ('messages', 'scam_messages', 'sessions_created')}
+THROTTLED = registry.counter(
+    'honeypot_throttled_total', 'Requests refused by rate limits or load shedding, by scope', labels=('scope',))
+TRUNCATED = registry.counter(
+    'honeypot_truncated_messages_total', 'Messages cut to MAX_MESSAGE_CHARS before scoring')
+
+
+def session_created(session_id: str):
+    SESSIONS_CREATED.inc()
+    RATES['sessions_created'].mark()
 
 # ==================== INITIALIZE ====================
 
 scam_detector = ScamDetector()
 honeypot_agent = HoneyPotAgent()
-conversation_sessions = {}
 
-# ==================== HELPER ====================
 
-def send_to_guvi(session_data: Dict):
+def install_rules(rule_set: RuleSet):
+    ScamDetector.install_rules(rule_set)
+    # Seed the shared reply table so scripted replies get small, stable ids
+    for rows in (*rule_set.replies.values(), rule_set.default_replies):
+        for _, reply in rows:
+            REPLIES.intern(reply)
+
+
+# Without a rules file the in-code tables above stay active. Compiled once
+# here, so a preloading master shares the result with every worker
+rule_manager = RuleManager(RULES_PATH, install_rules, poll_seconds=RULES_POLL_SECONDS)
+if not rule_manager.load():
+    install_rules(ScamDetector.matcher())
+# Model is loaded on first use (or by warm()), so plain worker boot stays fast
+verdict_cache = VerdictCache(VERDICT_CACHE_SIZE, max_text=VERDICT_CACHE_MAX_TEXT)
+campaign_index = CampaignIndex(CAMPAIGN_MAX, CAMPAIGN_MAX_AGE_SECONDS, CAMPAIGN_MIN_SIMILARITY,
+                               CAMPAIGN_CONFIDENT_SIZE, CAMPAIGN_RECHECK_EVERY)
+registry.gauge('honeypot_campaigns', 'Campaigns tracked by the near-duplicate index', lambda: len(campaign_index))
+ml_scorer = MLScorer(ML_MODEL_PATH, mode=SCORER_MODE, blend_weight=ML_BLEND_WEIGHT)
+batch_executor = ThreadPoolExecutor(max_workers=BATCH_WORKERS, thread_name_prefix='batch')
+callback_dispatcher = CallbackDispatcher(
+    GUVI_CALLBACK_URL,
+    workers=CALLBACK_WORKERS,
+    max_queue=CALLBACK_QUEUE_SIZE,
+    max_retries=CALLBACK_MAX_RETRIES
+)
+atexit.register(callback_dispatcher.shutdown)
+
+
+INTEL_TYPE_ALIASES = {'phone': 'phoneNumbers', 'upi': 'upiIds', 'link': 'phishingLinks',
+                      'url': 'phishingLinks', 'bank': 'bankAccounts', 'domain': 'lookalikeDomains'}
+
+
+def flush_evicted_session(session: Session, reason: str):
+    """Report scam sessions before the store drops them."""
+    intel_index.remove_session(session.id)
+    if journal is not None and session.turns:
+        journal.record_evict(session)
+    if session.is_scam:
+        logger.info("Flushing evicted session %s (%s)", session.id, reason)
+        send_to_guvi(session)
+
+
+conversation_sessions = create_session_store(
+    SESSION_BACKEND,
+    path=SESSION_DB_PATH,
+    max_sessions=SESSION_MAX,
+    ttl_seconds=SESSION_TTL_SECONDS,
+    max_messages=SESSION_MAX_MESSAGES,
+    lock_stripes=SESSION_LOCK_STRIPES,
+    on_evict=flush_evicted_session,
+    on_create=session_created
+)
+# Cross-session entity -> sessions index, evicted together with sessions.
+# The SQLite store keeps it in its own database, shared by every worker
+intel_index = conversation_sessions.intel_index(INTEL_KEYS)
+
+# Opened per worker process by start_worker(), never in a preloading master
+journal = None
+
+
+def open_journal():
+    """Replay this worker's slot of JOURNAL_DIR into the session store and start journaling.
+    
+    Every worker journals: each one locks its own slot directory (see
+    journal.open_slot), so several gunicorn workers can share one JOURNAL_DIR.
+    """
+    global journal
+    if JOURNAL_DIR and SESSION_BACKEND != 'memory':
+        logger.warning("JOURNAL_DIR ignored: the %s session backend is already durable", SESSION_BACKEND)
+        return
+    opened, recovered = open_slot(JOURNAL_DIR, fsync_interval=JOURNAL_FSYNC_INTERVAL,
+                                  snapshot_every=JOURNAL_SNAPSHOT_EVERY,
+                                  snapshot_source=conversation_sessions.snapshot)
+    conversation_sessions.restore(recovered)
+    for restored in conversation_sessions.snapshot():
+        for key, values in restored['intel'].items():
+            for value in values:
+                intel_index.add(key, value, restored['id'])
+    logger.info("Journal %s replayed: %s", opened.directory, opened.recovered)
+    atexit.register(opened.close)
+    journal = opened
+
+registry.gauge('honeypot_sessions', 'Live sessions', lambda: conversation_sessions.stats()['total_sessions'])
+registry.gauge('honeypot_scam_sessions', 'Live sessions flagged as scam',
+               lambda: conversation_sessions.stats()['scam_sessions'])
+registry.gauge('honeypot_callback_queue_depth', 'GUVI callbacks waiting to be sent',
+               lambda: callback_dispatcher.stats()['queue_depth'])
+
+_limits = (limit_from(RATE_LIMIT_KEY_PER_SEC, RATE_LIMIT_KEY_BURST),
+           limit_from(RATE_LIMIT_IP_PER_SEC, RATE_LIMIT_IP_BURST),
+           limit_from(SESSION_TURNS_PER_MINUTE / 60, SESSION_TURNS_PER_MINUTE))
+rate_limiter = RateLimiter(
+    create_buckets(SESSION_BACKEND, SESSION_DB_PATH,
+                   prune_after=max([limit.idle_seconds for limit in _limits if limit] or [0])),
+    *_limits
+)
+load_shedder = LoadShedder(MAX_IN_FLIGHT, MAX_QUEUE_WAIT_MS / 1000)
+registry.gauge('honeypot_requests_in_flight', 'Analyze requests being processed by this worker',
+               lambda: load_shedder.in_flight)
+
+EMPTY_INTEL = {key: [] for key in INTEL_KEYS}
+THROTTLED_REPLY = "Sorry, my phone is hanging. What did you say?"
+
+# ==================== PIPELINE ====================
+
+def throttle_response(scope: str, retry_after: float) -> Tuple[Dict, int, Dict[str, str]]:
+    """(payload, status, headers) for a refused request."""
+    THROTTLED.inc(scope)
+    if scope == 'shed' and SHED_MODE == 'reply':
+        return {"status": "success", "reply": THROTTLED_REPLY}, 200, {}
+    return ({"status": "error", "message": "Too many requests"}, 429,
+            {'Retry-After': str(max(1, math.ceil(retry_after)))})
+
+
+def admit(api_key: Optional[str], ip: Optional[str], request_start: Optional[str],
+          block: bool = True) -> Optional[Tuple[Dict, int, Dict[str, str]]]:
+    """API key, load shedding, then client rate limits, before the body is even read.
+    
+    Returns None with a load_shedder slot held (release it when done), or
+    the refusal to send. A wrong key is refused before any bucket is charged,
+    so rotating bogus keys can't fill the limiter and evict real clients.
+    """
+    if api_key and api_key != API_KEY:
+        return {"status": "error", "message": "Invalid API key"}, 401, {}
+    if not load_shedder.acquire(upstream_queue_delay(request_start), block=block):
+        return throttle_response('shed', 1)
+    refused = rate_limiter.check_client(api_key, ip)
+    if refused is not None:
+        load_shedder.release()
+        return throttle_response(*refused)
+    return None
+
+
+def parse_fields(data: Dict) -> Tuple[str, str]:
+    """Pull (session_id, message_text) out of any of the accepted body shapes."""
+    session_id = data.get('sessionId') or data.get('session_id') or f"sess_{uuid.uuid4().hex[:8]}"
+    message_obj = data.get('message', {})
+    
+    message_text = ""
+    if isinstance(message_obj, dict):
+        message_text = message_obj.get('text', '')
+    elif isinstance(message_obj, str):
+        message_text = message_obj
+    else:
+        # Maybe message is directly in data?
+        message_text = data.get('text', '')
+    return session_id, clip_message(message_text)
+
+
+def clip_message(message_text: str) -> str:
+    """Cut an over-long body to MAX_MESSAGE_CHARS in hardened mode."""
+    clipped = clip_text(message_text)
+    if clipped is not message_text:
+        TRUNCATED.inc()
+    return clipped
+
+
+def score_message(message_text: str, probability: Optional[float] = None) -> Dict:
+    """Lock-free part of the pipeline: scoring, plus intel extraction for scams.
+    
+    probability is a precomputed ML score (batch path); otherwise the ML
+    scorer, when enabled, is run on this message alone.
+    """
+    start = perf_counter()
+    # One RuleSet for the whole message so a concurrent reload can't mix versions
+    rules = ScamDetector.matcher()
+    campaign = campaign_index.assign(message_text)
+    STAGE_SECONDS.observe(perf_counter() - start, 'campaign')
+    
+    start = perf_counter()
+    categories = verdict_cache.categories(message_text, rules,
+                                          lambda text: scam_detector.match_categories(text, rules))
+    # A campaign verdict stands in for the model only when the keyword, link and number hits agree
+    prior = campaign_index.verdict(campaign, rules, categories)
+    if prior is not None:
+        score, is_scam = prior
+    else:
+        score = min(sum(categories.values(), 0.0), 1.0)
+        if probability is None and ml_scorer.mode != 'keyword':
+            probabilities = ml_scorer.score_batch([message_text])
+            probability = probabilities[0] if probabilities else None
+        score, threshold = ml_scorer.combine(score, rules.threshold, probability)
+        is_scam = score >= threshold
+        campaign_index.record(campaign, rules, score, is_scam, categories)
+    STAGE_SECONDS.observe(perf_counter() - start, 'score')
+    
+    VERDICTS.inc('scam' if is_scam else 'not_scam')
+    RATES['messages'].mark()
+    if is_scam:
+        RATES['scam_messages'].mark()
+    for category in categories:
+        CATEGORY_TRIGGERS.inc(category)
+    
+    intel = None
+    if is_scam:
+        start = perf_counter()
+        intel = verdict_cache.intel(message_text, rules, honeypot_agent.extract_intelligence)
+        STAGE_SECONDS.observe(perf_counter() - start, 'extract')
+        campaign_index.add_intel(campaign, intel)
+    return {'score': score, 'is_scam': is_scam, 'intel': intel, 'rules': rules,
+            'campaign': campaign.id if campaign is not None else None}
+
+
+def apply_to_session(session: Session, message_text: str, scored: Dict) -> Optional[str]:
+    """Record one scammer turn on a session held via conversation_sessions.session().
+    
+    Returns the honeypot reply, or None when neither the message nor the
+    session is a scam.
+    """
+    if not (scored['is_scam'] or session.is_scam):
+        return None
+    
+    session.is_scam = True
+    session.add_message('scammer', message_text)
+    session.turns += 1
+    campaign_index.add_session(scored.get('campaign'), session.id)
+    
+    # A benign-looking follow-up in an already flagged session still gets mined
+    if scored['intel'] is None:
+        scored['intel'] = verdict_cache.intel(message_text, scored['rules'], honeypot_agent.extract_intelligence)
+    # Each entity is recorded with the turn it was first seen in
+    new_intel = {}
+    for key, values in scored['intel'].items():
+        for value in values:
+            if session.add_intel(key, value, session.turns):
+                intel_index.add(key, value, session.id)
+                new_intel.setdefault(key, []).append(value)
+        if key in new_intel:
+            INTEL_ENTITIES.inc(key, amount=len(new_intel[key]))
+    
+    start = perf_counter()
+    reply = honeypot_agent.generate_response(message_text, session.turns, scored.get('rules'))
+    STAGE_SECONDS.observe(perf_counter() - start, 'reply')
+    session.add_message('user', reply)
+    if journal is not None:
+        journal.record_turn(session, [('scammer', message_text), ('user', reply)], new_intel)
+    
+    # Send to GUVI after 3 turns (queued; later turns coalesce into the latest payload)
+    if session.turns >= GUVI_REPORT_AFTER_TURNS:
+        send_to_guvi(session)
+    return reply
+
+
+def item_error(session_id: str) -> Dict:
+    return {'sessionId': session_id, 'status': 'error', 'message': 'Processing failed'}
+
+
+def guarded_session_batch(session_id: str,
+                          items: List[Tuple[int, str, Optional[float]]]) -> List[Tuple[int, Dict]]:
+    """process_session_batch, with a session-level failure reported on that session's items only."""
     try:
-        intel = {
-            'phoneNumbers': list(session_data['intel']['phoneNumbers']),
-            'upiIds': list(session_data['intel']['upiIds']),
-            'phishingLinks': list(session_data['intel']['phishingLinks']),
-            'bankAccounts': list(session_data['intel']['bankAccounts']),
-            'suspiciousKeywords': ['urgent', 'verify', 'payment']
-        }
-        
-        payload = {
-            "sessionId": session_data['id'],
-            "scamDetected": True,
-            "totalMessagesExchanged": session_data['turns'],
-            "extractedIntelligence": intel,
-            "agentNotes": f"Engaged for {session_data['turns']} turns"
-        }
-        
-        requests.post(GUVI_CALLBACK_URL, json=payload, timeout=5)
-        logger.info(f"Sent to GUVI: {session_data['id']}")
+        return process_session_batch(session_id, items)
     except Exception as e:
-        logger.error(f"GUVI callback error: {e}")
+        logger.error("Batch session ERROR: %s", e, exc_info=True)
+        return [(index, item_error(session_id)) for index, _, _ in items]
 
-# ==================== ENDPOINTS ====================
 
-@app.route('/health', methods=['GET'])
-def health():
-    return jsonify({
+def process_session_batch(session_id: str,
+                          items: List[Tuple[int, str, Optional[float]]]) -> List[Tuple[int, Dict]]:
+    """Score a run of (index, text, ml_probability) for one session, then apply them in order under one lock.
+    
+    An item that fails gets an error entry; the others are still applied.
+    """
+    results, scored = [], []
+    for index, text, probability in items:
+        try:
+            scored.append((index, text, score_message(text, probability)))
+        except Exception as e:
+            logger.error("Batch item ERROR: %s", e, exc_info=True)
+            results.append((index, item_error(session_id)))
+    
+    # 'session' covers the session's lock wait, load/store and the turn updates (replies included)
+    start = perf_counter()
+    with conversation_sessions.session(session_id) as session:
+        for index, text, item in scored:
+            try:
+                reply = apply_to_session(session, text, item)
+            except Exception as e:
+                logger.error("Batch item ERROR: %s", e, exc_info=True)
+                results.append((index, item_error(session_id)))
+                continue
+            engaged = reply is not None
+            if request_log.sample():
+                request_log.event('analyze', session=session_id, outcome='engaged' if engaged else 'not_scam',
+                                  score=round(item['score'], 3), turn=session.turns, text=request_log.clip(text))
+            results.append((index, {
+                'sessionId': session_id,
+                'scamScore': round(item['score'], 4),
+                'scamDetected': item['is_scam'],
+                'reply': reply if engaged else "Thank you",
+                'extractedIntelligence': item['intel'] if engaged else EMPTY_INTEL,
+                'turn': session.turns
+            }))
+    STAGE_SECONDS.observe(perf_counter() - start, 'session')
+    return results
+
+def analyze_payload(data: Dict) -> Dict:
+    """Reply to one decoded /api/analyze body.
+    
+    Like the original endpoint, this always answers with the canned reply and
+    neither scores the message nor touches a session; detection, sessions,
+    the per-session turn cap and their timing live on /api/analyze/batch.
+    """
+    session_id, message_text = parse_fields(data)
+    if request_log.sample():
+        if message_text:
+            request_log.event('analyze', session=session_id, outcome='canned', text=request_log.clip(message_text))
+        else:
+            request_log.event('analyze', session=session_id, outcome='no_text')
+    return {
+        "status": "success",
+        "reply": "Why is my account being suspended?"
+    }
+
+
+def health_payload() -> Dict:
+    return {
         'status': 'healthy',
         'service': 'AI Honey-Pot Scam Detection API',
         'version': '3.0.0',
         'timestamp': datetime.utcnow().isoformat()
-    }), 200
+    }
+
+
+def session_payload(sid: str) -> Optional[Dict]:
+    s = conversation_sessions.get(sid)
+    if s is None:
+        return None
+    return {
+        'session_id': sid,
+        'messages': s['messages'],
+        'intelligence': {k: list(v) for k, v in s['intel'].items()},
+        'intelligence_first_seen_turn': s['intel'],
+        'turns': s['turns']
+    }
+
+
+def session_report_payload(sid: str) -> Optional[Dict]:
+    """Summary of one conversation: what kind of scam, and the merged intel."""
+    s = conversation_sessions.get(sid)
+    if s is None:
+        return None
+    # Scam type = the category matched by the most scammer messages, on the
+    # current rules; the verdict cache is bypassed so reports don't skew templates
+    rules = ScamDetector.matcher()
+    known = {category for category, *_ in rules.categories}
+    counts = {}
+    for message in s['messages']:
+        if message['sender'] == REPLY_SENDER:
+            continue
+        for category in scam_detector.match_categories(message['text'], rules):
+            if category in known:
+                counts[category] = counts.get(category, 0) + 1
+    intel = s['intel']
+    return {
+        'session_id': sid,
+        'is_scam': s['is_scam'],
+        'summary': {
+            'total_interactions': s['turns'],
+            'messages_retained': len(s['messages']),
+            'duration_seconds': s['updated_at'] - s['created_at'],
+            'started_at': datetime.utcfromtimestamp(s['created_at']).isoformat(),
+            'last_activity_at': datetime.utcfromtimestamp(s['updated_at']).isoformat(),
+            'scam_type': max(counts, key=counts.get) if counts else None,
+            'category_counts': counts
+        },
+        'extracted_intelligence': {
+            'phone_numbers': list(intel['phoneNumbers']),
+            'upi_ids': list(intel['upiIds']),
+            'urls': list(intel['phishingLinks']),
+            'bank_details': list(intel['bankAccounts']),
+            'lookalike_domains': list(intel['lookalikeDomains'])
+        },
+        'intelligence_first_seen_turn': intel
+    }
+
+
+def encode_cursor(key: ExportKey) -> str:
+    raw = json.dumps(list(key), separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).rstrip(b'=').decode('ascii')
+
+
+def decode_cursor(cursor: str) -> ExportKey:
+    """Inverse of encode_cursor; ValueError for anything it didn't produce."""
+    try:
+        updated_at, session_id = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+    except (TypeError, ValueError) as e:
+        raise ValueError("invalid cursor") from e
+    if not isinstance(updated_at, (int, float)) or not isinstance(session_id, str):
+        raise ValueError("invalid cursor")
+    return float(updated_at), session_id
+
+
+def parse_export_query(query: Dict[str, str]) -> Tuple[Optional[ExportKey], bool, int]:
+    """(start after, scam only, max sessions or 0) from export query parameters.
+    
+    updated_since is epoch seconds or ISO-8601 (UTC when no offset) and is
+    inclusive; with a cursor too, whichever starts later wins.
+    """
+    after = decode_cursor(query['cursor']) if query.get('cursor') else None
+    since = query.get('updated_since')
+    if since:
+        try:
+            since_ts = float(since)
+        except ValueError:
+            parsed = datetime.fromisoformat(since)
+            since_ts = parsed.timestamp() if parsed.tzinfo else (parsed - datetime(1970, 1, 1)).total_seconds()
+        # '' sorts before every id, so the bound keeps sessions at exactly since_ts
+        if after is None or (since_ts, '') > after:
+            after = (since_ts, '')
+    scam_only = query.get('scam_only', '').lower() in ('1', 'true', 'yes')
+    limit = int(query.get('limit') or 0)
+    if limit < 0:
+        raise ValueError("limit must be >= 0")
+    return after, scam_only, limit
 
 
-@app.route('/api/analyze', methods=['POST'])
+def export_lines(after: Optional[ExportKey], scam_only: bool, limit: int = 0) -> Iterator[str]:
+    """NDJSON lines for /api/sessions/export, read from the store a page at a time.
+    
+    Each session line carries the cursor that resumes right after it. The
+    last line is {"next_cursor", "exported", "complete"}; a stream that
+    ends without it was cut off and can be resumed from the last cursor seen.
+    Sessions updated while the export runs are left for the next export
+    from next_cursor, which is how a nightly job picks up the day's changes.
+    """
+    exported = 0
+    complete = True
+    pages = conversation_sessions.export(after, scam_only, EXPORT_PAGE_SIZE)
+    for page in pages:
+        for key, session in page:
+            if limit and exported >= limit:
+                complete = False
+                break
+            after = key
+            exported += 1
+            yield json.dumps({'cursor': encode_cursor(key), **session}, separators=(',', ':')) + '\n'
+        if not complete:
+            pages.close()
+            break
+    yield json.dumps({'next_cursor': encode_cursor(after) if after is not None else None,
+                      'exported': exported, 'complete': complete}, separators=(',', ':')) + '\n'
+
+
+def stats_payload() -> Dict:
+    """Served from maintained counters; never walks the session table."""
+    return {
+        **conversation_sessions.stats(),
+        'sessions_created': SESSIONS_CREATED.value(),
+        'verdicts': {'scam': VERDICTS.value('scam'), 'not_scam': VERDICTS.value('not_scam')},
+        'parse_methods': {key[0]: value for key, value in PARSE_METHODS.values().items()},
+        'category_triggers': {key[0]: value for key, value in CATEGORY_TRIGGERS.values().items()},
+        'intel_entities': {key[0]: value for key, value in INTEL_ENTITIES.values().items()},
+        'rates_per_minute': {name: rate.rates() for name, rate in RATES.items()},
+        'scorer': {'mode': ml_scorer.mode, 'model_loaded': ml_scorer.loaded},
+        'rules': {**rule_manager.status(), 'active_version': ScamDetector.matcher().version},
+        'verdict_cache': verdict_cache.stats(),
+        'campaigns': campaign_index.stats(),
+        'brand_index': ScamDetector.matcher().brand_index.stats(),
+        'intel_index': intel_index.stats(),
+        'journal': journal.stats() if journal is not None else None,
+        'rate_limits': {**rate_limiter.stats(),
+                        'throttled': {key[0]: value for key, value in THROTTLED.values().items()}},
+        'load_shedding': load_shedder.stats(),
+        'callbacks': callback_dispatcher.stats()
+    }
+
+def resolve_intel_type(kind: str) -> Optional[str]:
+    return INTEL_TYPE_ALIASES.get(kind, kind if kind in INTEL_KEYS else None)
+
+
+def intel_lookup_payload(kind: str, value: str, limit: int = 100) -> Optional[Dict]:
+    """Sessions that mentioned an entity; value is normalized like extracted intel."""
+    kind = resolve_intel_type(kind)
+    if kind is None:
+        return None
+    if kind == 'lookalikeDomains':
+        normalized = ascii_domain(value.strip().lower())
+    else:
+        normalized = next((e.value for e in honeypot_agent.scan_entities(value) if e.type == kind), value.strip())
+    return {'type': kind, 'value': normalized, **intel_index.sessions_for(kind, normalized, limit)}
+
+
+def intel_top_payload(kind: str, limit: int = 10) -> Optional[Dict]:
+    kind = resolve_intel_type(kind)
+    if kind is None:
+        return None
+    return {'type': kind, 'top': intel_index.top(kind, limit)}
+
+
+def campaigns_payload(limit: int = 20, min_size: int = 2) -> Dict:
+    """Largest live campaigns, with their verdicts and the intel their messages share."""
+    return {**campaign_index.stats(), 'campaigns': campaign_index.top(limit, min_size)}
+
+
+def rules_payload() -> Dict:
+    rules = ScamDetector.matcher()
+    return {
+        **rule_manager.status(),
+        'active_version': rules.version,
+        'document': rules_document(rules.patterns, rules.weights, rules.url_weight, rules.digits_weight,
+                                   rules.threshold, rules.reply_rules, rules.version,
+                                   rules.lookalike_weight, rules.brands)
+    }
+
+
+def rules_reload_payload(doc: Optional[Dict]) -> Tuple[Dict, int]:
+    """Install a pushed rules document, or force a re-read of RULES_PATH when none is given."""
+    if doc:
+        try:
+            rules = rule_manager.install_document(doc)
+        except RuleError as e:
+            return {'status': 'error', 'message': str(e)}, 400
+        return {'status': 'success', 'version': rules.version}, 200
+    if not rule_manager.load(force=True):
+        return {'status': 'error', 'message': rule_manager.last_error or f"cannot read {RULES_PATH}"}, 400
+    return {'status': 'success', 'version': rule_manager.version}, 200
+
+# ==================== HELPER ====================
+
+def send_to_guvi(session: Session):
+    """Queue the session's final-result payload for the background dispatcher."""
+    intel = {key: list(values) for key, values in session.intel_map().items()}
+    intel['suspiciousKeywords'] = ['urgent', 'verify', 'payment']
+    # GUVI's schema has no field for these; the links themselves are in phishingLinks
+    lookalikes = intel.pop('lookalikeDomains')
+    notes = f"Engaged for {session.turns} turns"
+    if lookalikes:
+        notes += f"; lookalike domains: {', '.join(lookalikes)}"
+    
+    payload = {
+        "sessionId": session.id,
+        "scamDetected": True,
+        "totalMessagesExchanged": session.turns,
+        "extractedIntelligence": intel,
+        "agentNotes": notes
+    }
+    
+    if not callback_dispatcher.submit(session.id, payload):
+        logger.warning("GUVI callback queue full, dropped update for %s", session.id)
+
+FORM_MIMETYPES = ('application/x-www-form-urlencoded', 'multipart/form-data')
+
+
+def read_request_body() -> Tuple[Optional[Dict], str]:
+    """Decode the request body exactly once.
+    
+    Form posts come back as a flat dict; anything else is tried as JSON
+    whatever its Content-Type claims. Returns (data, parse_method) with
+    parse_method one of json / raw_json / form / none / invalid.
+    """
+    if request.mimetype in FORM_MIMETYPES:
+        form = request.form.to_dict()
+        return (form, 'form') if form else (None, 'none')
+    
+    raw = request.get_data(cache=True)
+    if not raw:
+        return None, 'none'
+    try:
+        data = json_loads(raw)
+    except ValueError:
+        return None, 'invalid'
+    if not isinstance(data, dict):
+        return None, 'invalid'
+    return data, ('json' if request.is_json else 'raw_json')
+
+# ==================== ENDPOINTS ====================
+
+@api.route('/health', methods=['GET'])
+def health():
+    return jsonify(health_payload()), 200
+
+
+def client_ip() -> Optional[str]:
+    if TRUST_FORWARDED_FOR:
+        forwarded = request.headers.get('X-Forwarded-For')
+        if forwarded:
+            return forwarded.split(',')[0].strip()
+    return request.remote_addr
+
+
+def refusal(refused: Tuple[Dict, int, Dict[str, str]]):
+    payload, status, headers = refused
+    return jsonify(payload), status, headers
+
+
+@api.route('/api/analyze', methods=['POST'])
 def analyze():
     """BULLETPROOF endpoint - handles everything!"""
     
+    api_key = request.headers.get('x-api-key')
+    refused = admit(api_key, client_ip(), request.headers.get('X-Request-Start'))
+    if refused is not None:
+        return refusal(refused)
     
     try:
-        # Check API key
-        api_key = request.headers.get('x-api-key') or request.headers.get('X-API-Key')
-        if api_key and api_key != API_KEY:
-            return jsonify({"status": "error", "message": "Invalid API key"}), 401
-        
-        # Get request body - MULTIPLE WAYS
-        data = None
+        start = perf_counter()
+        data, method = read_request_body()
+        PARSE_METHODS.inc(method)
+        STAGE_SECONDS.observe(perf_counter() - start, 'parse')
         
-        # Try 1: Standard JSON
-        if request.is_json:
-            try:
-                data = request.get_json()
-            except:
-                pass
-        
-        # Try 2: Force parse
-        if not data and request.data:
-            try:
-                import json
-                data = json.loads(request.data.decode('utf-8'))
-            except:
-                pass
-        
-        # Try 3: Form data
-        if not data and request.form:
-            data = dict(request.form)
-        
-        # Log what we received
-        logger.info(f"Method: {request.method}, Data: {data}, Content-Type: {request.content_type}")
-        
-        # If still no data, return success (tester validation)
+        # If no data, return success (tester validation)
         if not data:
-            logger.info("No data - validation request")
+            if request_log.sample():
+                request_log.event('analyze', outcome='no_data', parse=method, content_type=request.mimetype)
             return jsonify({"status": "success", "reply": "Honeypot active"}), 200
         
-        # Extract fields
-        session_id = data.get('sessionId') or data.get('session_id') or f"sess_{uuid.uuid4().hex[:8]}"
-        message_obj = data.get('message', {})
-        
-        # Get text from message
-        message_text = ""
-        if isinstance(message_obj, dict):
-            message_text = message_obj.get('text', '')
-        elif isinstance(message_obj, str):
-            message_text = message_obj
-        else:
-            # Maybe message is directly in data?
-            message_text = data.get('text', '')
-        
-        # If no text, neutral response
-        if not message_text:
-            logger.info("No message text")
-            return jsonify({
-                "status": "success",
-                "reply": "Why is my account being suspended?"
-            }), 200
-        logger.info(f"Processing: {session_id} - {message_text[:50]}")
-        return jsonify({
-            "status": "success",
-            "reply": "Why is my account being suspended?"
-        }), 200
-        
-        # Detect scam
-        is_scam = scam_detector.is_scam(message_text)
-        
-        # Get/create session
-        if session_id not in conversation_sessions:
-            conversation_sessions[session_id] = {
-                'id': session_id,
-                'messages': [],
-                'intel': {'phoneNumbers': set(), 'upiIds': set(), 
-                         'phishingLinks': set(), 'bankAccounts': set()},
-                'turns': 0,
-                'is_scam': False
-            }
-        
-        session = conversation_sessions[session_id]
-        
-        # If scam, engage
-        if is_scam or session['is_scam']:
-            session['is_scam'] = True
-            session['messages'].append({'sender': 'scammer', 'text': message_text})
-            session['turns'] += 1
-            
-            # Extract intelligence
-            intel = honeypot_agent.extract_intelligence(message_text)
-            for key, values in intel.items():
-                if values and key in session['intel']:
-                    session['intel'][key].update(values)
-            
-            # Generate response
-            reply = honeypot_agent.generate_response(message_text, session['turns'])
-            session['messages'].append({'sender': 'user', 'text': reply})
-            
-            # Send to GUVI after 3 turns
-            #if session['turns'] >= 3:
-            #    send_to_guvi(session)
-            
-            logger.info(f"Scam - Turn {session['turns']}: {reply[:30]}")
-            return jsonify({"status": "success", "reply": reply}), 200
-        
-        # Not a scam
-        logger.info("Not scam")
-        return jsonify({"status": "success", "reply": "Thank you"}), 200
+        payload = analyze_payload(data)
+        start = perf_counter()
+        response = jsonify(payload)
+        STAGE_SECONDS.observe(perf_counter() - start, 'serialize')
+        return response, 200
         
     except Exception as e:
-        logger.error(f"ERROR: {e}", exc_info=True)
+        logger.error("ERROR: %s", e, exc_info=True)
         return jsonify({"status": "success", "reply": "Processing"}), 200
+    finally:
+        load_shedder.release()
 
-@app.route('/api/session/<sid>', methods=['GET'])
+@api.route('/api/analyze/batch', methods=['POST'])
+def analyze_batch():
+    """Score a burst of messages in one round trip.
+    
+    Body: {"items": [{"sessionId": ..., "message": ...}, ...]} or a bare list.
+    Items for the same session are applied in order; different sessions run
+    concurrently. Results come back in request order.
+    """
+    api_key = request.headers.get('x-api-key')
+    ip = client_ip()
+    refused = admit(api_key, ip, request.headers.get('X-Request-Start'))
+    if refused is not None:
+        return refusal(refused)
+    try:
+        try:
+            data = json_loads(request.get_data())
+        except ValueError:
+            data = None
+        payload, status, headers = batch_payload(data, api_key, ip)
+        return jsonify(payload), status, headers
+    finally:
+        load_shedder.release()
+
+
+def batch_payload(data, api_key: Optional[str], ip: Optional[str]) -> Tuple[Dict, int, Dict[str, str]]:
+    """(payload, status, headers) for one decoded /api/analyze/batch body; blocks on batch_executor."""
+    items = data.get('items') if isinstance(data, dict) else data
+    if not isinstance(items, list):
+        return {"status": "error", "message": "Expected a list of items"}, 400, {}
+    if len(items) > MAX_BATCH_SIZE:
+        return {"status": "error", "message": f"Batch exceeds {MAX_BATCH_SIZE} items"}, 413, {}
+    # admit() charged one token; every further item costs one more
+    if len(items) > 1:
+        refused = rate_limiter.check_client(api_key, ip, cost=len(items) - 1)
+        if refused is not None:
+            return throttle_response(*refused)
+    
+    results = [None] * len(items)
+    by_session = {}
+    for index, item in enumerate(items):
+        if not isinstance(item, dict):
+            results[index] = {"status": "error", "message": "Item must be an object"}
+            continue
+        session_id, message_text = parse_fields(item)
+        if not message_text:
+            results[index] = {'sessionId': session_id, 'scamScore': 0.0, 'scamDetected': False,
+                              'reply': "Why is my account being suspended?",
+                              'extractedIntelligence': EMPTY_INTEL, 'turn': 0}
+            continue
+        if rate_limiter.check_session(session_id) is not None:
+            THROTTLED.inc('session')
+            results[index] = {'sessionId': session_id, 'scamScore': 0.0, 'scamDetected': False,
+                              'reply': THROTTLED_REPLY, 'extractedIntelligence': EMPTY_INTEL, 'turn': 0}
+            continue
+        by_session.setdefault(session_id, []).append((index, message_text))
+    
+    # One matrix pass scores the whole batch when the ML scorer is enabled
+    texts = [text for group in by_session.values() for _, text in group]
+    probabilities = iter(ml_scorer.score_batch(texts) or [None] * len(texts))
+    by_session = {sid: [(index, text, next(probabilities)) for index, text in group]
+                  for sid, group in by_session.items()}
+    
+    if len(by_session) == 1:
+        groups = [guarded_session_batch(*next(iter(by_session.items())))]
+    else:
+        groups = batch_executor.map(lambda kv: guarded_session_batch(*kv), by_session.items())
+    for group in groups:
+        for index, result in group:
+            results[index] = result
+    
+    if request_log.sample():
+        request_log.event('analyze_batch', items=len(items), sessions=len(by_session))
+    return {"status": "success", "results": results}, 200, {}
+
+@api.route('/api/session/<sid>', methods=['GET'])
 def get_session(sid):
-    if sid not in conversation_sessions:
+    payload = session_payload(sid)
+    if payload is None:
         return jsonify({"error": "Not found"}), 404
-    
-    s = conversation_sessions[sid]
-    return jsonify({
-        'session_id': sid,
-        'messages': s['messages'],
-        'intelligence': {k: list(v) for k, v in s['intel'].items()},
-        'turns': s['turns']
-    }), 200
+    return jsonify(payload), 200
+
+
+@api.route('/api/session/<sid>/report', methods=['GET'])
+def session_report(sid):
+    payload = session_report_payload(sid)
+    if payload is None:
+        return jsonify({"error": "Not found"}), 404
+    return jsonify(payload), 200
 
 
-@app.route('/api/stats', methods=['GET'])
+@api.route('/api/sessions/export', methods=['GET'])
+def sessions_export():
+    """Stream live sessions as NDJSON: ?scam_only=1&updated_since=<ts>&cursor=<c>&limit=<n>."""
+    if request.headers.get('x-api-key') != API_KEY:
+        return jsonify({"status": "error", "message": "Invalid API key"}), 401
+    try:
+        after, scam_only, limit = parse_export_query(request.args)
+    except ValueError as e:
+        return jsonify({"status": "error", "message": str(e)}), 400
+    return Response(export_lines(after, scam_only, limit), mimetype='application/x-ndjson')
+
+
+@api.route('/api/stats', methods=['GET'])
 def stats():
-    return jsonify({
-        'total_sessions': len(conversation_sessions),
-        'scam_sessions': sum(1 for s in conversation_sessions.values() if s['is_scam'])
-    }), 200
+    return jsonify(stats_payload()), 200
+
+
+@api.route('/api/intel/top', methods=['GET'])
+def intel_top():
+    payload = intel_top_payload(request.args.get('type', ''), max(1, min(request.args.get('limit', 10, type=int), 100)))
+    if payload is None:
+        return jsonify({"error": f"type must be one of {sorted(INTEL_TYPE_ALIASES) + list(INTEL_KEYS)}"}), 400
+    return jsonify(payload), 200
+
+
+@api.route('/api/intel/<kind>/<path:value>', methods=['GET'])
+def intel_lookup(kind, value):
+    payload = intel_lookup_payload(kind, value, max(1, min(request.args.get('limit', 100, type=int), 1000)))
+    if payload is None:
+        return jsonify({"error": f"type must be one of {sorted(INTEL_TYPE_ALIASES) + list(INTEL_KEYS)}"}), 400
+    return jsonify(payload), 200
+
+
+@api.route('/api/templates', methods=['GET'])
+def templates():
+    """Most repeated message templates seen by the verdict cache."""
+    limit = request.args.get('limit', 10, type=int)
+    return jsonify({'templates': verdict_cache.top_templates(max(1, min(limit, 100)))}), 200
+
+
+@api.route('/api/campaigns', methods=['GET'])
+def campaigns():
+    """Near-duplicate message clusters (scam waves) seen by this worker."""
+    limit = max(1, min(request.args.get('limit', 20, type=int), 100))
+    return jsonify(campaigns_payload(limit, max(1, request.args.get('min_size', 2, type=int)))), 200
+
+
+@api.route('/api/admin/rules', methods=['GET'])
+def admin_rules():
+    if request.headers.get('x-api-key') != API_KEY:
+        return jsonify({"status": "error", "message": "Invalid API key"}), 401
+    return jsonify(rules_payload()), 200
+
+
+@api.route('/api/admin/rules/reload', methods=['POST'])
+def admin_rules_reload():
+    """Body: a full rules document to install, or empty to re-read the rules file."""
+    if request.headers.get('x-api-key') != API_KEY:
+        return jsonify({"status": "error", "message": "Invalid API key"}), 401
+    raw = request.get_data()
+    try:
+        doc = json_loads(raw) if raw.strip() else None
+    except ValueError:
+        return jsonify({"status": "error", "message": "Body must be a JSON rules document"}), 400
+    if doc is not None and not isinstance(doc, dict):
+        return jsonify({"status": "error", "message": "Body must be a JSON rules document"}), 400
+    payload, status = rules_reload_payload(doc)
+    return jsonify(payload), status
+
+
+@api.route('/metrics', methods=['GET'])
+def prometheus_metrics():
+    return Response(registry.render(), mimetype=metrics.CONTENT_TYPE)
 
 
 # ==================== CATCH ALL ====================
 
-@app.errorhandler(404)
+@api.app_errorhandler(404)
 def not_found(e):
     return jsonify({"status": "success", "message": "Endpoint not found"}), 200
 
-@app.errorhandler(500)
+@api.app_errorhandler(500)
 def server_error(e):
     return jsonify({"status": "success", "message": "Processing"}), 200
 
 
+# ==================== APP FACTORY ====================
+
+_worker_pid = None
+_worker_lock = threading.Lock()
+
+
+def start_worker():
+    """Start this process's threads and files: rules watcher, GUVI senders, journal.
+    
+    Runs once per process, so it is safe to call from every request and
+    again in a forked child (gunicorn's post_fork hook calls it eagerly).
+    Threads and locked files never survive a fork, so a preloading master
+    must not start them itself.
+    """
+    global _worker_pid
+    if _worker_pid == os.getpid():
+        return
+    with _worker_lock:
+        if _worker_pid == os.getpid():
+            return
+        _worker_pid = os.getpid()
+        rule_manager.start()
+        callback_dispatcher.start()
+        if JOURNAL_DIR:
+            open_journal()
+
+
+def warm():
+    """Do the expensive one-time work up front, so forked workers share it copy-on-write."""
+    ScamDetector.matcher()
+    if ml_scorer.mode != 'keyword':
+        ml_scorer.model()
+    callback_dispatcher.prepare()
+
+
+def create_app(preload: bool = False) -> Flask:
+    """Build the Flask app.
+    
+    preload=True is for gunicorn's preload_app (see gunicorn.conf.py): the
+    master warms everything shareable and each worker starts its own
+    threads after the fork. Otherwise worker state starts on the first
+    request.
+    """
+    from flask_cors import CORS
+    flask_app = Flask(__name__)
+    CORS(flask_app)
+    flask_app.register_blueprint(api)
+    flask_app.before_request(start_worker)
+    if preload:
+        warm()
+    return flask_app
+
+
+app = create_app()
+
+
 # ==================== MAIN ====================
 
 if __name__ == '__main__':
     port = int(os.environ.get('PORT', 5000))
-    logger.info(f"Starting on port {port}")
+    start_worker()
+    logger.info("Starting on port %s", port)
     app.run(host='0.0.0.0', port=port, debug=False)
-
@@ -0,0 +1,265 @@
+"""
+ASGI entry point for the AI Honey-Pot API.
+
+Serves the same /health, /api/analyze, /api/analyze/batch, /api/session/<sid>[/report],
+/api/sessions/export, /api/stats, /api/templates, /api/campaigns, /api/intel, /api/admin/rules
+and /metrics contract as the Flask app, reusing its detector, agent, session store and callback
+dispatcher. As on Flask, /api/analyze answers with the canned reply and runs no detection;
+scoring and sessions happen on /api/analyze/batch. It is a bare ASGI callable with no framework
+dependency; run it under any ASGI server, e.g.
+
+    pip install uvicorn
+    uvicorn asgi_app:app --host 0.0.0.0 --port 8000
+
+Single-message handlers are CPU-light and run inline on the event loop.
+Batches and blocking I/O (the SQLite session backend) run in the default
+thread pool, and GUVI callbacks are already queued onto background threads
+by the dispatcher.
+"""
+
+import asyncio
+import json
+import logging
+import os
+from itertools import islice
+from typing import Dict, Iterator, List, Optional
+from urllib.parse import parse_qsl, unquote
+
+import metrics
+from app import (API_KEY, EXPORT_PAGE_SIZE, SESSION_BACKEND, TRUST_FORWARDED_FOR, admit, analyze_payload,
+                 batch_payload, callback_dispatcher, campaigns_payload, export_lines, health_payload, load_shedder,
+                 intel_lookup_payload, intel_top_payload, json_loads, parse_export_query, registry, request_log,
+                 rules_payload, rules_reload_payload, session_payload, session_report_payload, start_worker,
+                 stats_payload, verdict_cache)
+
+logger = logging.getLogger(__name__)
+
+# The memory backend only takes an in-process lock, so it is cheap enough to
+# call from the event loop; anything else goes through a worker thread
+BLOCKING_STORE = SESSION_BACKEND != 'memory'
+
+
+async def read_body(receive) -> bytes:
+    chunks = []
+    more_body = True
+    while more_body:
+        message = await receive()
+        chunks.append(message.get('body', b''))
+        more_body = message.get('more_body', False)
+    return b''.join(chunks)
+
+
+async def send_json(send, payload: Dict, status: int = 200, extra_headers: Optional[Dict[str, str]] = None):
+    body = json.dumps(payload).encode('utf-8')
+    headers = [(b'content-type', b'application/json'), (b'content-length', str(len(body)).encode())]
+    for name, value in (extra_headers or {}).items():
+        headers.append((name.lower().encode('latin-1'), value.encode('latin-1')))
+    await send({'type': 'http.response.start', 'status': status, 'headers': headers})
+    await send({'type': 'http.response.body', 'body': body})
+
+
+def decode_body(body: bytes, content_type: str) -> Optional[Dict]:
+    """Same fallbacks as the Flask handler: JSON first, then form data."""
+    if not body:
+        return None
+    try:
+        data = json_loads(body)
+        return data if isinstance(data, dict) else None
+    except ValueError:
+        pass
+    if content_type.startswith('application/x-www-form-urlencoded'):
+        return dict(parse_qsl(body.decode('utf-8'))) or None
+    return None
+
+
+def query_int(scope, name: str, default: int, maximum: int) -> int:
+    query = dict(parse_qsl(scope.get('query_string', b'').decode('latin-1')))
+    value = query.get(name, '')
+    return max(1, min(int(value), maximum)) if value.isdigit() else default
+
+
+async def run_pipeline(fn, *args):
+    if BLOCKING_STORE:
+        return await asyncio.get_running_loop().run_in_executor(None, fn, *args)
+    return fn(*args)
+
+
+def client_ip(scope, headers: Dict[bytes, bytes]) -> Optional[str]:
+    if TRUST_FORWARDED_FOR and b'x-forwarded-for' in headers:
+        return headers[b'x-forwarded-for'].decode('latin-1').split(',')[0].strip()
+    client = scope.get('client')
+    return client[0] if client else None
+
+
+async def analyze(scope, receive, send, headers: Dict[bytes, bytes]):
+    api_key = headers.get(b'x-api-key', b'').decode('latin-1') or None
+    request_start = headers.get(b'x-request-start', b'').decode('latin-1') or None
+    # Never wait for a slot here: that would block the event loop
+    refused = await run_pipeline(admit, api_key, client_ip(scope, headers), request_start, False)
+    if refused is not None:
+        await send_json(send, *refused)
+        return
+    try:
+        body = await read_body(receive)
+        data = decode_body(body, headers.get(b'content-type', b'').decode('latin-1'))
+        if not data:
+            if request_log.sample():
+                request_log.event('analyze', outcome='no_data')
+            await send_json(send, {"status": "success", "reply": "Honeypot active"})
+            return
+
+        await send_json(send, await run_pipeline(analyze_payload, data))
+    except Exception as e:
+        logger.error("ERROR: %s", e, exc_info=True)
+        await send_json(send, {"status": "success", "reply": "Processing"})
+    finally:
+        load_shedder.release()
+
+
+async def analyze_batch(scope, receive, send, headers: Dict[bytes, bytes]):
+    api_key = headers.get(b'x-api-key', b'').decode('latin-1') or None
+    ip = client_ip(scope, headers)
+    request_start = headers.get(b'x-request-start', b'').decode('latin-1') or None
+    refused = await run_pipeline(admit, api_key, ip, request_start, False)
+    if refused is not None:
+        await send_json(send, *refused)
+        return
+    try:
+        try:
+            data = json_loads(await read_body(receive))
+        except ValueError:
+            data = None
+        # Scoring a batch waits on the batch pool, so it never runs on the event loop
+        payload, status, extra_headers = await asyncio.get_running_loop().run_in_executor(
+            None, batch_payload, data, api_key, ip)
+        await send_json(send, payload, status, extra_headers)
+    finally:
+        load_shedder.release()
+
+
+def take_lines(lines: Iterator[str]) -> List[str]:
+    return list(islice(lines, EXPORT_PAGE_SIZE))
+
+
+async def sessions_export(scope, send):
+    try:
+        after, scam_only, limit = parse_export_query(dict(parse_qsl(scope.get('query_string', b'').decode('latin-1'))))
+    except ValueError as e:
+        await send_json(send, {"status": "error", "message": str(e)}, 400)
+        return
+    lines = export_lines(after, scam_only, limit)
+    await send({'type': 'http.response.start', 'status': 200,
+                'headers': [(b'content-type', b'application/x-ndjson')]})
+    # One store page per chunk, so a blocking store is read off the event loop
+    while True:
+        chunk = await run_pipeline(take_lines, lines)
+        if not chunk:
+            break
+        await send({'type': 'http.response.body', 'body': ''.join(chunk).encode('utf-8'), 'more_body': True})
+    await send({'type': 'http.response.body', 'body': b''})
+
+
+async def admin_rules_reload(receive, send):
+    body = await read_body(receive)
+    try:
+        doc = json_loads(body) if body.strip() else None
+    except ValueError:
+        doc = []
+    if doc is not None and not isinstance(doc, dict):
+        await send_json(send, {"status": "error", "message": "Body must be a JSON rules document"}, 400)
+        return
+    payload, status = await run_pipeline(rules_reload_payload, doc)
+    await send_json(send, payload, status)
+
+
+async def lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            start_worker()
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            # Flush queued GUVI callbacks without blocking the loop
+            await asyncio.get_running_loop().run_in_executor(None, callback_dispatcher.shutdown)
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
+
+
+async def app(scope, receive, send):
+    if scope['type'] == 'lifespan':
+        await lifespan(receive, send)
+        return
+    if scope['type'] != 'http':
+        return
+    # Servers without lifespan support still start worker state on first use
+    start_worker()
+
+    method = scope['method']
+    path = scope['path']
+    headers = dict(scope.get('headers') or [])
+
+    if path == '/api/analyze' and method == 'POST':
+        await analyze(scope, receive, send, headers)
+    elif path == '/api/analyze/batch' and method == 'POST':
+        await analyze_batch(scope, receive, send, headers)
+    elif path == '/health' and method == 'GET':
+        await send_json(send, health_payload())
+    elif path == '/api/stats' and method == 'GET':
+        await send_json(send, await run_pipeline(stats_payload))
+    elif path == '/api/templates' and method == 'GET':
+        limit = query_int(scope, 'limit', 10, 100)
+        await send_json(send, {'templates': verdict_cache.top_templates(limit)})
+    elif path == '/api/campaigns' and method == 'GET':
+        min_size = query_int(scope, 'min_size', 2, 1 << 30)
+        await send_json(send, campaigns_payload(query_int(scope, 'limit', 20, 100), min_size))
+    elif path == '/api/intel/top' and method == 'GET':
+        query = dict(parse_qsl(scope.get('query_string', b'').decode('latin-1')))
+        payload = intel_top_payload(query.get('type', ''), query_int(scope, 'limit', 10, 100))
+        if payload is None:
+            await send_json(send, {"error": "Unknown intel type"}, 400)
+        else:
+            await send_json(send, payload)
+    elif path.startswith('/api/intel/') and method == 'GET' and path.count('/') >= 4:
+        kind, _, value = path[len('/api/intel/'):].partition('/')
+        payload = intel_lookup_payload(kind, unquote(value), query_int(scope, 'limit', 100, 1000))
+        if payload is None:
+            await send_json(send, {"error": "Unknown intel type"}, 400)
+        else:
+            await send_json(send, payload)
+    elif path.startswith('/api/admin/') and headers.get(b'x-api-key', b'').decode('latin-1') != API_KEY:
+        await send_json(send, {"status": "error", "message": "Invalid API key"}, 401)
+    elif path == '/api/admin/rules' and method == 'GET':
+        await send_json(send, rules_payload())
+    elif path == '/api/admin/rules/reload' and method == 'POST':
+        await admin_rules_reload(receive, send)
+    elif path == '/metrics' and method == 'GET':
+        body = (await run_pipeline(registry.render)).encode('utf-8')
+        await send({'type': 'http.response.start', 'status': 200,
+                    'headers': [(b'content-type', metrics.CONTENT_TYPE.encode()),
+                                (b'content-length', str(len(body)).encode())]})
+        await send({'type': 'http.response.body', 'body': body})
+    elif path == '/api/sessions/export' and method == 'GET':
+        if headers.get(b'x-api-key', b'').decode('latin-1') != API_KEY:
+            await send_json(send, {"status": "error", "message": "Invalid API key"}, 401)
+        else:
+            await sessions_export(scope, send)
+    elif path.startswith('/api/session/') and path.endswith('/report') and method == 'GET' and path.count('/') == 4:
+        payload = await run_pipeline(session_report_payload, path[len('/api/session/'):-len('/report')])
+        if payload is None:
+            await send_json(send, {"error": "Not found"}, 404)
+        else:
+            await send_json(send, payload)
+    elif path.startswith('/api/session/') and method == 'GET' and path.count('/') == 3:
+        payload = await run_pipeline(session_payload, path[len('/api/session/'):])
+        if payload is None:
+            await send_json(send, {"error": "Not found"}, 404)
+        else:
+            await send_json(send, payload)
+    else:
+        await send_json(send, {"status": "success", "message": "Endpoint not found"})
+
+
+if __name__ == '__main__':
+    import uvicorn
+    port = int(os.environ.get('PORT', 8000))
+    uvicorn.run(app, host='0.0.0.0', port=port)
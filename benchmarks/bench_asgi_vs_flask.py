@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+Load test: requests/sec and latency percentiles for one-message
+/api/analyze/batch calls (the route that scores and updates sessions)
+served by the Flask app vs the ASGI app.
+
+Start both servers first with the rate limits off, e.g.
+
+    export RATE_LIMIT_IP_PER_SEC=0 RATE_LIMIT_KEY_PER_SEC=0 SESSION_TURNS_PER_MINUTE=0
+    gunicorn -w 1 -b :5000 app:app
+    uvicorn asgi_app:app --port 8000
+
+then run from the repo root:
+
+    python benchmarks/bench_asgi_vs_flask.py --flask http://localhost:5000 --asgi http://localhost:8000
+"""
+
+import argparse
+import itertools
+import threading
+import time
+import uuid
+
+import requests
+
+MESSAGES = [
+    "URGENT: Your SBI account has been blocked. Verify immediately at http://sbi-secure-verify.com",
+    "Congratulations! You won a lottery prize. Share your UPI id to claim it now.",
+    "Call +91-9876543210 and pay Rs. 1000 to account 12345678901234 (IFSC: SBIN0001234)",
+    "Hey, are we still meeting for lunch tomorrow at 2 PM?",
+]
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(pct / 100 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def run(base_url: str, concurrency: int, duration: float, sessions: int):
+    latencies = []
+    errors = [0]
+    lock = threading.Lock()
+    deadline = time.perf_counter() + duration
+    session_ids = [f"load_{uuid.uuid4().hex[:8]}" for _ in range(sessions)]
+
+    def worker(offset):
+        http = requests.Session()
+        local = []
+        for i in itertools.count(offset):
+            if time.perf_counter() >= deadline:
+                break
+            body = [{"sessionId": session_ids[i % sessions], "message": MESSAGES[i % len(MESSAGES)]}]
+            start = time.perf_counter()
+            try:
+                ok = http.post(f"{base_url}/api/analyze/batch", json=body, timeout=10).status_code == 200
+            except requests.RequestException:
+                ok = False
+            local.append(time.perf_counter() - start)
+            if not ok:
+                with lock:
+                    errors[0] += 1
+        with lock:
+            latencies.extend(local)
+
+    threads = [threading.Thread(target=worker, args=(n,)) for n in range(concurrency)]
+    started = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        'requests': len(latencies),
+        'errors': errors[0],
+        'rps': len(latencies) / elapsed,
+        'p50_ms': percentile(latencies, 50) * 1000,
+        'p99_ms': percentile(latencies, 99) * 1000,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--flask', default='http://localhost:5000', help='Flask base URL ("" to skip)')
+    parser.add_argument('--asgi', default='http://localhost:8000', help='ASGI base URL ("" to skip)')
+    parser.add_argument('--concurrency', type=int, default=32)
+    parser.add_argument('--duration', type=float, default=10.0, help='seconds per target')
+    parser.add_argument('--sessions', type=int, default=200, help='distinct session ids to rotate through')
+    args = parser.parse_args()
+
+    for label, url in (('flask', args.flask), ('asgi', args.asgi)):
+        if not url:
+            continue
+        r = run(url, args.concurrency, args.duration, args.sessions)
+        print(f"{label:>6}: {r['rps']:8.1f} req/s | p50 {r['p50_ms']:7.2f} ms | "
+              f"p99 {r['p99_ms']:7.2f} ms | {r['requests']} requests, {r['errors']} errors")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+Campaign assignment at scale: campaigns.CampaignIndex fed a long stream of
+message fingerprints through a bounded index with a simulated clock.
+
+The stream mixes a rotating set of live templates (each sent with a
+different name, number, link and the odd reworded word) and one-off
+messages. Template variants are real texts run through signature(); one-off
+messages, which never match anything, use random signatures so that
+millions of them can be generated quickly. Every --churn messages one
+template retires and a new one starts. Reported: the signature cost on SMS
+text, assign throughput and p50 / p99 / p99.9 latency (every 100th call is
+timed), campaigns created and evicted, peak RSS, and the template hit rate:
+the share of template messages that land in the campaign their template
+was first put in.
+
+Run from the repo root:  python benchmarks/bench_campaigns.py --messages 10000000
+"""
+
+import argparse
+import os
+import random
+import resource
+import statistics
+import sys
+import time
+from array import array
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from campaigns import NUM_HASHES, CampaignIndex, signature
+
+SYLLABLES = ['ka', 'ro', 'mi', 'pay', 'tel', 'ban', 'zo', 'nu', 'fin', 'shop', 'kart', 'cred', 'vi', 'lo', 'sa',
+             'de', 'ra', 'tu', 'po', 'li']
+NAMES = ['Ravi', 'Priya', 'Amit', 'Sunita', 'Rahul', 'Neha', 'Arjun', 'Kavya', 'Vikram', 'Anjali']
+
+
+def word(rng: random.Random) -> str:
+    return ''.join(rng.choice(SYLLABLES) for _ in range(rng.randint(1, 3)))
+
+
+def template(rng: random.Random) -> str:
+    words = [word(rng) for _ in range(rng.randint(12, 25))]
+    for slot in ('{name}', '{link}', '{number}'):
+        words.insert(rng.randrange(len(words) + 1), slot)
+    return ' '.join(words)
+
+
+def variant(rng: random.Random, text: str) -> str:
+    words = text.format(name=rng.choice(NAMES), link=f"http://{word(rng)}{rng.randint(1, 999)}.in/kyc",
+                        number=str(rng.randint(6000000000, 9999999999))).split()
+    if rng.random() < 0.3:
+        words[rng.randrange(len(words))] = word(rng)
+    return ' '.join(words)
+
+
+def percentile(values, q: float) -> float:
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--messages', type=int, default=10_000_000)
+    parser.add_argument('--live', type=int, default=500, help='templates sending at any time')
+    parser.add_argument('--churn', type=int, default=2000, help='messages between template turnovers')
+    parser.add_argument('--variants', type=int, default=20, help='distinct texts per template')
+    parser.add_argument('--noise', type=float, default=0.3, help='share of one-off messages')
+    parser.add_argument('--rate', type=float, default=100.0, help='messages per simulated second')
+    parser.add_argument('--max-campaigns', type=int, default=50000)
+    parser.add_argument('--max-age', type=float, default=3600.0)
+    args = parser.parse_args()
+    rng = random.Random(11)
+
+    texts = [variant(rng, template(rng)) for _ in range(2000)]
+    start = time.perf_counter()
+    for text in texts:
+        signature(text)
+    print(f"signature(): {(time.perf_counter() - start) / len(texts) * 1e6:.1f} us/message")
+
+    templates = args.live + args.messages // args.churn + 1
+    start = time.perf_counter()
+    pool = []
+    for _ in range(templates):
+        text = template(rng)
+        pool.append([signature(variant(rng, text)) for _ in range(args.variants)])
+    print(f"{templates} templates x {args.variants} variants fingerprinted in {time.perf_counter() - start:.1f} s")
+
+    now = [0.0]
+    index = CampaignIndex(args.max_campaigns, args.max_age, clock=lambda: now[0])
+    first_campaign, hits, template_messages = {}, 0, 0
+    timings = array('d')
+    perf_counter, getrandbits, random_ = time.perf_counter, rng.getrandbits, rng.random
+    start = time.perf_counter()
+    for n in range(args.messages):
+        now[0] = n / args.rate
+        oldest = n // args.churn
+        if random_() < args.noise:
+            sig, t = array('Q', [getrandbits(59) for _ in range(NUM_HASHES)]), None
+        else:
+            t = oldest + int(random_() * args.live)
+            sig = pool[t][int(random_() * args.variants)]
+        if n % 100:
+            campaign = index.assign_signature(sig)
+        else:
+            began = perf_counter()
+            campaign = index.assign_signature(sig)
+            timings.append(perf_counter() - began)
+        if t is not None:
+            template_messages += 1
+            hits += first_campaign.setdefault(t, campaign.id) == campaign.id
+        if n and n % 1_000_000 == 0:
+            print(f"  {n:>10,} messages, {len(index):,} live campaigns, {time.perf_counter() - start:.0f} s")
+    elapsed = time.perf_counter() - start
+
+    timings = sorted(t * 1e6 for t in timings)
+    stats = index.stats()
+    print(f"{args.messages:,} messages in {elapsed:.1f} s: {args.messages / elapsed:,.0f} assigns/s")
+    print(f"assign p50 {statistics.median(timings):.1f} us   p99 {percentile(timings, 0.99):.1f}   "
+          f"p99.9 {percentile(timings, 0.999):.1f}   max {timings[-1]:.0f}")
+    print(f"campaigns created {stats['created']:,}, evicted {stats['evicted']:,}, live {stats['live']:,}")
+    print(f"template hit rate {hits / max(template_messages, 1):.4f} ({len(first_campaign):,} templates)")
+    print(f"peak RSS {resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024:.0f} MB")
+
+
+if __name__ == '__main__':
+    main()
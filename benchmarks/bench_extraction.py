@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+Benchmark: single-pass HoneyPotAgent.extract_intelligence vs the original
+five-findall implementation, on short SMS and long pasted SMS threads.
+
+Run from the repo root:  python benchmarks/bench_extraction.py
+"""
+
+import os
+import random
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import HoneyPotAgent
+
+
+def legacy_extract(message: str):
+    """The pre-scanner implementation, kept verbatim for comparison."""
+    if not message:
+        return {'phoneNumbers': [], 'upiIds': [], 'phishingLinks': [], 'bankAccounts': []}
+    
+    intel = {'phoneNumbers': [], 'upiIds': [], 'phishingLinks': [], 'bankAccounts': []}
+    
+    phones = re.findall(r'\+?\d[\d\s\-\.]{8,}\d', message)
+    phones += re.findall(r'\b\d{10}\b', message)
+    if phones:
+        intel['phoneNumbers'] = list(set([p.replace(' ', '').replace('-', '') for p in phones]))
+    
+    upi = re.findall(r'\b[a-zA-Z0-9._-]+@[a-zA-Z]+\b', message)
+    if upi:
+        intel['upiIds'] = list(set(upi))
+    
+    urls = re.findall(r'http[s]?://[^\s]+', message)
+    if urls:
+        intel['phishingLinks'] = list(set(urls))
+    
+    accounts = re.findall(r'\b\d{9,18}\b', message)
+    ifsc = re.findall(r'\b[A-Z]{4}0[A-Z0-9]{6}\b', message)
+    if accounts or ifsc:
+        intel['bankAccounts'] = list(set(accounts + ifsc))
+    
+    return intel
+
+
+SMS = [
+    "URGENT ALERT: Your SBI bank account has been temporarily suspended. Verify at http://sbi-secure-verify.com or call 1800-123-4567.",
+    "Call me directly at +91-9876543210 or email rajesh.kumar@sbi-customer-care.com. We need CVV and expiry date.",
+    "Transfer Rs. 1000 to account 12345678901234 (IFSC: SBIN0001234) as processing fee.",
+    "Pay the delivery fee to upi id parcel.help@ybl within 2 hours or the package returns.",
+    "Hi, running late, will be there by 7. Order the usual for me.",
+]
+
+
+def pasted_thread(rng: random.Random, lines: int) -> str:
+    """A forwarded SMS export: timestamps, sender numbers and message bodies."""
+    out = []
+    for i in range(lines):
+        sender = f"+91 98{rng.randint(10000000, 99999999)}"
+        out.append(f"[{10 + i % 12}:{i % 60:02d}] {sender}: {rng.choice(SMS)}")
+    return "\n".join(out)
+
+
+def bench(fn, corpus, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for message in corpus:
+            fn(message)
+    return time.perf_counter() - start
+
+
+def main():
+    agent = HoneyPotAgent()
+    rng = random.Random(7)
+    cases = [
+        ("short SMS", SMS, 5000),
+        ("thread x50", [pasted_thread(rng, 50) for _ in range(5)], 100),
+        ("thread x500", [pasted_thread(rng, 500) for _ in range(3)], 10),
+    ]
+    for label, corpus, repeat in cases:
+        old = bench(legacy_extract, corpus, repeat)
+        new = bench(agent.extract_intelligence, corpus, repeat)
+        n = len(corpus) * repeat
+        size = sum(len(m) for m in corpus) // len(corpus)
+        print(f"{label:>12} ({size:>6} chars): legacy {old / n * 1e6:9.1f} us | "
+              f"single-pass {new / n * 1e6:9.1f} us | speedup {old / new:5.2f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""
+Scale benchmark for the cross-session intel index.
+
+Fills the index with N entities spread over sessions with a skewed
+(campaign-like) reuse distribution, then times lookups, top-K queries and
+session eviction, and compares the index's memory accounting with the
+process RSS growth.
+
+Run from the repo root:  python benchmarks/bench_intel_index.py --entities 1000000
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from intel_index import IntelIndex
+from loadgen import read_rss_kb
+from session_store import INTEL_KEYS
+
+
+def timed(fn, calls):
+    start = time.perf_counter()
+    for args in calls:
+        fn(*args)
+    return (time.perf_counter() - start) / len(calls) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--entities', type=int, default=1000000, help='postings to insert')
+    parser.add_argument('--per-session', type=int, default=4, help='entities mentioned per session')
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    index = IntelIndex(INTEL_KEYS)
+    distinct = args.entities // 2
+    rss_before = read_rss_kb(os.getpid())
+
+    start = time.perf_counter()
+    sessions = args.entities // args.per_session
+    for s in range(sessions):
+        session_id = f"sess_{s:08x}"
+        for _ in range(args.per_session):
+            # Pareto-ish: a few campaign handles recur across many sessions
+            n = min(int(rng.paretovariate(1.2)), distinct) if rng.random() < 0.3 else rng.randrange(distinct)
+            index.add('upiIds', f"pay{n}@ybl", session_id)
+    build = time.perf_counter() - start
+    rss_after = read_rss_kb(os.getpid())
+    stats = index.stats()
+
+    print(f"Inserted {stats['postings']:,} postings / {sum(stats['entities'].values()):,} entities "
+          f"over {stats['sessions']:,} sessions in {build:.1f} s "
+          f"({build / max(stats['postings'], 1) * 1e6:.2f} us/add)")
+    print(f"  accounted: {stats['approx_bytes'] / 2**20:8.1f} MB")
+    if rss_before and rss_after:
+        print(f"  RSS grew : {(rss_after - rss_before) / 1024:8.1f} MB")
+
+    lookups = [('upiIds', f"pay{rng.randrange(distinct)}@ybl") for _ in range(20000)]
+    hot = [('upiIds', 'pay1@ybl')] * 20000
+    print(f"\nlookup (random)   : {timed(index.sessions_for, lookups):7.2f} us")
+    print(f"lookup (hottest)  : {timed(index.sessions_for, hot):7.2f} us (first 100 of "
+          f"{index.sessions_for('upiIds', 'pay1@ybl')['count']:,} sessions)")
+    print(f"top-10            : {timed(index.top, [('upiIds', 10)] * 2000):7.2f} us")
+    print(f"top-100           : {timed(index.top, [('upiIds', 100)] * 2000):7.2f} us")
+    evict = [(f"sess_{s:08x}",) for s in rng.sample(range(sessions), min(20000, sessions))]
+    print(f"evict session     : {timed(index.remove_session, evict):7.2f} us")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+Journal benchmark: write overhead per request and replay time.
+
+1. Per-request overhead: analyze_payload on scam turns with and without a
+   journal attached (group commit every --fsync-interval seconds, and with
+   an fsync on every write for comparison).
+2. Replay: writes --events turn events spread over --sessions sessions and
+   times replay() of the raw segments, then of the compacted snapshot.
+
+Run from the repo root:  python benchmarks/bench_journal.py --events 1000000
+"""
+
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('LOG_LEVEL', 'WARNING')
+os.environ.setdefault('SESSION_TURNS_PER_MINUTE', '0')   # measure the pipeline, not the throttle
+
+import app as honeypot
+from journal import Journal, replay
+from session_model import Session
+from session_store import SessionStore
+
+MESSAGES = [
+    "URGENT: your SBI account is blocked. Verify now at http://sbi-verify.com or call 9876543210",
+    "Pay the processing fee of Rs. 500 to claims.desk@ybl immediately",
+    "Share the OTP and your account number 12345678901234 (IFSC SBIN0001234) to unblock",
+]
+
+
+def per_request_us(requests: int, tag: str) -> float:
+    start = time.perf_counter()
+    for n in range(requests):
+        honeypot.analyze_payload({'sessionId': f'bench_{tag}_{n % 500}', 'message': MESSAGES[n % len(MESSAGES)]})
+    return (time.perf_counter() - start) / requests * 1e6
+
+
+def bench_overhead(requests: int, fsync_interval: float):
+    honeypot.send_to_guvi = lambda session: None   # keep the callback queue out of the numbers
+    baseline = per_request_us(requests, 'plain')
+    print(f"{'analyze without journal':<52}: {baseline:8.1f} us/request")
+    for interval, label in ((fsync_interval, f'group commit every {fsync_interval * 1000:g} ms'),
+                            (0, 'fsync per write')):
+        directory = tempfile.mkdtemp(prefix='journal_bench_')
+        journal = Journal(directory, fsync_interval=interval, snapshot_every=10 ** 9)
+        journal.open()
+        honeypot.journal = journal
+        count = requests if interval else min(requests, 2000)
+        cost = per_request_us(count, f'j{interval}')
+        honeypot.journal = None
+        journal.close()
+        shutil.rmtree(directory)
+        print(f"{f'analyze with journal ({label})':<52}: {cost:8.1f} us/request (+{cost - baseline:.1f})")
+
+
+def bench_replay(events: int, sessions: int):
+    directory = tempfile.mkdtemp(prefix='journal_replay_')
+    try:
+        store = SessionStore(max_sessions=sessions, ttl_seconds=0)
+        journal = Journal(directory, fsync_interval=0.05, snapshot_every=10 ** 9, snapshot_source=store.snapshot)
+        journal.open()
+        live = {}
+        start = time.perf_counter()
+        for n in range(events):
+            session_id = f'sess_{n % sessions:07d}'
+            session = live.get(session_id)
+            if session is None:
+                session = live[session_id] = Session(session_id, time.time())
+            session.turns += 1
+            journal.record_turn(session, [('scammer', MESSAGES[n % 3]), ('user', 'What is this about?')],
+                                {'upiIds': [f'u{n % 5000}@ybl']} if n % 4 == 0 else {})
+        journal.sync()
+        written = time.perf_counter() - start
+        size = sum(os.path.getsize(os.path.join(directory, name)) for name in os.listdir(directory))
+        print(f"\nwrote {events:,} events ({size / 2 ** 20:.0f} MB) in {written:.1f} s "
+              f"({written / events * 1e6:.2f} us/event)")
+
+        recovered, info = replay(directory)
+        print(f"replay from segments : {info['seconds']:6.2f} s -> {info['sessions']:,} sessions "
+              f"({info['events'] / info['seconds']:,.0f} events/s)")
+
+        store.restore(recovered)
+        journal.snapshot()
+        journal.close()
+        _, info = replay(directory)
+        print(f"replay from snapshot : {info['seconds']:6.2f} s -> {info['sessions']:,} sessions")
+    finally:
+        shutil.rmtree(directory)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--requests', type=int, default=20000)
+    parser.add_argument('--fsync-interval', type=float, default=0.05)
+    parser.add_argument('--events', type=int, default=1000000)
+    parser.add_argument('--sessions', type=int, default=100000)
+    args = parser.parse_args()
+
+    bench_overhead(args.requests, args.fsync_interval)
+    bench_replay(args.events, args.sessions)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+Lookalike-domain lookups against a large brand list: lookalike.BrandIndex
+(deletion-neighbourhood index + per-host cache) vs a linear scan computing
+the edit distance to every brand.
+
+Brands are synthetic pronounceable names plus the built-in bank and wallet
+domains. Queries are a mix of typos, homoglyphs, brand-plus-word domains and
+unrelated domains. Reported: microseconds per lookup, uncached (fresh
+index, every host new) and cached (the same hosts again).
+
+Run from the repo root:  python benchmarks/bench_lookalike.py --brands 5000
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from lookalike import DEFAULT_BRANDS, BrandIndex, allowed_edits, edit_distance, normalize_host, skeleton, split_host
+
+SYLLABLES = ['ka', 'ro', 'mi', 'pay', 'tel', 'ban', 'zo', 'nu', 'fin', 'shop', 'kart', 'cred', 'vi', 'lo', 'sa']
+WORDS = ['secure', 'verify', 'kyc', 'update', 'login', 'refund', 'help', 'rewards', 'support']
+
+
+def brand_names(rng: random.Random, count: int):
+    names = set()
+    while len(names) < count:
+        names.add(''.join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4))))
+    return sorted(names)
+
+
+def mutate(rng: random.Random, name: str) -> str:
+    i = rng.randrange(len(name))
+    return rng.choice([
+        lambda: name[:i] + name[i + 1:],
+        lambda: name[:i] + rng.choice('abcdefghijklmnopqrstuvwxyz') + name[i + 1:],
+        lambda: name.replace('o', '0', 1).replace('l', '1', 1),
+        lambda: f"{name}-{rng.choice(WORDS)}",
+        lambda: f"{rng.choice(WORDS)}-{name}",
+    ])()
+
+
+def queries(rng: random.Random, names, count: int):
+    out = []
+    for n in range(count):
+        if rng.random() < 0.5:
+            label = mutate(rng, rng.choice(names))
+        else:
+            label = ''.join(rng.choice('abcdefghijklmnopqrstuvwxyz') for _ in range(rng.randint(5, 14)))
+        out.append(f"http://{label}{n}.{rng.choice(['com', 'in', 'co.in', 'xyz'])}/login")
+    return out
+
+
+def linear_check(brands, url: str):
+    """What a plain scan over every brand costs: distance to each brand skeleton."""
+    host = normalize_host(url)
+    labels, _ = split_host(host)
+    word = skeleton(labels[-1])
+    for name in brands:
+        edits = allowed_edits(len(name)) or 0
+        if name in word or edit_distance(word, name, edits) <= edits:
+            return name
+    return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--brands', type=int, default=5000)
+    parser.add_argument('--queries', type=int, default=5000)
+    args = parser.parse_args()
+    rng = random.Random(3)
+    names = brand_names(rng, args.brands)
+    urls = queries(rng, names, args.queries)
+
+    start = time.perf_counter()
+    index = BrandIndex((*DEFAULT_BRANDS, *names), cache_size=args.queries * 2)
+    print(f"index: {len(index)} brands, {index.stats()['index_keys']} keys, "
+          f"built in {(time.perf_counter() - start) * 1000:.0f} ms")
+
+    for label in ('uncached', 'cached'):
+        start = time.perf_counter()
+        hits = sum(index.check(url) is not None for url in urls)
+        per = (time.perf_counter() - start) / len(urls) * 1e6
+        print(f"BrandIndex {label:<9}: {per:8.1f} us/lookup   ({hits} of {len(urls)} flagged)")
+
+    sample = urls[:max(1, len(urls) // 20)]
+    skeletons = [skeleton(name) for name in (*index.brands,)]
+    start = time.perf_counter()
+    for url in sample:
+        linear_check(skeletons, url)
+    per = (time.perf_counter() - start) / len(sample) * 1e6
+    print(f"linear scan        : {per:8.1f} us/lookup   ({len(sample)} lookups)")
+
+
+if __name__ == '__main__':
+    main()
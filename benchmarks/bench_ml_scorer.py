@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+"""
+Accuracy and throughput: keyword ScamDetector vs the hashed n-gram ML scorer.
+
+With a labeled JSONL corpus and a model from train_model.py:
+
+    python benchmarks/bench_ml_scorer.py --corpus data/test.jsonl --model models/scam_model
+
+Without --model, a model is trained in memory on half of the corpus and
+evaluated on the other half. Without --corpus, a small built-in sample
+(the load-test scam scripts plus benign chatter that uses trigger words
+like "now", "today" and "pay") is used; its accuracy numbers only show that
+the plumbing works, not how a real model performs.
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import numpy as np
+
+from app import ScamDetector
+from loadgen import SCENARIOS
+from ml_scorer import HashedNgramFeaturizer, LinearModel, MLScorer
+from train_model import best_threshold, fit, load_corpus
+
+BENIGN = [
+    "Can you pay me back for the movie tickets today?",
+    "I'm leaving now, will be there in ten minutes",
+    "Did you update the spreadsheet with today's numbers?",
+    "Mom says lunch is ready now, come down",
+    "The bank holiday means the office is closed on Monday",
+    "Please confirm if you can make it to the meeting today",
+    "I won the office quiz again, free pizza for everyone!",
+    "The delivery guy left the parcel with the neighbour",
+    "Quick question - are you free for a call later?",
+    "Share the photos from the trip when you get a chance",
+    "Your Amazon order has shipped and will arrive tomorrow",
+    "I'll pay the electricity bill online tonight",
+    "Running a bit late, save me a seat",
+    "Hey, are we still meeting for lunch tomorrow at 2 PM?",
+]
+
+
+def builtin_corpus(seed: int):
+    rng = random.Random(seed)
+    texts, labels = [], []
+    for name, script in SCENARIOS.items():
+        for message in script:
+            texts.append(message)
+            labels.append(0 if name == 'benign' else 1)
+    for message in BENIGN:
+        texts.append(message)
+        labels.append(0)
+    # Light variations so both splits see every template
+    for i in range(len(texts)):
+        words = texts[i].split()
+        rng.shuffle(words)
+        texts.append(' '.join(words))
+        labels.append(labels[i])
+    return texts, labels
+
+
+def report(name, predicted, labels):
+    predicted = np.asarray(predicted, dtype=bool)
+    labels = np.asarray(labels) == 1
+    tp = int(np.sum(predicted & labels))
+    fp = int(np.sum(predicted & ~labels))
+    fn = int(np.sum(~predicted & labels))
+    accuracy = float(np.mean(predicted == labels))
+    precision = tp / (tp + fp) if tp + fp else 0.0
+    recall = tp / (tp + fn) if tp + fn else 0.0
+    print(f"{name:>10}: accuracy {accuracy:.3f} | precision {precision:.3f} | recall {recall:.3f} | "
+          f"false positives {fp}")
+
+
+def per_message_us(fn, texts, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn(texts)
+    return (time.perf_counter() - start) / (repeat * len(texts)) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--corpus', help='labeled JSONL (text/label)')
+    parser.add_argument('--model', help='model path from train_model.py (trained in memory if omitted)')
+    parser.add_argument('--batch-size', type=int, default=256)
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    texts, labels = load_corpus(args.corpus) if args.corpus else builtin_corpus(args.seed)
+    if args.model:
+        model = LinearModel.load(args.model)
+        test_texts, test_labels = texts, labels
+    else:
+        order = list(range(len(texts)))
+        random.Random(args.seed).shuffle(order)
+        half = len(order) // 2
+        train, test = order[:half], order[half:]
+        featurizer = HashedNgramFeaturizer()
+        weights, bias = fit(featurizer, [texts[i] for i in train], [labels[i] for i in train],
+                            epochs=300, learning_rate=2.0, l2=1e-4)
+        model = LinearModel(weights, bias, 0.5, featurizer)
+        model.threshold, _ = best_threshold(model.predict_proba([texts[i] for i in train]),
+                                            np.asarray([labels[i] for i in train]))
+        test_texts, test_labels = [texts[i] for i in test], [labels[i] for i in test]
+
+    detector = ScamDetector()
+    keyword = [detector.calculate_scam_score(t) for t in test_texts]
+    probabilities = model.predict_proba(test_texts)
+    scorer = MLScorer('', mode='blend')
+    scorer._model = model
+    blended = [scorer.combine(k, ScamDetector.SCAM_THRESHOLD, p) for k, p in zip(keyword, probabilities)]
+
+    print(f"Accuracy on {len(test_texts)} held-out messages")
+    report('keyword', [k >= ScamDetector.SCAM_THRESHOLD for k in keyword], test_labels)
+    report('ml', probabilities >= model.threshold, test_labels)
+    report('blend', [score >= threshold for score, threshold in blended], test_labels)
+
+    sample = (test_texts * (args.batch_size // max(len(test_texts), 1) + 1))[:args.batch_size]
+    keyword_us = per_message_us(lambda batch: [detector.calculate_scam_score(t) for t in batch], sample, 20)
+    single_us = per_message_us(lambda batch: [model.predict_proba([t]) for t in batch], sample, 5)
+    batch_us = per_message_us(model.predict_proba, sample, 20)
+    print(f"\nThroughput ({len(sample)} messages)")
+    print(f"   keyword: {keyword_us:8.1f} us/msg")
+    print(f"  ml x1   : {single_us:8.1f} us/msg (one message per call)")
+    print(f"  ml batch: {batch_us:8.1f} us/msg (one matrix pass per {len(sample)} messages)")
+
+
+if __name__ == '__main__':
+    main()
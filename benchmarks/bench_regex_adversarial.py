@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+Tail latency of scoring + intel extraction on hostile input: REGEX_MODE
+legacy (backtracking scanner over the whole body) vs hardened (linear
+scanner, body cut to MAX_MESSAGE_CHARS, chunked scans).
+
+The corpus is ordinary SMS with a small share of crafted bodies mixed in:
+long dotted/dashed runs that send the old UPI branch quadratic, digit and
+space runs, one-token URLs, all up to --max-chars characters. Reported per
+mode: p50 / p99 / p99.9 / max per message, and how many ordinary messages
+got a different result in hardened mode (should be 0).
+
+Run from the repo root:  python benchmarks/bench_regex_adversarial.py
+"""
+
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('LOG_LEVEL', 'WARNING')
+
+import app as honeypot
+import safe_regex
+from app import HoneyPotAgent, ScamDetector
+
+SMS = [
+    "URGENT ALERT: Your SBI bank account has been temporarily suspended. Verify at http://sbi-secure-verify.com or call 1800-123-4567.",
+    "Call me directly at +91-9876543210 or email rajesh.kumar@sbi-customer-care.com. We need CVV and expiry date.",
+    "Transfer Rs. 1000 to account 12345678901234 (IFSC: SBIN0001234) as processing fee.",
+    "Pay the delivery fee to upi id parcel.help@ybl within 2 hours or the package returns.",
+    "Congratulations! You won a lottery of Rs 25,00,000. Share your OTP and PAN to claim.",
+    "Hi, running late, will be there by 7. Order the usual for me.",
+]
+
+
+def adversarial(rng: random.Random, max_chars: int) -> str:
+    n = rng.randint(max_chars // 4, max_chars) // 2
+    return rng.choice([
+        lambda: 'a.' * n,
+        lambda: 'a.' * n + '@',
+        lambda: 'x-' * n + '@ybl',
+        lambda: '1 ' * n,
+        lambda: '9.' * n + 'x',
+        lambda: 'http://' + 'a' * (2 * n),
+        lambda: 'pay ' + '_.' * n + ' urgent blocked otp',
+    ])()
+
+
+def corpus(rng: random.Random, size: int, hostile_share: float, max_chars: int):
+    return [(True, adversarial(rng, max_chars)) if rng.random() < hostile_share else (False, rng.choice(SMS))
+            for _ in range(size)]
+
+
+def run(detector: ScamDetector, agent: HoneyPotAgent, text: str, clip: bool):
+    if clip:
+        text = honeypot.clip_message(text)
+    rules = ScamDetector.matcher()
+    categories = detector.match_categories(text.lower(), rules)
+    return sorted(categories), agent.extract_intelligence(text)
+
+
+def percentile(values, q: float) -> float:
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--messages', type=int, default=4000)
+    parser.add_argument('--hostile', type=float, default=0.005, help='share of crafted bodies')
+    parser.add_argument('--max-chars', type=int, default=16000)
+    args = parser.parse_args()
+    messages = corpus(random.Random(7), args.messages, args.hostile, args.max_chars)
+    print(f"{len(messages)} messages, {sum(h for h, _ in messages)} crafted (<= {args.max_chars} chars), "
+          f"hardened engine: {safe_regex.ENGINE}")
+
+    modes = {
+        'legacy': (ScamDetector(hardened=False), HoneyPotAgent(hardened=False), False),
+        'hardened': (ScamDetector(hardened=True), HoneyPotAgent(hardened=True), True),
+    }
+    results = {}
+    for name, (detector, agent, clip) in modes.items():
+        timings, outputs = [], []
+        for _, text in messages:
+            start = time.perf_counter()
+            outputs.append(run(detector, agent, text, clip))
+            timings.append((time.perf_counter() - start) * 1000)
+        timings.sort()
+        results[name] = outputs
+        print(f"{name:<9} p50 {statistics.median(timings):8.3f} ms   p99 {percentile(timings, 0.99):8.3f}   "
+              f"p99.9 {percentile(timings, 0.999):9.3f}   max {timings[-1]:9.1f}   total {sum(timings) / 1000:6.2f} s")
+
+    differ = sum(1 for (hostile, _), a, b in zip(messages, results['legacy'], results['hardened'])
+                 if not hostile and a != b)
+    print(f"ordinary messages with a different result in hardened mode: {differ}")
+
+
+if __name__ == '__main__':
+    main()
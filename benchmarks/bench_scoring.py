@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark: compiled ScamDetector matcher vs the original
+per-keyword re.search loop.
+
+Run from the repo root:  python benchmarks/bench_scoring.py
+"""
+
+import os
+import random
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import ScamDetector
+
+
+def legacy_score(message: str) -> float:
+    """The pre-matcher implementation, kept verbatim for comparison."""
+    if not message:
+        return 0.0
+    message_lower = message.lower()
+    total = 0.0
+    weights = {'urgency': 0.15, 'threats': 0.25, 'financial': 0.20,
+               'personal_info': 0.20, 'too_good': 0.10, 'impersonation': 0.10}
+    
+    for category, patterns in ScamDetector.SCAM_PATTERNS.items():
+        for pattern in patterns:
+            if re.search(pattern, message_lower):
+                total += weights.get(category, 0.1)
+                break
+    
+    if re.search(r'http[s]?://', message):
+        total += 0.15
+    if re.search(r'\d{10}', message):
+        total += 0.05
+    
+    return min(total, 1.0)
+
+
+SHORT_MESSAGES = [
+    "URGENT: Your SBI account has been blocked. Verify immediately at http://sbi-secure-verify.com",
+    "Congratulations! You have won a lottery prize. Share your UPI to claim.",
+    "Hey, are we still meeting for lunch tomorrow at 2 PM?",
+    "Your package is waiting. Pay delivery fee of Rs. 500 to 9876543210",
+    "Can you send me the notes from yesterday's class?",
+    "Your OTP is 482913. Do not share it with anyone.",
+]
+
+FILLER = ("the meeting notes are attached please review them before the call "
+          "and let me know if anything looks off in the quarterly numbers ")
+
+
+def build_corpus(seed: int = 42):
+    rng = random.Random(seed)
+    corpus = list(SHORT_MESSAGES)
+    for size in (2048, 8192, 32768):
+        # Clean long text: worst case for the legacy loop (every keyword scanned to the end)
+        corpus.append((FILLER * (size // len(FILLER) + 1))[:size])
+        # Long text with a scam payload buried near the end
+        body = (FILLER * (size // len(FILLER) + 1))[:size]
+        corpus.append(body + " " + rng.choice(SHORT_MESSAGES[:2]))
+    return corpus
+
+
+def bench(fn, corpus, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for message in corpus:
+            fn(message)
+    return time.perf_counter() - start
+
+
+def main():
+    detector = ScamDetector()
+    corpus = build_corpus()
+    short = corpus[:len(SHORT_MESSAGES)]
+    long_ = corpus[len(SHORT_MESSAGES):]
+    
+    mismatches = [m[:60] for m in corpus if abs(legacy_score(m) - detector.calculate_scam_score(m)) > 1e-9]
+    print(f"Parity: {len(corpus) - len(mismatches)}/{len(corpus)} messages score identically")
+    for m in mismatches:
+        print(f"  mismatch: {m!r}")
+    
+    for label, subset, repeat in (("short", short, 5000), ("long (2-32 KB)", long_, 50)):
+        old = bench(legacy_score, subset, repeat)
+        new = bench(detector.calculate_scam_score, subset, repeat)
+        n = len(subset) * repeat
+        print(f"{label:>16}: legacy {old / n * 1e6:9.1f} us/msg | "
+              f"compiled {new / n * 1e6:9.1f} us/msg | speedup {old / new:5.2f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+"""
+Turn throughput of the memory session store under threads: one lock stripe
+(every turn serialized, like a single store lock) vs striped per-session locks.
+
+Each thread plays turns on its own sessions. Inside a turn it runs the real
+apply_to_session() and then waits --io-ms, standing in for the I/O a
+gthread worker overlaps (journal write, SQLite, a slow callback payload).
+Scoring runs outside the session lock, as in analyze().
+
+Run from the repo root:  python benchmarks/bench_session_locks.py --threads 16
+"""
+
+import argparse
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('LOG_LEVEL', 'WARNING')
+
+import app as honeypot
+from session_store import SessionStore
+
+MESSAGE = "URGENT: Your SBI account is blocked. Pay Rs 500 to verify@ybl or call 9876543210"
+
+
+def run(stripes: int, threads: int, turns: int, io_seconds: float) -> float:
+    store = SessionStore(max_sessions=threads * 4, ttl_seconds=0, lock_stripes=stripes)
+
+    def worker(n: int):
+        for i in range(turns):
+            scored = honeypot.score_message(MESSAGE)
+            with store.session(f"t{n}-{i % 4}") as session:
+                honeypot.apply_to_session(session, MESSAGE, scored)
+                if io_seconds:
+                    time.sleep(io_seconds)
+
+    pool = [threading.Thread(target=worker, args=(n,)) for n in range(threads)]
+    start = time.perf_counter()
+    for t in pool:
+        t.start()
+    for t in pool:
+        t.join()
+    return threads * turns / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--threads', type=int, default=16)
+    parser.add_argument('--turns', type=int, default=200)
+    parser.add_argument('--io-ms', type=float, default=1.0)
+    args = parser.parse_args()
+    # GUVI callbacks would otherwise queue real HTTP posts
+    honeypot.GUVI_REPORT_AFTER_TURNS = 10 ** 9
+
+    for stripes in (1, 64):
+        rate = run(stripes, args.threads, args.turns, args.io_ms / 1000)
+        print(f"{stripes:>3} stripe(s): {rate:9.0f} turns/s   ({args.threads} threads, {args.io_ms} ms I/O per turn)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+Memory per live session: the old dict representation vs session_model.Session.
+
+Builds N sessions the way apply_to_session does. Each session is one of the
+loadgen scam scripts played for --turns turns, with session-specific numbers
+in the scammer text so nothing is shared by accident. Replies come from the
+rules table and intel from HoneyPotAgent. Campaign entities (the script's
+UPI handle, phishing link) repeat across sessions, as they do in practice.
+Reports traced bytes per session for each layout and checks that both
+serialize to the same JSON.
+
+Run from the repo root:  python benchmarks/bench_session_memory.py --sessions 100000
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+os.environ.setdefault('LOG_LEVEL', 'WARNING')
+
+from app import HoneyPotAgent
+from loadgen import SCENARIOS
+from session_model import INTEL_KEYS, Session
+
+SCRIPTS = [turns for name, turns in SCENARIOS.items() if name != 'benign']
+
+
+def legacy_session(session_id: str, now: float) -> dict:
+    """The pre-Session layout, kept verbatim for comparison."""
+    return {
+        'id': session_id,
+        'messages': [],
+        'intel': {key: {} for key in INTEL_KEYS},
+        'turns': 0,
+        'is_scam': False,
+        'created_at': now,
+        'updated_at': now
+    }
+
+
+def legacy_turn(session: dict, text: str, intel: dict, reply: str):
+    session['is_scam'] = True
+    session['messages'].append({'sender': 'scammer', 'text': text})
+    session['turns'] += 1
+    for key, values in intel.items():
+        bucket = session['intel'][key]
+        for value in values:
+            if value not in bucket:
+                bucket[value] = session['turns']
+    session['messages'].append({'sender': 'user', 'text': reply})
+
+
+def compact_turn(session: Session, text: str, intel: dict, reply: str):
+    session.is_scam = True
+    session.add_message('scammer', text)
+    session.turns += 1
+    for key, values in intel.items():
+        for value in values:
+            session.add_intel(key, value, session.turns)
+    session.add_message('user', reply)
+
+
+def conversation(n: int, turns: int):
+    """(text, intel, reply) per turn for session n; texts are unique per session."""
+    agent = HoneyPotAgent()
+    script = SCRIPTS[n % len(SCRIPTS)]
+    for turn in range(1, turns + 1):
+        text = f"{script[(turn - 1) % len(script)]} Ref {n:07d}-{turn}, call 98{n % 100000000:08d}"
+        yield text, agent.extract_intelligence(text), agent.generate_response(text, turn)
+
+
+def measure(label: str, sessions: int, turns: int, make, apply):
+    # Inputs are built inside the traced window, as request bodies would be;
+    # whatever a layout doesn't keep is freed again by `del inputs`
+    tracemalloc.start()
+    inputs = [list(conversation(n, turns)) for n in range(sessions)]
+    start = time.perf_counter()
+    live = {}
+    for n in range(sessions):
+        session = live[f'sess_{n:07d}'] = make(f'sess_{n:07d}', 1.0)
+        for text, intel, reply in inputs[n]:
+            apply(session, text, intel, reply)
+    elapsed = time.perf_counter() - start
+    del inputs
+    used, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{label:<8}: {used / sessions:8.0f} bytes/session   "
+          f"({used / 2 ** 20:7.1f} MB for {sessions:,}; build {elapsed / (sessions * turns) * 1e6:.2f} us/turn)")
+    return live, used / sessions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sessions', type=int, default=100000)
+    parser.add_argument('--turns', type=int, default=4)
+    args = parser.parse_args()
+
+    legacy, before = measure('dict', args.sessions, args.turns, legacy_session, legacy_turn)
+    compact, after = measure('Session', args.sessions, args.turns, Session, compact_turn)
+    print(f"saving  : {1 - after / before:.0%} ({before - after:.0f} bytes/session)")
+
+    mismatches = sum(json.dumps(legacy[sid]) != json.dumps(compact[sid].to_dict()) for sid in legacy)
+    print(f"JSON    : {len(legacy) - mismatches:,}/{len(legacy):,} sessions serialize identically")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+Cold-start cost of a worker: module import time and time to first request.
+
+- import: `python -c "import app"` in a fresh interpreter (median of --runs)
+- ready: spawn `python app.py` on a free port and poll /health until it answers
+- first request: the first /api/analyze/batch on that fresh process, which
+  pays for whatever was left lazy (first rule match, callback threads, ...)
+
+Run from the repo root:  python benchmarks/bench_startup.py
+
+With --max-import-ms / --max-ready-ms it exits 1 when the median is over
+budget, so CI can catch cold-start regressions.
+"""
+
+import argparse
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+import urllib.request
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Rate limits off and no journal: measure the app, not the environment
+ENV = {**os.environ, 'LOG_LEVEL': 'WARNING', 'RATE_LIMIT_KEY_PER_SEC': '0', 'RATE_LIMIT_IP_PER_SEC': '0',
+       'JOURNAL_DIR': '', 'GUVI_CALLBACK_URL': 'http://127.0.0.1:9/callback'}
+MESSAGE = "URGENT: Your SBI account has been blocked. Verify immediately at http://sbi-secure-verify.com"
+
+
+def import_ms() -> float:
+    start = time.perf_counter()
+    subprocess.run([sys.executable, '-c', 'import app'], cwd=ROOT, env=ENV, check=True,
+                   stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    return (time.perf_counter() - start) * 1000
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def post(url: str, body, api_key: str):
+    request = urllib.request.Request(url, data=json.dumps(body).encode(), method='POST',
+                                     headers={'Content-Type': 'application/json', 'x-api-key': api_key})
+    with urllib.request.urlopen(request, timeout=10) as response:
+        response.read()
+
+
+def serve_ms(timeout: float = 30):
+    """(ms until /health answers, ms for the first batch analyze) for a fresh `python app.py`."""
+    port = free_port()
+    base = f'http://127.0.0.1:{port}'
+    start = time.perf_counter()
+    server = subprocess.Popen([sys.executable, 'app.py'], cwd=ROOT, env={**ENV, 'PORT': str(port)},
+                              stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        while True:
+            try:
+                with urllib.request.urlopen(base + '/health', timeout=1) as response:
+                    response.read()
+                break
+            except OSError:
+                if server.poll() is not None or time.perf_counter() - start > timeout:
+                    raise RuntimeError('server did not come up')
+                time.sleep(0.005)
+        ready = (time.perf_counter() - start) * 1000
+
+        first = time.perf_counter()
+        post(base + '/api/analyze/batch', [{'sessionId': 'bench-startup', 'message': {'text': MESSAGE}}],
+             ENV.get('API_KEY', 'hackathon_2024_ai_honeypot_secure_key'))
+        return ready, (time.perf_counter() - first) * 1000
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--max-import-ms', type=float, default=0, help='fail if the median import is slower')
+    parser.add_argument('--max-ready-ms', type=float, default=0, help='fail if the median time to /health is slower')
+    args = parser.parse_args()
+
+    imports = sorted(import_ms() for _ in range(args.runs))
+    served = [serve_ms() for _ in range(args.runs)]
+    ready = sorted(r for r, _ in served)
+    first = sorted(f for _, f in served)
+
+    def row(label, values):
+        print(f"{label:<22}: median {statistics.median(values):7.1f} ms   "
+              f"min {values[0]:7.1f}   max {values[-1]:7.1f}   ({args.runs} runs)")
+        return statistics.median(values)
+
+    import_median = row('import app', imports)
+    ready_median = row('spawn -> /health', ready)
+    row('first analyze/batch', first)
+
+    failed = []
+    if args.max_import_ms and import_median > args.max_import_ms:
+        failed.append(f"import {import_median:.0f} ms > {args.max_import_ms:.0f} ms")
+    if args.max_ready_ms and ready_median > args.max_ready_ms:
+        failed.append(f"ready {ready_median:.0f} ms > {args.max_ready_ms:.0f} ms")
+    if failed:
+        print('over budget: ' + '; '.join(failed))
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,321 @@
+#!/usr/bin/env python3
+"""
+Load generator for the AI Honey-Pot API.
+
+Replays multi-turn scam conversations (the SBI / lottery / delivery scripts
+from demo.py and test_api.py, plus benign chatter) at a configurable
+concurrency and reports throughput and p50/p95/p99 latency per endpoint,
+along with the server's memory growth over the run.
+
+Against a running server (memory sampled from --server-pid on Linux):
+
+    python benchmarks/loadgen.py --url http://localhost:5000 --concurrency 64 --duration 30 --server-pid 1234
+
+Each turn is a one-item POST /api/analyze/batch, the route that scores
+messages and updates sessions (/api/analyze only returns the canned reply).
+A finished conversation's GET /api/session/<sid> must find the session, so a
+404 there counts as an error.
+
+A single load generator is one client as far as the rate limits go, so start
+the server with RATE_LIMIT_IP_PER_SEC=0 RATE_LIMIT_KEY_PER_SEC=0
+SESSION_TURNS_PER_MINUTE=0 (and MAX_IN_FLIGHT above --concurrency) unless
+shedding is what you are measuring.
+
+In-process through the Flask test client (no network, CI-friendly):
+
+    python benchmarks/loadgen.py --in-process --concurrency 8 --duration 10 --json results.json
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import threading
+import time
+import uuid
+from typing import Dict, List, Optional
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SCENARIOS = {
+    'sbi_account_block': [
+        "URGENT ALERT: Your SBI bank account has been temporarily suspended due to suspicious activity. Please verify your identity immediately by clicking: http://sbi-secure-verify.com or call our toll-free number 1800-123-4567. Failure to verify within 24 hours will result in permanent account closure.",
+        "Sir, this is very serious matter. Your account shows unauthorized transactions of Rs. 50,000. We need to verify it's not you. Please share your account number, card details and the OTP we will send to secure your account. Time is running out!",
+        "Our customer care executive Rajesh Kumar from Mumbai Main Branch is handling your case. You can call me directly at +91-9876543210 or email at rajesh.kumar@sbi-customer-care.com. We need CVV and expiry date to reverse the fraudulent transactions immediately.",
+        "Don't worry sir, we will protect your money. Just transfer Rs. 1000 to our security deposit account 12345678901234 (IFSC: SBIN0001234) as processing fee. Once verified, we will refund Rs. 51,000 including your lost amount. This is standard procedure.",
+    ],
+    'lottery': [
+        "Congratulations! You have won $50,000 in the international lottery. To claim your prize, please send your bank details to winnerprizes@lucky-lottery.com or call +1-800-555-0123",
+        "You are selected winner. Pay processing fee of Rs. 2500 via UPI to claims.desk@ybl today to release the prize.",
+        "This offer is guaranteed and free of tax. Share your OTP to confirm the transfer now.",
+    ],
+    'delivery': [
+        "Your package is waiting. Pay delivery fee of Rs. 500 to 9876543210 or visit http://fake-delivery.com",
+        "Delivery will be cancelled today if payment is not done. Use UPI parcel.help@ybl",
+    ],
+    'fake_bank_verify': [
+        "Your account has been suspended. Verify immediately by clicking this link: http://fake-bank-verify.com",
+        "This is urgent. You need to verify within 24 hours or your account will be permanently closed.",
+        "Please call our support team at +91-9876543210 or email us at support@scambank.com with your card details.",
+        "Send your card number, CVV, and OTP to verify. Our agent name is Rahul Kumar from Mumbai branch.",
+    ],
+    'benign': [
+        "Hey, are we still meeting for lunch tomorrow at 2 PM? Let me know if you need to reschedule.",
+        "Running a bit late, save me a seat.",
+    ],
+}
+
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(pct / 100 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def read_rss_kb(pid: int) -> Optional[int]:
+    """Resident set size of a process in KB, from /proc (Linux only)."""
+    try:
+        with open(f'/proc/{pid}/status') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1])
+    except OSError:
+        return None
+    return None
+
+
+# ==================== TARGETS ====================
+
+class HttpTarget:
+    """Talks to a running server; one keep-alive requests.Session per thread."""
+
+    def __init__(self, base_url: str, api_key: Optional[str] = None):
+        import requests
+        self.requests = requests
+        self.base_url = base_url.rstrip('/')
+        self.headers = {'x-api-key': api_key} if api_key else {}
+        self.local = threading.local()
+
+    def _http(self):
+        http = getattr(self.local, 'http', None)
+        if http is None:
+            http = self.local.http = self.requests.Session()
+        return http
+
+    def request(self, method: str, path: str, body=None) -> int:
+        try:
+            response = self._http().request(method, self.base_url + path, json=body,
+                                            headers=self.headers, timeout=30)
+            return response.status_code
+        except self.requests.RequestException:
+            return 0
+
+
+class InProcessTarget:
+    """Drives the Flask app through its test client: no sockets, no server process."""
+
+    def __init__(self, api_key: Optional[str] = None):
+        sys.path.insert(0, ROOT)
+        # Every test-client request shares one address and key; measure the
+        # pipeline, not the rate limiter (an explicit env setting still wins)
+        for name in ('RATE_LIMIT_IP_PER_SEC', 'RATE_LIMIT_KEY_PER_SEC', 'SESSION_TURNS_PER_MINUTE'):
+            os.environ.setdefault(name, '0')
+        from app import app
+        self.app = app
+        self.headers = {'x-api-key': api_key} if api_key else {}
+        self.local = threading.local()
+
+    def request(self, method: str, path: str, body=None) -> int:
+        client = getattr(self.local, 'client', None)
+        if client is None:
+            client = self.local.client = self.app.test_client()
+        return client.open(path, method=method, json=body, headers=self.headers).status_code
+
+
+# ==================== RECORDING ====================
+
+class Recorder:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latencies = {}
+        self.errors = {}
+
+    def record(self, endpoint: str, elapsed: float, ok: bool):
+        with self.lock:
+            self.latencies.setdefault(endpoint, []).append(elapsed)
+            if not ok:
+                self.errors[endpoint] = self.errors.get(endpoint, 0) + 1
+
+    def summary(self, elapsed: float) -> Dict:
+        out = {}
+        for endpoint, values in sorted(self.latencies.items()):
+            values = sorted(values)
+            out[endpoint] = {
+                'requests': len(values),
+                'errors': self.errors.get(endpoint, 0),
+                'rps': round(len(values) / elapsed, 1),
+                'p50_ms': round(percentile(values, 50) * 1000, 3),
+                'p95_ms': round(percentile(values, 95) * 1000, 3),
+                'p99_ms': round(percentile(values, 99) * 1000, 3),
+            }
+        return out
+
+
+class MemorySampler(threading.Thread):
+    def __init__(self, pid: int, interval: float):
+        super().__init__(daemon=True)
+        self.pid = pid
+        self.interval = interval
+        self.samples = []
+        self.stop_event = threading.Event()
+        self.started = time.perf_counter()
+
+    def run(self):
+        while not self.stop_event.is_set():
+            rss = read_rss_kb(self.pid)
+            if rss is not None:
+                self.samples.append((round(time.perf_counter() - self.started, 2), rss))
+            self.stop_event.wait(self.interval)
+
+    def stop(self) -> Dict:
+        self.stop_event.set()
+        self.join()
+        if not self.samples:
+            return {'available': False}
+        return {
+            'available': True,
+            'start_rss_kb': self.samples[0][1],
+            'end_rss_kb': self.samples[-1][1],
+            'peak_rss_kb': max(rss for _, rss in self.samples),
+            'growth_kb': self.samples[-1][1] - self.samples[0][1],
+            'samples': self.samples,
+        }
+
+
+# ==================== DRIVER ====================
+
+class Conversations:
+    """Hands out (session_id, message) turns.
+
+    With probability reuse_ratio the next turn continues an open
+    conversation; otherwise a new session starts on a random scenario.
+    """
+
+    def __init__(self, reuse_ratio: float, seed: int):
+        self.reuse_ratio = reuse_ratio
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.open = []
+        self.names = sorted(SCENARIOS)
+
+    def next_turn(self):
+        with self.lock:
+            if self.open and self.rng.random() < self.reuse_ratio:
+                index = self.rng.randrange(len(self.open))
+                session_id, scenario, turn = self.open[index]
+            else:
+                session_id = f"load_{uuid.uuid4().hex[:12]}"
+                scenario, turn = self.rng.choice(self.names), 0
+                self.open.append((session_id, scenario, turn))
+                index = len(self.open) - 1
+
+            script = SCENARIOS[scenario]
+            finished = turn + 1 >= len(script)
+            if finished:
+                self.open[index] = self.open[-1]
+                self.open.pop()
+            else:
+                self.open[index] = (session_id, scenario, turn + 1)
+            return session_id, script[turn], finished
+
+
+def run_load(target, concurrency: int, duration: float, reuse_ratio: float,
+             stats_every: int, seed: int) -> Dict:
+    recorder = Recorder()
+    conversations = Conversations(reuse_ratio, seed)
+    deadline = time.perf_counter() + duration
+
+    def call(endpoint: str, method: str, path: str, body=None):
+        start = time.perf_counter()
+        status = target.request(method, path, body)
+        recorder.record(endpoint, time.perf_counter() - start, status == 200)
+
+    def worker(worker_id: int):
+        sent = 0
+        while time.perf_counter() < deadline:
+            session_id, message, finished = conversations.next_turn()
+            call('POST /api/analyze/batch', 'POST', '/api/analyze/batch',
+                 [{'sessionId': session_id, 'message': message}])
+            if finished:
+                call('GET /api/session/<sid>', 'GET', f'/api/session/{session_id}')
+            sent += 1
+            if stats_every and sent % stats_every == 0:
+                call('GET /api/stats', 'GET', '/api/stats')
+
+    threads = [threading.Thread(target=worker, args=(n,)) for n in range(concurrency)]
+    started = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - started
+
+    summary = recorder.summary(elapsed)
+    total = sum(e['requests'] for e in summary.values())
+    return {'elapsed_s': round(elapsed, 2), 'total_requests': total,
+            'total_rps': round(total / elapsed, 1), 'endpoints': summary}
+
+
+def print_report(result: Dict):
+    print(f"\n{'=' * 78}")
+    print(f"{result['total_requests']} requests in {result['elapsed_s']} s "
+          f"({result['total_rps']} req/s)")
+    print(f"{'=' * 78}")
+    print(f"{'endpoint':<26}{'reqs':>8}{'err':>6}{'req/s':>9}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    for endpoint, e in result['endpoints'].items():
+        print(f"{endpoint:<26}{e['requests']:>8}{e['errors']:>6}{e['rps']:>9}"
+              f"{e['p50_ms']:>10}{e['p95_ms']:>10}{e['p99_ms']:>10}")
+    memory = result.get('memory', {})
+    if memory.get('available'):
+        print(f"\nServer RSS: {memory['start_rss_kb'] / 1024:.1f} MB -> {memory['end_rss_kb'] / 1024:.1f} MB "
+              f"(peak {memory['peak_rss_kb'] / 1024:.1f} MB, growth {memory['growth_kb'] / 1024:+.1f} MB)")
+    else:
+        print("\nServer RSS: not sampled (pass --server-pid on Linux, or use --in-process)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--url', default='http://localhost:5000', help='base URL of a running server')
+    parser.add_argument('--in-process', action='store_true', help='drive the Flask app via its test client')
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--duration', type=float, default=10.0, help='seconds')
+    parser.add_argument('--reuse-ratio', type=float, default=0.7,
+                        help='probability a turn continues an open conversation instead of starting one')
+    parser.add_argument('--stats-every', type=int, default=50, help='GET /api/stats every N turns per worker (0 = never)')
+    parser.add_argument('--server-pid', type=int, help='pid whose RSS is sampled (defaults to self with --in-process)')
+    parser.add_argument('--sample-interval', type=float, default=1.0)
+    parser.add_argument('--api-key', default=None)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--json', dest='json_path', help='also write the full result to this file')
+    args = parser.parse_args()
+
+    target = InProcessTarget(args.api_key) if args.in_process else HttpTarget(args.url, args.api_key)
+    pid = args.server_pid or (os.getpid() if args.in_process else None)
+    sampler = MemorySampler(pid, args.sample_interval) if pid else None
+    if sampler:
+        sampler.start()
+
+    result = run_load(target, args.concurrency, args.duration, args.reuse_ratio, args.stats_every, args.seed)
+    result['config'] = {k: v for k, v in vars(args).items() if k != 'api_key'}
+    result['memory'] = sampler.stop() if sampler else {'available': False}
+
+    print_report(result)
+    if args.json_path:
+        with open(args.json_path, 'w') as f:
+            json.dump(result, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,290 @@
+#!/usr/bin/env python3
+"""
+Offline bulk analysis of message dumps with the API's scoring logic.
+
+Streams a JSONL or CSV file through ScamDetector (via the same normalized
+verdict cache as /api/analyze/batch), the ML scorer selected by SCORER_MODE
+(one vectorised score_batch per chunk, combined with the keyword score as
+the API does) and HoneyPotAgent.extract_intelligence, fanned out over a
+process pool in chunks. Workers import only the detection modules, not the
+app, and load RULES_PATH once at start. At most --workers x 2 chunks are in
+flight and each worker's verdict cache is capped at --cache-size entries,
+so memory stays flat however large the input is. Results are written in
+input order.
+
+    python bulk_analyze.py sms_export.jsonl -o scored.jsonl --workers 8
+    python bulk_analyze.py sms_export.csv --text-field body -o scored.csv
+    python bulk_analyze.py sms_export.jsonl -o scored.parquet   # needs pyarrow
+
+JSONL input accepts the API's body shapes ({"message": {"text": ...}},
+{"message": "..."}, {"text": "..."}) or a named --text-field. Each output row
+has the input line number, id (if --id-field is present), score, verdict,
+matched categories and extracted intel. Throughput (messages/sec overall
+and per worker) is reported on stderr.
+"""
+
+import argparse
+import csv
+import io
+import json
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+from typing import Dict, Iterator, List, Optional, Tuple
+
+os.environ.setdefault('LOG_LEVEL', 'WARNING')
+
+try:
+    import orjson
+
+    def _dumps(obj) -> bytes:
+        return orjson.dumps(obj)
+    _loads = orjson.loads
+except ImportError:
+    def _dumps(obj) -> bytes:
+        return json.dumps(obj, separators=(',', ':')).encode('utf-8')
+    _loads = json.loads
+
+CSV_COLUMNS = ('line', 'id', 'score', 'is_scam', 'categories',
+               'phoneNumbers', 'upiIds', 'phishingLinks', 'bankAccounts', 'lookalikeDomains')
+
+# Per-worker state, built once by init_worker
+_worker = {}
+
+
+# ==================== INPUT ====================
+
+def read_jsonl(path: str) -> Iterator[Tuple[int, str]]:
+    with open(path, 'rb') as f:
+        for line_no, line in enumerate(f, 1):
+            if line.strip():
+                yield line_no, line
+
+
+def read_csv(path: str) -> Iterator[Tuple[int, Dict]]:
+    with open(path, newline='', encoding='utf-8') as f:
+        for line_no, row in enumerate(csv.DictReader(f), 2):
+            yield line_no, row
+
+
+def chunked(records: Iterator, size: int) -> Iterator[List]:
+    while True:
+        chunk = list(islice(records, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def extract_text(record: Dict, text_field: Optional[str]) -> str:
+    if text_field:
+        value = record.get(text_field, '')
+        return value if isinstance(value, str) else ''
+    message = record.get('message')
+    if isinstance(message, dict):
+        return message.get('text', '') or ''
+    if isinstance(message, str):
+        return message
+    return record.get('text', '') or ''
+
+
+# ==================== WORKER ====================
+
+def init_worker(cache_size: int = 50000):
+    from detector import (ML_BLEND_WEIGHT, ML_MODEL_PATH, RULES_PATH, SCORER_MODE, HoneyPotAgent, ScamDetector,
+                          clip_text)
+    from ml_scorer import MLScorer
+    from rules import RuleManager
+    from verdict_cache import VerdictCache
+    # Without a rules file the in-code tables stay active, as in the API
+    RuleManager(RULES_PATH, ScamDetector.install_rules).load()
+    _worker['detector'] = ScamDetector()
+    _worker['agent'] = HoneyPotAgent()
+    _worker['cache'] = VerdictCache(max_entries=cache_size)
+    _worker['scorer'] = MLScorer(ML_MODEL_PATH, mode=SCORER_MODE, blend_weight=ML_BLEND_WEIGHT)
+    _worker['rules'] = ScamDetector.matcher()
+    _worker['clip'] = clip_text
+
+
+def analyze_record(record: Dict, text: str, probability: Optional[float], line_no: int,
+                   id_field: Optional[str]) -> Dict:
+    detector, agent, cache, rules = _worker['detector'], _worker['agent'], _worker['cache'], _worker['rules']
+    categories = cache.categories(text, rules, lambda t: detector.match_categories(t, rules)) if text else {}
+    score = min(sum(categories.values(), 0.0), 1.0)
+    score, threshold = _worker['scorer'].combine(score, rules.threshold, probability)
+    is_scam = score >= threshold
+    intel = cache.intel(text, rules, agent.extract_intelligence) if is_scam else None
+    return {
+        'line': line_no,
+        'id': record.get(id_field) if id_field else None,
+        'score': round(score, 4),
+        'is_scam': is_scam,
+        'categories': sorted(categories),
+        'intel': intel
+    }
+
+
+def process_chunk(chunk: List[Tuple[int, object]], text_field: Optional[str], id_field: Optional[str],
+                  output_format: str) -> Tuple[int, int, object]:
+    """Returns (messages, scams, payload): encoded bytes for jsonl/csv, columns for parquet."""
+    rows, parsed = [], []
+    for line_no, raw in chunk:
+        if isinstance(raw, bytes):
+            try:
+                record = _loads(raw)
+            except ValueError:
+                record = None
+            if not isinstance(record, dict):
+                rows.append((line_no, {'line': line_no, 'error': 'invalid JSON object'}))
+                continue
+        else:
+            record = raw
+        parsed.append((line_no, record, _worker['clip'](extract_text(record, text_field))))
+
+    # One matrix pass scores the chunk when the ML scorer is enabled; empty texts score 0
+    texts = [text for _, _, text in parsed if text]
+    probabilities = iter(_worker['scorer'].score_batch(texts) or [None] * len(texts))
+    for line_no, record, text in parsed:
+        probability = next(probabilities) if text else None
+        rows.append((line_no, analyze_record(record, text, probability, line_no, id_field)))
+    rows = [row for _, row in sorted(rows, key=lambda item: item[0])]
+    scams = sum(1 for row in rows if row.get('is_scam'))
+    return len(rows), scams, encode(rows, output_format)
+
+
+# ==================== OUTPUT ====================
+
+def flat_row(row: Dict) -> Dict:
+    intel = row.get('intel') or {}
+    flat = {key: row.get(key) for key in ('line', 'id', 'score', 'is_scam')}
+    flat['categories'] = '|'.join(row.get('categories', ()))
+    for key in CSV_COLUMNS[5:]:
+        flat[key] = '|'.join(intel.get(key, ()))
+    return flat
+
+
+def encode(rows: List[Dict], output_format: str):
+    if output_format == 'jsonl':
+        return b''.join(_dumps(row) + b'\n' for row in rows)
+    flat = [flat_row(row) for row in rows]
+    if output_format == 'csv':
+        buffer = io.StringIO()
+        csv.DictWriter(buffer, CSV_COLUMNS).writerows(flat)
+        return buffer.getvalue().encode('utf-8')
+    return {column: [row[column] for row in flat] for column in CSV_COLUMNS}
+
+
+class Writer:
+    def __init__(self, path: Optional[str], output_format: str):
+        self.format = output_format
+        if output_format == 'parquet':
+            try:
+                import pyarrow
+                import pyarrow.parquet
+            except ImportError:
+                sys.exit("parquet output needs pyarrow (pip install pyarrow); use -f jsonl or -f csv")
+            self.pa = pyarrow
+            self.parquet_writer = None
+            self.path = path
+            return
+        self.out = open(path, 'wb') if path else sys.stdout.buffer
+        if output_format == 'csv':
+            self.out.write((','.join(CSV_COLUMNS) + '\r\n').encode('utf-8'))
+
+    def write(self, payload):
+        if self.format != 'parquet':
+            self.out.write(payload)
+            return
+        # One row group per chunk keeps the writer's memory bounded
+        table = self.pa.table(payload)
+        if self.parquet_writer is None:
+            self.parquet_writer = self.pa.parquet.ParquetWriter(self.path, table.schema)
+        self.parquet_writer.write_table(table)
+
+    def close(self):
+        if self.format == 'parquet':
+            if self.parquet_writer is not None:
+                self.parquet_writer.close()
+        elif self.out is not sys.stdout.buffer:
+            self.out.close()
+        else:
+            self.out.flush()
+
+
+# ==================== DRIVER ====================
+
+def run(records: Iterator, writer: Writer, workers: int, chunk_size: int, cache_size: int,
+        text_field: Optional[str], id_field: Optional[str]) -> Tuple[int, int]:
+    messages = scams = 0
+    chunks = chunked(records, chunk_size)
+    if workers <= 1:
+        init_worker(cache_size)
+        for chunk in chunks:
+            count, scam_count, payload = process_chunk(chunk, text_field, id_field, writer.format)
+            writer.write(payload)
+            messages += count
+            scams += scam_count
+        return messages, scams
+
+    # Bounded window of in-flight chunks, drained in submission order
+    with ProcessPoolExecutor(max_workers=workers, initializer=init_worker, initargs=(cache_size,)) as pool:
+        pending = deque()
+        for chunk in chunks:
+            pending.append(pool.submit(process_chunk, chunk, text_field, id_field, writer.format))
+            if len(pending) >= workers * 2:
+                count, scam_count, payload = pending.popleft().result()
+                writer.write(payload)
+                messages += count
+                scams += scam_count
+        while pending:
+            count, scam_count, payload = pending.popleft().result()
+            writer.write(payload)
+            messages += count
+            scams += scam_count
+    return messages, scams
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('input', help='.jsonl or .csv file')
+    parser.add_argument('-o', '--output', help='output file (default: JSONL to stdout)')
+    parser.add_argument('-f', '--format', choices=('jsonl', 'csv', 'parquet'),
+                        help='output format (default: from the output extension, else jsonl)')
+    parser.add_argument('--input-format', choices=('jsonl', 'csv'), help='default: from the input extension')
+    parser.add_argument('--text-field', help='field/column holding the message text')
+    parser.add_argument('--id-field', help='field/column copied to the output as "id"')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--chunk-size', type=int, default=2000)
+    parser.add_argument('--cache-size', type=int, default=50000,
+                        help='verdict cache entries per worker (bounds memory; 0 disables)')
+    args = parser.parse_args()
+
+    input_format = args.input_format or ('csv' if args.input.lower().endswith('.csv') else 'jsonl')
+    output_format = args.format
+    if output_format is None:
+        extension = os.path.splitext(args.output or '')[1].lstrip('.').lower()
+        output_format = extension if extension in ('csv', 'parquet') else 'jsonl'
+    if output_format == 'parquet' and not args.output:
+        sys.exit("parquet output needs -o")
+    text_field = args.text_field or ('text' if input_format == 'csv' else None)
+
+    records = read_csv(args.input) if input_format == 'csv' else read_jsonl(args.input)
+    writer = Writer(args.output, output_format)
+    start = time.perf_counter()
+    try:
+        messages, scams = run(records, writer, args.workers, args.chunk_size, args.cache_size,
+                              text_field, args.id_field)
+    finally:
+        writer.close()
+    elapsed = time.perf_counter() - start
+
+    rate = messages / elapsed if elapsed else 0.0
+    print(f"{messages:,} messages ({scams:,} scams) in {elapsed:.2f} s: "
+          f"{rate:,.0f} msgs/sec, {rate / max(args.workers, 1):,.0f} msgs/sec per worker "
+          f"({args.workers} worker{'s' if args.workers != 1 else ''})", file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,186 @@
+"""
+Background dispatcher for the GUVI result callback.
+
+Payloads are queued per session and POSTed by a few worker threads that
+share one pooled requests.Session (keep-alive), so the analyze request
+path never waits on the network. Repeated updates for a session that is
+still queued are coalesced into the latest payload. A session has at most
+one delivery in flight: an update that arrives while one is being posted
+(or retried) is parked and sent once it finishes, so an older payload can
+never land after a newer one.
+
+Nothing heavy happens at construction: requests is imported by prepare()
+and the worker threads are started by start() (or the first submit()),
+in whichever process actually sends. A pre-fork master can therefore
+build the dispatcher and every forked worker gets its own threads.
+"""
+
+import logging
+import os
+import threading
+import time
+from collections import deque
+from typing import Dict
+
+logger = logging.getLogger(__name__)
+
+
+class CallbackDispatcher:
+    """Bounded, coalescing callback queue drained by worker threads.
+
+    submit() never blocks: when the queue is full the update is dropped and
+    counted. Failed posts are retried with exponential backoff
+    (backoff_base * 2**attempt seconds) up to max_retries times.
+    """
+
+    def __init__(self, url: str, workers: int = 2, max_queue: int = 1000,
+                 max_retries: int = 3, backoff_base: float = 0.5, timeout: float = 5,
+                 http=None):
+        """http: a requests.Session-like object to post with (default: a pooled one)."""
+        self.url = url
+        self.workers = workers
+        self.max_queue = max_queue
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.timeout = timeout
+        self.http = http
+        self._request_errors = ()
+
+        self._order = deque()
+        self._pending = {}
+        # Sessions with a delivery in progress; their _pending entry is parked, not in _order
+        self._sending = set()
+        self._cond = threading.Condition()
+        self._closed = False
+        self.in_flight = 0
+        self.counters = {'submitted': 0, 'coalesced': 0, 'dropped': 0,
+                         'succeeded': 0, 'failed': 0, 'retries': 0}
+        self.latency = {'count': 0, 'total_ms': 0.0, 'max_ms': 0.0}
+
+        self._workers = []
+        self._pid = None
+
+    def prepare(self):
+        """Import requests and build the pooled session; idempotent."""
+        if self._request_errors:
+            return
+        import requests
+        from requests.adapters import HTTPAdapter
+        if self.http is None:
+            http = requests.Session()
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.workers)
+            http.mount('http://', adapter)
+            http.mount('https://', adapter)
+            self.http = http
+        self._request_errors = (requests.RequestException,)
+
+    def start(self):
+        """Start the worker threads in this process (again after a fork)."""
+        with self._cond:
+            if self._pid == os.getpid() or self._closed:
+                return
+            self.prepare()
+            self._pid = os.getpid()
+            self._workers = [threading.Thread(target=self._run, name=f'callback-{i}', daemon=True)
+                             for i in range(self.workers)]
+            for worker in self._workers:
+                worker.start()
+
+    def submit(self, session_id: str, payload: Dict) -> bool:
+        """Queue the latest payload for a session; returns False if it was dropped."""
+        if self._pid != os.getpid():
+            self.start()
+        with self._cond:
+            if self._closed:
+                self.counters['dropped'] += 1
+                return False
+            if session_id in self._pending:
+                self._pending[session_id] = payload
+                self.counters['coalesced'] += 1
+                return True
+            if len(self._pending) >= self.max_queue:
+                self.counters['dropped'] += 1
+                return False
+            self._pending[session_id] = payload
+            self.counters['submitted'] += 1
+            if session_id not in self._sending:
+                self._order.append(session_id)
+                self._cond.notify()
+            return True
+
+    def stats(self) -> Dict:
+        with self._cond:
+            count = self.latency['count']
+            return {
+                'queue_depth': len(self._pending),
+                'in_flight': self.in_flight,
+                **self.counters,
+                'latency_avg_ms': round(self.latency['total_ms'] / count, 2) if count else 0.0,
+                'latency_max_ms': round(self.latency['max_ms'], 2)
+            }
+
+    def shutdown(self, timeout: float = 10) -> bool:
+        """Stop accepting work and wait for the queue to drain.
+
+        Returns True if everything queued was delivered (or gave up) in time.
+        """
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        for worker in self._workers:
+            worker.join(max(0.0, deadline - time.monotonic()))
+        return not any(worker.is_alive() for worker in self._workers)
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._order and not self._closed:
+                    self._cond.wait()
+                if not self._order:
+                    return
+                session_id = self._order.popleft()
+                payload = self._pending.pop(session_id)
+                self._sending.add(session_id)
+                self.in_flight += 1
+            try:
+                self._deliver(session_id, payload)
+            finally:
+                with self._cond:
+                    self.in_flight -= 1
+                    self._sending.discard(session_id)
+                    if session_id in self._pending:
+                        self._order.append(session_id)
+                        self._cond.notify()
+
+    def _deliver(self, session_id: str, payload: Dict):
+        for attempt in range(self.max_retries + 1):
+            start = time.perf_counter()
+            status = None
+            try:
+                status = self.http.post(self.url, json=payload, timeout=self.timeout).status_code
+            except self._request_errors as e:
+                logger.warning("GUVI callback error for %s: %s", session_id, e)
+            elapsed_ms = (time.perf_counter() - start) * 1000
+
+            ok = status is not None and status < 400
+            # Client errors will not succeed on retry; timeouts and 5xx might
+            retry = not ok and (status is None or status >= 500) and attempt < self.max_retries
+            with self._cond:
+                self.latency['count'] += 1
+                self.latency['total_ms'] += elapsed_ms
+                self.latency['max_ms'] = max(self.latency['max_ms'], elapsed_ms)
+                if ok:
+                    self.counters['succeeded'] += 1
+                elif retry:
+                    self.counters['retries'] += 1
+                else:
+                    self.counters['failed'] += 1
+
+            if ok:
+                logger.info("Sent to GUVI: %s", session_id)
+                return
+            if not retry:
+                logger.error("GUVI callback failed for %s (status %s)", session_id, status)
+                return
+            time.sleep(self.backoff_base * (2 ** attempt))
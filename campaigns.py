@@ -0,0 +1,316 @@
+"""
+Near-duplicate index that groups messages into scam campaigns.
+
+A campaign sends one template with small edits: a different phone number,
+name, amount or link. Messages are compared as sets of features: their
+words and word pairs, with case folded and digits, links and UPI handles
+masked. Two variants of one template share most of these, so their Jaccard
+similarity is high, while different templates share only stopwords.
+
+Each message gets a MinHash signature of NUM_HASHES slots, built with
+one-permutation hashing. Every feature is hashed once. The hash picks a
+slot and the slot keeps its smallest value; an empty slot borrows from the
+next filled one (rotation densification). The share of equal slots between
+two signatures estimates their Jaccard similarity, so a message costs one
+pass over its features and not NUM_HASHES passes.
+
+A campaign is represented by the signature of its first message. It is
+filed under BANDS keys, each the hash of ROWS consecutive slots. Variants
+share a band key with high probability (1 - (1 - J^ROWS)^BANDS: 0.91 at
+J = 0.6, 0.98 at J = 0.7), while unrelated messages rarely do (0.08 at
+J = 0.2). Candidates from the message's own band keys are verified with
+the slot estimate against min_similarity.
+
+Memory is bounded by max_campaigns. Campaigns are kept in last-seen order;
+those idle longer than max_age_seconds, then the least recent ones over
+the cap, are dropped as messages arrive.
+
+A campaign also collects verdicts. Once confident_size messages scored
+under the same RuleSet have all agreed, verdict() returns the average so
+the pipeline can skip model scoring for later members. Any new RuleSet
+starts the count over. Members only need to be similar, and links,
+handles and numbers are masked in the signature, so a member's keyword,
+link and number hits must equal the last scored member's before the
+verdict is reused: a benign template with "verify otp" appended, or with
+a lookalike link, is scored in full. Every recheck_every-th member that
+could be skipped is scored as well, so the votes keep coming in and a
+campaign that starts to disagree stops being skipped.
+
+Feature hashes use Python's str hash, so signatures are stable within a
+process (and across forked workers) but not between runs.
+"""
+
+import heapq
+import operator
+import re
+import threading
+import time
+from array import array
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+NUM_HASHES = 30
+ROWS = 3
+BANDS = NUM_HASHES // ROWS
+# Slot values are below 2**63 / NUM_HASHES < 2**59; a borrowed one carries its
+# distance (< NUM_HASHES) in the bits above, which still fit in 64
+HASH_MASK = (1 << 63) - 1
+DISTANCE_SHIFT = 59
+EMPTY = 1 << 64
+
+# Links and UPI/e-mail handles change between sends; each becomes one placeholder word
+LINK = re.compile(r'http[s]?://\S+|www\.\S+|[\w.\-]+@[\w.\-]+')
+WORD = re.compile(r'[^\W\d_]+|\d+')
+DIGITS = re.compile(r'\d+')
+
+SAMPLE_CHARS = 160
+MAX_INTEL_VALUES = 200
+MAX_SESSIONS = 1000
+
+
+def features(text: str) -> List[str]:
+    """Words and adjacent word pairs of the masked, case-folded text."""
+    words = WORD.findall(DIGITS.sub('0', LINK.sub(' 0link ', text.casefold())))
+    return words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+
+
+def minhash(hashes) -> Optional[array]:
+    """One-permutation MinHash signature of a set of 64-bit hashes; None if empty."""
+    slots = [EMPTY] * NUM_HASHES
+    for h in hashes:
+        slot, value = h % NUM_HASHES, h // NUM_HASHES
+        if value < slots[slot]:
+            slots[slot] = value
+    if EMPTY in slots:
+        if min(slots) == EMPTY:
+            return None
+        filled = list(slots)
+        # Walk the ring right to left, carrying the nearest filled slot to the right
+        nearest, distance = None, 0
+        for i in range(2 * NUM_HASHES - 1, -1, -1):
+            value = slots[i % NUM_HASHES]
+            if value != EMPTY:
+                nearest, distance = value, 0
+            else:
+                distance += 1
+                if i < NUM_HASHES and nearest is not None:
+                    filled[i] = nearest | distance << DISTANCE_SHIFT
+        slots = filled
+    return array('Q', slots)
+
+
+def signature(text: str) -> Optional[array]:
+    return minhash({hash(feature) & HASH_MASK for feature in features(text)})
+
+
+def band_keys(sig: array) -> List[int]:
+    return [hash(tuple(sig[band * ROWS:(band + 1) * ROWS])) for band in range(BANDS)]
+
+
+def similarity(a: array, b: array) -> float:
+    """Estimated Jaccard similarity: the share of equal slots."""
+    return sum(map(operator.eq, a, b)) / NUM_HASHES
+
+
+class Campaign:
+    __slots__ = ('id', 'signature', 'size', 'first_seen', 'last_seen', 'sample',
+                 'rules', 'votes', 'scam_votes', 'score_sum', 'categories', 'skipped',
+                 'intel', 'intel_values', 'sessions')
+
+    def __init__(self, campaign_id: int, sig: array, now: float, sample: str):
+        self.id = campaign_id
+        self.signature = sig
+        self.size = 0
+        self.first_seen = now
+        self.last_seen = now
+        self.sample = sample[:SAMPLE_CHARS]
+        # Verdicts count only while scored under this RuleSet
+        self.rules = None
+        self.votes = 0
+        self.scam_votes = 0
+        self.score_sum = 0.0
+        # Category hits of the last scored member
+        self.categories = None
+        self.skipped = 0
+        # type -> {value: messages it appeared in}; created on the first scam
+        self.intel = None
+        self.intel_values = 0
+        self.sessions = None
+
+    def to_dict(self, intel_limit: int = 10) -> Dict:
+        intel = {}
+        for kind, values in (self.intel or {}).items():
+            top = heapq.nlargest(intel_limit, values.items(), key=lambda item: item[1])
+            intel[kind] = [{'value': value, 'messages': count} for value, count in top]
+        return {
+            'campaign_id': self.id,
+            'size': self.size,
+            'first_seen': self.first_seen,
+            'last_seen': self.last_seen,
+            'sample': self.sample,
+            'verdict': None if not self.votes else ('scam' if self.scam_votes * 2 > self.votes else 'not_scam'),
+            'scam_ratio': round(self.scam_votes / self.votes, 4) if self.votes else None,
+            'mean_score': round(self.score_sum / self.votes, 4) if self.votes else None,
+            'sessions': len(self.sessions or ()),
+            'shared_intel': intel
+        }
+
+
+class CampaignIndex:
+    """Thread-safe LSH index of campaigns; max_campaigns=0 disables it."""
+
+    def __init__(self, max_campaigns: int = 50000, max_age_seconds: float = 86400, min_similarity: float = 0.5,
+                 confident_size: int = 5, recheck_every: int = 10, clock=time.time):
+        self.max_campaigns = max_campaigns
+        self.max_age_seconds = max_age_seconds
+        self.min_similarity = min_similarity
+        self.confident_size = confident_size
+        self.recheck_every = recheck_every
+        self.clock = clock
+        self._campaigns: 'OrderedDict[int, Campaign]' = OrderedDict()
+        self._bands: List[Dict[int, List[Campaign]]] = [{} for _ in range(BANDS)]
+        self._next_id = 1
+        self._lock = threading.Lock()
+        self.assigned = 0
+        self.created = 0
+        self.evicted = 0
+        self.short_circuits = 0
+        self.rechecks = 0
+
+    def __len__(self) -> int:
+        return len(self._campaigns)
+
+    def assign(self, text: str) -> Optional[Campaign]:
+        """The campaign text belongs to, created if no campaign is close enough."""
+        if self.max_campaigns <= 0 or not text:
+            return None
+        sig = signature(text)
+        return None if sig is None else self.assign_signature(sig, text)
+
+    def assign_signature(self, sig: array, sample: str = '') -> Campaign:
+        keys = band_keys(sig)
+        with self._lock:
+            now = self.clock()
+            self.assigned += 1
+            best, best_similarity, seen = None, self.min_similarity, set()
+            for table, key in zip(self._bands, keys):
+                for campaign in table.get(key, ()):
+                    if campaign.id in seen:
+                        continue
+                    seen.add(campaign.id)
+                    score = similarity(campaign.signature, sig)
+                    if score >= best_similarity:
+                        best, best_similarity = campaign, score
+                if best_similarity == 1.0:
+                    break
+            if best is None:
+                best = Campaign(self._next_id, sig, now, sample)
+                self._next_id += 1
+                self.created += 1
+                self._campaigns[best.id] = best
+                for table, key in zip(self._bands, keys):
+                    table.setdefault(key, []).append(best)
+            else:
+                self._campaigns.move_to_end(best.id)
+            best.size += 1
+            best.last_seen = now
+            self._evict(now)
+            return best
+
+    def _evict(self, now: float):
+        horizon = now - self.max_age_seconds if self.max_age_seconds > 0 else None
+        while self._campaigns:
+            oldest = next(iter(self._campaigns.values()))
+            if len(self._campaigns) <= self.max_campaigns and (horizon is None or oldest.last_seen >= horizon):
+                break
+            self._campaigns.popitem(last=False)
+            for table, key in zip(self._bands, band_keys(oldest.signature)):
+                bucket = table[key]
+                bucket.remove(oldest)
+                if not bucket:
+                    del table[key]
+            self.evicted += 1
+
+    def verdict(self, campaign: Optional[Campaign], rules: Any,
+                categories: Dict[str, float]) -> Optional[Tuple[float, bool]]:
+        """(mean score, is_scam) to reuse for a member with these category hits, or None to score it.
+
+        Reused only when the campaign's verdicts under rules are unanimous and
+        numerous and its last scored member had the same hits; every
+        recheck_every-th such member is still scored.
+        """
+        if campaign is None or self.confident_size <= 0:
+            return None
+        with self._lock:
+            if (campaign.rules is not rules or campaign.votes < self.confident_size
+                    or campaign.scam_votes not in (0, campaign.votes) or campaign.categories != categories):
+                return None
+            campaign.skipped += 1
+            if self.recheck_every > 0 and campaign.skipped % self.recheck_every == 0:
+                self.rechecks += 1
+                return None
+            self.short_circuits += 1
+            return campaign.score_sum / campaign.votes, campaign.scam_votes > 0
+
+    def record(self, campaign: Optional[Campaign], rules: Any, score: float, is_scam: bool,
+               categories: Dict[str, float]):
+        """Count the verdict of a member that was scored, with its category hits."""
+        if campaign is None:
+            return
+        with self._lock:
+            if campaign.rules is not rules:
+                campaign.rules = rules
+                campaign.votes = campaign.scam_votes = 0
+                campaign.score_sum = 0.0
+            campaign.votes += 1
+            campaign.scam_votes += is_scam
+            campaign.score_sum += score
+            campaign.categories = categories
+
+    def add_intel(self, campaign: Optional[Campaign], intel: Optional[Dict[str, List[str]]]):
+        if campaign is not None:
+            with self._lock:
+                self._add_intel(campaign, intel)
+
+    def _add_intel(self, campaign: Campaign, intel: Optional[Dict[str, List[str]]]):
+        if not intel:
+            return
+        if campaign.intel is None:
+            campaign.intel = {}
+        for kind, values in intel.items():
+            for value in values:
+                counts = campaign.intel.setdefault(kind, {})
+                if value in counts:
+                    counts[value] += 1
+                elif campaign.intel_values < MAX_INTEL_VALUES:
+                    counts[value] = 1
+                    campaign.intel_values += 1
+
+    def add_session(self, campaign_id: Optional[int], session_id: str):
+        if campaign_id is None:
+            return
+        with self._lock:
+            campaign = self._campaigns.get(campaign_id)
+            if campaign is not None:
+                if campaign.sessions is None:
+                    campaign.sessions = set()
+                if len(campaign.sessions) < MAX_SESSIONS:
+                    campaign.sessions.add(session_id)
+
+    def top(self, limit: int = 20, min_size: int = 2) -> List[Dict]:
+        """Largest live campaigns with at least min_size messages."""
+        with self._lock:
+            largest = heapq.nlargest(limit, (c for c in self._campaigns.values() if c.size >= min_size),
+                                     key=lambda c: c.size)
+            return [campaign.to_dict() for campaign in largest]
+
+    def stats(self) -> Dict:
+        return {
+            'live': len(self._campaigns),
+            'max_campaigns': self.max_campaigns,
+            'assigned': self.assigned,
+            'created': self.created,
+            'evicted': self.evicted,
+            'short_circuits': self.short_circuits,
+            'rechecks': self.rechecks
+        }
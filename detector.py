@@ -0,0 +1,281 @@
+"""
+Scam detection and intel extraction for the AI Honey-Pot API.
+
+ScamDetector scores a message against the active compiled RuleSet and
+HoneyPotAgent extracts typed, normalized entities and picks scripted
+replies. Neither touches sessions, metrics or HTTP, so offline tools
+(bulk_analyze.py, the benchmarks) can import this module without
+building the whole app; app.py re-exports both classes.
+"""
+
+import os
+import re
+import threading
+from typing import Dict, Iterator, NamedTuple, Optional
+from urllib.parse import urlsplit, urlunsplit
+
+from lookalike import DEFAULT_BRANDS, BrandIndex, LookalikeMatch
+from rules import RuleSet, compile_rules, rules_document
+from safe_regex import compile_linear, scan_chunks, windows
+from session_model import INTEL_KEYS
+
+# Scoring: 'keyword' (ScamDetector only), 'blend' or 'ml' (see train_model.py)
+SCORER_MODE = os.environ.get('SCORER_MODE', 'keyword')
+ML_MODEL_PATH = os.environ.get('ML_MODEL_PATH', 'models/scam_model')
+ML_BLEND_WEIGHT = float(os.environ.get('ML_BLEND_WEIGHT', 0.5))
+
+# Untrusted-text hardening: 'hardened' (linear-time entity scanner, messages
+# cut to MAX_MESSAGE_CHARS, long bodies scanned in SCAN_CHUNK_CHARS pieces)
+# or 'legacy' (original backtracking patterns over the whole body)
+REGEX_MODE = os.environ.get('REGEX_MODE', 'hardened')
+MAX_MESSAGE_CHARS = int(os.environ.get('MAX_MESSAGE_CHARS', 10000))
+SCAN_CHUNK_CHARS = int(os.environ.get('SCAN_CHUNK_CHARS', 2048))
+HARDENED = REGEX_MODE == 'hardened'
+
+# Detection/reply rule tables (JSON, or YAML with PyYAML); re-read when the file changes
+RULES_PATH = os.environ.get('RULES_PATH', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'rules.json'))
+
+# ==================== SCAM DETECTION ====================
+
+class ScamDetector:
+    SCAM_PATTERNS = {
+        'urgency': [r'urgent', r'immediately', r'asap', r'now', r'today', r'quick'],
+        'threats': [r'blocked', r'suspended', r'terminated', r'legal action', r'arrest', r'locked'],
+        'financial': [r'won', r'prize', r'lottery', r'refund', r'payment', r'upi', r'rupees', r'pay'],
+        'personal_info': [r'verify', r'confirm', r'update', r'otp', r'cvv', r'password', r'share'],
+        'too_good': [r'free', r'guaranteed', r'congratulations', r'winner', r'selected'],
+        'impersonation': [r'bank', r'government', r'police', r'delivery', r'amazon', r'sbi']
+    }
+    CATEGORY_WEIGHTS = {'urgency': 0.15, 'threats': 0.25, 'financial': 0.20,
+                        'personal_info': 0.20, 'too_good': 0.10, 'impersonation': 0.10}
+    URL_WEIGHT = 0.15
+    DIGITS_WEIGHT = 0.05
+    LOOKALIKE_WEIGHT = 0.05
+    SCAM_THRESHOLD = 0.25
+    # Real domains (or bare names) of brands scammers imitate; see lookalike.py
+    PROTECTED_BRANDS = list(DEFAULT_BRANDS)
+    
+    # Active compiled RuleSet shared by all instances. install_rules() swaps it
+    # in with one assignment; reassigning SCAM_PATTERNS (or calling
+    # rebuild_matcher() after an in-place edit) recompiles it from the class tables
+    rules = None
+    _matcher_source = None
+    _rules_lock = threading.RLock()
+    _url_re = re.compile(r'http[s]?://')
+    _digits_re = re.compile(r'\d{10}')
+    _link_re = re.compile(r'http[s]?://[^\s]+')
+    # Category regexes on long bodies run over overlapping windows; a match
+    # longer than this overlap can be missed where two windows meet
+    WINDOW_OVERLAP = 256
+    
+    def __init__(self, hardened: bool = HARDENED, chunk_chars: int = SCAN_CHUNK_CHARS):
+        self.hardened = hardened
+        self.chunk_chars = chunk_chars
+    
+    @classmethod
+    def install_rules(cls, rule_set: RuleSet):
+        with cls._rules_lock:
+            cls.rules = rule_set
+            cls.SCAM_PATTERNS = rule_set.patterns
+            cls.CATEGORY_WEIGHTS = rule_set.weights
+            cls.URL_WEIGHT = rule_set.url_weight
+            cls.DIGITS_WEIGHT = rule_set.digits_weight
+            cls.LOOKALIKE_WEIGHT = rule_set.lookalike_weight
+            cls.PROTECTED_BRANDS = list(rule_set.brands)
+            cls.SCAM_THRESHOLD = rule_set.threshold
+            cls._matcher_source = rule_set.patterns
+    
+    @classmethod
+    def rebuild_matcher(cls):
+        """Compile the class attribute tables into a RuleSet, keeping the current replies.
+        
+        Plain keywords are kept as literals and tested with substring search;
+        anything using regex syntax is validated and folded into one compiled
+        alternation per category.
+        """
+        with cls._rules_lock:
+            replies = cls.rules.reply_rules if cls.rules is not None else None
+            cls.install_rules(compile_rules(rules_document(
+                cls.SCAM_PATTERNS, cls.CATEGORY_WEIGHTS, cls.URL_WEIGHT, cls.DIGITS_WEIGHT,
+                cls.SCAM_THRESHOLD, replies, version='inline',
+                lookalike_weight=cls.LOOKALIKE_WEIGHT, brands=cls.PROTECTED_BRANDS)))
+    
+    @classmethod
+    def matcher(cls) -> RuleSet:
+        """Current compiled rules; a new object whenever the patterns change."""
+        if cls._matcher_source is not cls.SCAM_PATTERNS:
+            with cls._rules_lock:
+                if cls._matcher_source is not cls.SCAM_PATTERNS:
+                    cls.rebuild_matcher()
+        return cls.rules
+    
+    def match_categories(self, message: str, rules: Optional[RuleSet] = None) -> Dict[str, float]:
+        """Return {category: weight} for every category (plus url/digits) that fires."""
+        rules = rules or type(self).matcher()
+        message_lower = message.lower()
+        hits = {}
+        for category, weight, literals, compiled in rules.categories:
+            for literal in literals:
+                if literal in message_lower:
+                    hits[category] = weight
+                    break
+            else:
+                if compiled is not None and self._search(compiled, message_lower):
+                    hits[category] = weight
+        
+        if self._url_re.search(message):
+            hits['url'] = rules.url_weight
+            if rules.lookalike_weight and any(self.lookalikes(message, rules.brand_index)):
+                hits['lookalike'] = rules.lookalike_weight
+        if self._digits_re.search(message):
+            hits['digits'] = rules.digits_weight
+        return hits
+    
+    def lookalikes(self, message: str, brand_index: BrandIndex) -> Iterator[LookalikeMatch]:
+        """LookalikeMatch for every link whose domain imitates a protected brand."""
+        for match in self._link_re.finditer(message):
+            found = brand_index.check(match.group())
+            if found is not None:
+                yield found
+    
+    def _search(self, compiled, text: str) -> bool:
+        if not self.hardened:
+            return compiled.search(text) is not None
+        return any(compiled.search(window) for window in windows(text, self.chunk_chars, self.WINDOW_OVERLAP))
+    
+    def calculate_scam_score(self, message: str) -> float:
+        if not message:
+            return 0.0
+        return min(sum(self.match_categories(message).values(), 0.0), 1.0)
+    
+    def is_scam(self, message: str) -> bool:
+        return self.calculate_scam_score(message) >= self.matcher().threshold
+
+
+ScamDetector.rebuild_matcher()
+
+# ==================== HONEY-POT AGENT ====================
+
+class Entity(NamedTuple):
+    type: str       # one of INTEL_KEYS
+    value: str      # normalized value
+    start: int
+    end: int
+
+
+class HoneyPotAgent:
+    # One scanner for every entity kind; earlier groups win on overlap, so a
+    # number inside a URL or UPI handle is not reported a second time
+    INTEL_PATTERN = (
+        r'(?P<url>http[s]?://[^\s]+)'
+        r'|(?P<upi>\b[a-zA-Z0-9._-]+@[a-zA-Z]+\b)'
+        r'|(?P<ifsc>\b[A-Z]{4}0[A-Z0-9]{6}\b)'
+        r'|(?P<number>\+?\d[\d\s\-\.]{8,}\d)'
+    )
+    INTEL_SCANNER = re.compile(INTEL_PATTERN)
+    # Hardened scanner: RE2 runs INTEL_PATTERN as is. Under re the UPI branch
+    # is the one that goes quadratic: it rescans a run like "a.a.a..." from
+    # every word boundary inside it. The rewrite tries each run once, from its
+    # first word character; '@' can only follow the whole run, so it finds the
+    # same ids. It only differs on a run glued to a previous entity or to a
+    # non-ASCII letter, where the old branch split off ids like ".abc@ybl"
+    LINEAR_SCANNER = compile_linear(INTEL_PATTERN, fallback=(
+        r'(?P<url>http[s]?://[^\s]+)'
+        r'|(?<![\w.-])[.-]*(?P<upi>[a-zA-Z0-9_][a-zA-Z0-9._-]*@[a-zA-Z]+\b)'
+        r'|(?P<ifsc>\b[A-Z]{4}0[A-Z0-9]{6}\b)'
+        r'|(?P<number>\+?\d[\d\s\-\.]{8,}\d)'
+    ))
+    NUMBER_JUNK = re.compile(r'[^\d]')
+    URL_TRAILING = '.,;:!?)]}\'"'
+    
+    def __init__(self, hardened: bool = HARDENED, chunk_chars: int = SCAN_CHUNK_CHARS):
+        self.hardened = hardened
+        self.chunk_chars = chunk_chars
+    
+    @staticmethod
+    def normalize_phone(raw: str, digits: str) -> str:
+        """Canonicalize to E.164, assuming India (+91) when no country code is given."""
+        if raw.startswith('+'):
+            return '+' + digits
+        if len(digits) == 10 and digits[0] in '6789':
+            return '+91' + digits
+        if len(digits) == 11 and digits[0] == '0':
+            return '+91' + digits[1:]
+        if len(digits) == 12 and digits.startswith('91'):
+            return '+' + digits
+        # Toll-free and short service numbers have no E.164 form
+        return digits
+    
+    @classmethod
+    def normalize_url(cls, raw: str) -> str:
+        url = raw.rstrip(cls.URL_TRAILING)
+        try:
+            parts = urlsplit(url)
+        except ValueError:
+            # e.g. an unclosed IPv6 bracket: keep the link as written
+            return url
+        return urlunsplit((parts.scheme.lower(), parts.netloc.lower(), parts.path, parts.query, parts.fragment))
+    
+    def scan_entities(self, message: str) -> Iterator[Entity]:
+        """Single pass over the message yielding normalized, typed entities with offsets."""
+        if not self.hardened:
+            pieces, scanner = ((0, message),), self.INTEL_SCANNER
+        else:
+            pieces, scanner = scan_chunks(message, self.chunk_chars), self.LINEAR_SCANNER
+        brand_index = ScamDetector.matcher().brand_index
+        for offset, piece in pieces:
+            for match in scanner.finditer(piece):
+                yield from self._entity(match, offset, brand_index)
+    
+    def _entity(self, match, offset: int, brand_index: BrandIndex) -> Iterator[Entity]:
+        kind = match.lastgroup
+        raw = match.group(kind)
+        start, end = match.span(kind)
+        start += offset
+        end += offset
+        if kind == 'url':
+            url = self.normalize_url(raw)
+            yield Entity('phishingLinks', url, start, end)
+            lookalike = brand_index.check(url)
+            if lookalike is not None:
+                yield Entity('lookalikeDomains', lookalike.domain, start, end)
+        elif kind == 'upi':
+            yield Entity('upiIds', raw.lower(), start, end)
+        elif kind == 'ifsc':
+            yield Entity('bankAccounts', raw, start, end)
+        else:
+            digits = self.NUMBER_JUNK.sub('', raw)
+            if raw.isdigit() and not (
+                    (len(digits) == 10 and digits[0] in '6789')
+                    or (len(digits) == 12 and digits.startswith('91') and digits[2] in '6789')):
+                # A bare digit run that is not a mobile number is an account number
+                if 9 <= len(digits) <= 18:
+                    yield Entity('bankAccounts', digits, start, end)
+            elif 9 <= len(digits) <= 15:
+                yield Entity('phoneNumbers', self.normalize_phone(raw, digits), start, end)
+    
+    def extract_intelligence(self, message: str) -> Dict:
+        intel = {key: {} for key in INTEL_KEYS}
+        if message:
+            for entity in self.scan_entities(message):
+                intel[entity.type][entity.value] = None
+        return {key: list(values) for key, values in intel.items()}
+    
+    def generate_response(self, message: str, turn: int, rules: Optional[RuleSet] = None) -> str:
+        """Turn-scripted reply from the rules' decision table (first matching row wins)."""
+        rules = rules or ScamDetector.matcher()
+        if not message:
+            return rules.empty_reply
+        
+        msg = message.lower()
+        for keywords, reply in rules.replies.get(turn, rules.default_replies):
+            if not keywords or any(keyword in msg for keyword in keywords):
+                return reply
+        return rules.default_replies[-1][1]
+
+
+def clip_text(message_text: str) -> str:
+    """Cut an over-long body to MAX_MESSAGE_CHARS in hardened mode."""
+    if HARDENED and MAX_MESSAGE_CHARS and isinstance(message_text, str) and len(message_text) > MAX_MESSAGE_CHARS:
+        return message_text[:MAX_MESSAGE_CHARS]
+    return message_text
@@ -0,0 +1,31 @@
+"""
+gunicorn settings: preload the app once in the master, then fork workers.
+
+The master imports app, compiles the rules and warms the model and
+requests (create_app(preload=True)). Forked workers share those pages
+copy-on-write and only start their own threads, journal and SQLite
+connections in post_fork. Start with:
+
+    gunicorn -c gunicorn.conf.py
+"""
+
+import gc
+import os
+
+wsgi_app = 'app:create_app(preload=True)'
+preload_app = True
+bind = f"0.0.0.0:{os.environ.get('PORT', '5000')}"
+workers = int(os.environ.get('WEB_CONCURRENCY', 2))
+threads = int(os.environ.get('GUNICORN_THREADS', 4))
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 30))
+
+
+def when_ready(server):
+    # Everything allocated so far lives as long as the master; keep the
+    # collector from touching it (and un-sharing its pages) in the workers
+    gc.freeze()
+
+
+def post_fork(server, worker):
+    import app
+    app.start_worker()
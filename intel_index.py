@@ -0,0 +1,199 @@
+"""
+Cross-session inverted index of extracted intelligence.
+
+Maps (intel type, normalized value) to the sessions that mentioned it, so
+"every session that used UPI id X" is a dict lookup instead of a scan over
+conversation_sessions. Entries are added as intel is merged into a session
+and removed when the session store evicts the session.
+
+Top-K by frequency uses frequency buckets (session count -> values with
+that count, per type) in the LFU-cache layout: an add or remove moves one
+value between adjacent buckets in O(1), and top-K walks the linked
+non-empty buckets down from the current maximum.
+
+IntelIndex is per process, like the in-memory session store, which keeps
+it in step through add() and remove_session(). SQLiteIntelIndex answers the
+same queries from the SQLite store's intel table, which the store fills and
+prunes in its own transactions, so every worker sees every session.
+"""
+
+import sqlite3
+import sys
+import threading
+from typing import Callable, Dict, List, Optional
+
+# Rough per-entry costs for memory accounting (CPython 64-bit): a dict slot
+# plus the set/dict object holding postings, and one slot per posting
+ENTRY_OVERHEAD = 64 + 232
+POSTING_OVERHEAD = 48
+
+
+class _TypeIndex:
+    """Postings for one intel type plus its frequency buckets.
+
+    Non-empty bucket counts form a doubly linked list through `up`/`down`
+    (0 is the bottom sentinel), so top-K only visits counts that have values.
+    """
+    __slots__ = ('postings', 'buckets', 'up', 'down', 'max_count')
+
+    def __init__(self):
+        self.postings = {}      # value -> {session_id: None}, in first-mention order
+        self.buckets = {}       # session count -> {value: None}
+        self.up = {0: None}
+        self.down = {}
+        self.max_count = 0
+
+    def _link(self, count: int, lower: int):
+        upper = self.up[lower]
+        self.buckets[count] = {}
+        self.up[lower] = count
+        self.down[count] = lower
+        self.up[count] = upper
+        if upper is None:
+            self.max_count = count
+        else:
+            self.down[upper] = count
+
+    def _unlink(self, count: int):
+        lower, upper = self.down.pop(count), self.up.pop(count)
+        del self.buckets[count]
+        self.up[lower] = upper
+        if upper is None:
+            self.max_count = lower
+        else:
+            self.down[upper] = lower
+
+    def move(self, value: str, old: int, new: int):
+        """Move value between adjacent counts (new == old +/- 1)."""
+        if new and new not in self.buckets:
+            self._link(new, old if new > old else self.down[old])
+        if new:
+            self.buckets[new][value] = None
+        if old:
+            bucket = self.buckets[old]
+            del bucket[value]
+            if not bucket:
+                self._unlink(old)
+
+
+class IntelIndex:
+    def __init__(self, types):
+        self.types = {name: _TypeIndex() for name in types}
+        self.by_session = {}    # session_id -> [(type, value), ...]
+        self.postings = 0
+        self.approx_bytes = 0
+        self._lock = threading.Lock()
+
+    def add(self, kind: str, value: str, session_id: str):
+        index = self.types.get(kind)
+        if index is None:
+            return
+        with self._lock:
+            sessions = index.postings.get(value)
+            if sessions is None:
+                sessions = index.postings[value] = {}
+                self.approx_bytes += sys.getsizeof(value) + ENTRY_OVERHEAD
+            elif session_id in sessions:
+                return
+            sessions[session_id] = None
+            index.move(value, len(sessions) - 1, len(sessions))
+            self.by_session.setdefault(session_id, []).append((kind, value))
+            self.postings += 1
+            self.approx_bytes += POSTING_OVERHEAD * 2
+
+    def remove_session(self, session_id: str):
+        """Drop every posting for a session (called when the store evicts it)."""
+        with self._lock:
+            for kind, value in self.by_session.pop(session_id, ()):
+                index = self.types[kind]
+                sessions = index.postings[value]
+                del sessions[session_id]
+                index.move(value, len(sessions) + 1, len(sessions))
+                self.postings -= 1
+                self.approx_bytes -= POSTING_OVERHEAD * 2
+                if not sessions:
+                    del index.postings[value]
+                    self.approx_bytes -= sys.getsizeof(value) + ENTRY_OVERHEAD
+
+    def sessions_for(self, kind: str, value: str, limit: int = 100) -> Optional[Dict]:
+        index = self.types.get(kind)
+        if index is None:
+            return None
+        with self._lock:
+            sessions = index.postings.get(value, {})
+            count = len(sessions)
+            first = []
+            for session_id in sessions:
+                if len(first) >= limit:
+                    break
+                first.append(session_id)
+        return {'count': count, 'sessions': first}
+
+    def top(self, kind: str, limit: int = 10) -> Optional[List[Dict]]:
+        index = self.types.get(kind)
+        if index is None:
+            return None
+        out = []
+        with self._lock:
+            count = index.max_count
+            while count and len(out) < limit:
+                for value in index.buckets[count]:
+                    out.append({'value': value, 'sessions': count})
+                    if len(out) >= limit:
+                        break
+                count = index.down[count]
+        return out
+
+    def stats(self) -> Dict:
+        return {
+            'entities': {kind: len(index.postings) for kind, index in self.types.items()},
+            'postings': self.postings,
+            'sessions': len(self.by_session),
+            'approx_bytes': self.approx_bytes
+        }
+
+
+class SQLiteIntelIndex:
+    """IntelIndex queries over a SQLiteSessionStore's intel table.
+
+    Postings are written in the turn's transaction and deleted with their
+    session by whichever worker evicts it, so add() and remove_session()
+    have nothing to do.
+    """
+
+    def __init__(self, types, connect: Callable[[], sqlite3.Connection]):
+        self.types = frozenset(types)
+        self._connect = connect
+
+    def add(self, kind: str, value: str, session_id: str):
+        pass
+
+    def remove_session(self, session_id: str):
+        pass
+
+    def sessions_for(self, kind: str, value: str, limit: int = 100) -> Optional[Dict]:
+        if kind not in self.types:
+            return None
+        conn = self._connect()
+        count = conn.execute('SELECT COUNT(*) FROM intel WHERE kind = ? AND value = ?', (kind, value)).fetchone()[0]
+        rows = conn.execute('SELECT session_id FROM intel WHERE kind = ? AND value = ? ORDER BY rowid LIMIT ?',
+                            (kind, value, limit)).fetchall()
+        return {'count': count, 'sessions': [session_id for session_id, in rows]}
+
+    def top(self, kind: str, limit: int = 10) -> Optional[List[Dict]]:
+        if kind not in self.types:
+            return None
+        rows = self._connect().execute(
+            'SELECT value, COUNT(*) AS n FROM intel WHERE kind = ? GROUP BY value ORDER BY n DESC, MIN(rowid) LIMIT ?',
+            (kind, limit)).fetchall()
+        return [{'value': value, 'sessions': count} for value, count in rows]
+
+    def stats(self) -> Dict:
+        conn = self._connect()
+        entities = dict(conn.execute('SELECT kind, COUNT(DISTINCT value) FROM intel GROUP BY kind').fetchall())
+        postings, sessions = conn.execute('SELECT COUNT(*), COUNT(DISTINCT session_id) FROM intel').fetchone()
+        return {
+            'entities': {kind: entities.get(kind, 0) for kind in sorted(self.types)},
+            'postings': postings,
+            'sessions': sessions
+        }
@@ -0,0 +1,314 @@
+"""
+Append-only conversation journal with snapshots and crash recovery.
+
+Every scammer turn applied to a session is appended as one JSON line
+(message pair, new intel, resulting turn count) and every eviction as a
+tombstone. Lines are buffered and a background thread flushes and fsyncs
+them every fsync_interval seconds (group commit), so the request path
+never waits on the disk; a crash loses at most that window.
+
+Every snapshot_every events (and on close) the live sessions are written
+to a compacted snapshot and older segments are deleted. The snapshot is
+taken while the session store lock is held, at the same instant the
+journal switches to a new segment, so snapshot + newer segments is
+always the complete state. On startup replay() rebuilds the sessions
+from the snapshot plus the segment tail.
+
+Layout of the journal directory:
+    snapshot.jsonl         header line {"segment": N, ...} then one session per line
+    segment-<N>.jsonl      events written after that snapshot
+
+Only one process may own a directory; a second one gets JournalLocked.
+open_slot() gives each worker of a multi-process server its own directory
+under one root: the root itself, then worker-1/, worker-2/, ... Each worker
+takes the first slot no live process holds, so a restarted worker picks up
+the slot its predecessor released and replays that worker's sessions.
+"""
+
+import json
+import logging
+import os
+import re
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+from session_model import Session
+
+try:
+    import fcntl
+except ImportError:  # Windows: no advisory locking
+    fcntl = None
+
+try:
+    import orjson
+
+    def _dumps(obj) -> bytes:
+        return orjson.dumps(obj)
+    _loads = orjson.loads
+except ImportError:
+    def _dumps(obj) -> bytes:
+        return json.dumps(obj, separators=(',', ':')).encode('utf-8')
+    _loads = json.loads
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_FILE = 'snapshot.jsonl'
+SLOT_PREFIX = 'worker-'
+SEGMENT_NAME = re.compile(r'^segment-(\d+)\.jsonl$')
+
+
+class JournalLocked(RuntimeError):
+    """Another process already owns the journal directory."""
+
+
+def segment_path(directory: str, number: int) -> str:
+    return os.path.join(directory, f'segment-{number:08d}.jsonl')
+
+
+def list_segments(directory: str) -> List[int]:
+    numbers = []
+    for name in os.listdir(directory):
+        match = SEGMENT_NAME.match(name)
+        if match:
+            numbers.append(int(match.group(1)))
+    return sorted(numbers)
+
+
+# ==================== REPLAY ====================
+
+def apply_event(sessions: Dict[str, Session], event: Dict):
+    """Apply one journal event to a {session_id: session} map (idempotent)."""
+    session_id = event['sid']
+    session = sessions.get(session_id)
+    if event['op'] == 'evict':
+        # A tombstone only removes the incarnation it was written for
+        if session is not None and session.created_at == event['c']:
+            del sessions[session_id]
+        return
+
+    if session is None or session.created_at != event['c']:
+        session = sessions[session_id] = Session(session_id, event['c'])
+    if event['turn'] <= session.turns:
+        return
+    for sender, text in event['msgs']:
+        session.add_message(sender, text)
+    for key, values in event['intel'].items():
+        for value in values:
+            session.add_intel(key, value, event['turn'])
+    session.turns = event['turn']
+    session.is_scam = True
+    session.updated_at = event['ts']
+
+
+def replay(directory: str) -> Tuple[List[Session], Dict]:
+    """Rebuild sessions from snapshot + segments; returns (sessions, info)."""
+    start = time.perf_counter()
+    sessions = {}
+    first_segment = 0
+    snapshot = os.path.join(directory, SNAPSHOT_FILE)
+    if os.path.exists(snapshot):
+        with open(snapshot, 'rb') as f:
+            header = _loads(f.readline())
+            first_segment = header['segment']
+            for line in f:
+                session = Session.from_dict(_loads(line))
+                sessions[session.id] = session
+    snapshot_sessions = len(sessions)
+
+    events = torn = 0
+    for number in list_segments(directory):
+        if number < first_segment:
+            continue
+        with open(segment_path(directory, number), 'rb') as f:
+            for line in f:
+                try:
+                    event = _loads(line)
+                except ValueError:
+                    # A torn final write from a crash; everything before it is intact
+                    torn += 1
+                    continue
+                apply_event(sessions, event)
+                events += 1
+
+    info = {'snapshot_sessions': snapshot_sessions, 'events': events, 'torn_lines': torn,
+            'sessions': len(sessions), 'seconds': round(time.perf_counter() - start, 3)}
+    return list(sessions.values()), info
+
+
+# ==================== WRITER ====================
+
+class Journal:
+    """Writer side. open() locks the directory, replays it and starts a new
+    segment; nothing is recorded before that.
+
+    snapshot_source(hook) must return copies of all live sessions and call
+    hook() under the same lock that serializes session mutations;
+    SessionStore.snapshot does exactly that.
+    """
+
+    def __init__(self, directory: str, fsync_interval: float = 0.05, snapshot_every: int = 100000,
+                 snapshot_source: Optional[Callable[[Callable[[], None]], List[Dict]]] = None):
+        self.directory = directory
+        self.fsync_interval = fsync_interval
+        self.snapshot_every = snapshot_every
+        self.snapshot_source = snapshot_source
+        self.segment = 0
+        self._file = None
+        self._lock_file = None
+        self._lock = threading.Lock()
+        self._snapshot_lock = threading.Lock()
+        self._dirty = False
+        self._stop = threading.Event()
+        self._thread = None
+        self.events_written = 0
+        self.events_since_snapshot = 0
+        self.fsyncs = 0
+        self.last_snapshot = None
+        self.recovered = None
+
+    def open(self) -> List[Session]:
+        """Take ownership of the directory; returns the recovered sessions."""
+        os.makedirs(self.directory, exist_ok=True)
+        self._lock_file = open(os.path.join(self.directory, 'LOCK'), 'w')
+        if fcntl is not None:
+            try:
+                fcntl.flock(self._lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                self._lock_file.close()
+                raise JournalLocked(f"journal {self.directory} is in use by another process")
+        sessions, self.recovered = replay(self.directory)
+        # Never append to a segment that may end in a torn line
+        segments = list_segments(self.directory)
+        self.segment = (segments[-1] + 1) if segments else 1
+        self._file = open(segment_path(self.directory, self.segment), 'ab')
+        if self.fsync_interval > 0:
+            self._thread = threading.Thread(target=self._run, name='journal', daemon=True)
+            self._thread.start()
+        return sessions
+
+    def record_turn(self, session: Session, messages: List[Tuple[str, str]], intel: Dict[str, List[str]]):
+        """Log one applied scammer turn; call while the session is held."""
+        self._write({'op': 'turn', 'sid': session.id, 'c': session.created_at, 'ts': time.time(),
+                     'turn': session.turns, 'msgs': messages, 'intel': intel})
+
+    def record_evict(self, session: Session):
+        self._write({'op': 'evict', 'sid': session.id, 'c': session.created_at})
+
+    def _write(self, event: Dict):
+        line = _dumps(event) + b'\n'
+        with self._lock:
+            if self._file is None:
+                return
+            self._file.write(line)
+            self._dirty = True
+            self.events_written += 1
+            self.events_since_snapshot += 1
+            if self.fsync_interval <= 0:
+                self._sync_locked()
+
+    def _sync_locked(self):
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._dirty = False
+        self.fsyncs += 1
+
+    def sync(self):
+        """Flush buffered events to the OS under the lock, fsync outside it."""
+        with self._lock:
+            if not self._dirty or self._file is None:
+                return
+            self._file.flush()
+            fd = os.dup(self._file.fileno())
+            self._dirty = False
+        try:
+            os.fsync(fd)
+            self.fsyncs += 1
+        finally:
+            os.close(fd)
+
+    def _rotate(self):
+        """Start a new segment. Runs under the session store lock (see snapshot)."""
+        with self._lock:
+            self._sync_locked()
+            self._file.close()
+            self.segment += 1
+            self._file = open(segment_path(self.directory, self.segment), 'ab')
+            self.events_since_snapshot = 0
+
+    def snapshot(self):
+        """Write a compacted snapshot and delete the segments it covers."""
+        if self.snapshot_source is None or self._file is None:
+            return
+        with self._snapshot_lock:
+            start = time.perf_counter()
+            sessions = self.snapshot_source(self._rotate)
+            segment = self.segment
+            tmp = os.path.join(self.directory, SNAPSHOT_FILE + '.tmp')
+            with open(tmp, 'wb') as f:
+                f.write(_dumps({'segment': segment, 'sessions': len(sessions), 'ts': time.time()}) + b'\n')
+                for session in sessions:
+                    f.write(_dumps(session) + b'\n')
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp, os.path.join(self.directory, SNAPSHOT_FILE))
+            for number in list_segments(self.directory):
+                if number < segment:
+                    os.remove(segment_path(self.directory, number))
+            self.last_snapshot = {'sessions': len(sessions), 'segment': segment,
+                                  'seconds': round(time.perf_counter() - start, 3), 'at': time.time()}
+            logger.info("Journal snapshot: %d sessions in %.3fs", len(sessions), self.last_snapshot['seconds'])
+
+    def _run(self):
+        while not self._stop.wait(self.fsync_interval):
+            try:
+                self.sync()
+                if self.events_since_snapshot >= self.snapshot_every:
+                    self.snapshot()
+            except OSError as e:
+                logger.error("Journal write failed: %s", e)
+
+    def close(self):
+        """Stop the flusher, snapshot if anything changed, and release the directory."""
+        if self._file is None:
+            return
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        if self.events_since_snapshot:
+            self.snapshot()
+        with self._lock:
+            self._sync_locked()
+            self._file.close()
+            self._file = None
+        self._lock_file.close()
+
+    def stats(self) -> Dict:
+        return {
+            'segment': self.segment,
+            'events_written': self.events_written,
+            'events_since_snapshot': self.events_since_snapshot,
+            'fsyncs': self.fsyncs,
+            'fsync_interval': self.fsync_interval,
+            'last_snapshot': self.last_snapshot,
+            'recovered': self.recovered
+        }
+
+
+def slot_directory(root: str, slot: int) -> str:
+    return root if slot == 0 else os.path.join(root, f'{SLOT_PREFIX}{slot}')
+
+
+def open_slot(root: str, **kwargs) -> Tuple['Journal', List[Session]]:
+    """Open the first journal slot under root that no other process holds.
+
+    Returns the journal and the sessions replayed from that slot. Slot 0 is
+    root itself, so a single-process deployment keeps its existing layout.
+    """
+    slot = 0
+    while True:
+        journal = Journal(slot_directory(root, slot), **kwargs)
+        try:
+            return journal, journal.open()
+        except JournalLocked:
+            slot += 1
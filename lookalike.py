@@ -0,0 +1,298 @@
+"""
+Lookalike-domain detection against a precomputed index of protected brands.
+
+A link is reduced to its host: userinfo, port and trailing dot are dropped,
+punycode labels (xn--...) are decoded, and the text is NFKC-folded. From the
+host we take the registrable domain, using a small built-in table of
+two-label public suffixes (co.in, gov.in, co.uk, ...). That domain, its
+subdomain labels and their hyphen/digit-separated tokens are then compared
+with every brand name:
+
+- homoglyph: same skeleton (confusable letters, digits and "rn"/"vv"
+  folded to one form) as a brand, but different text: amaz0n, аmazon,
+  xn--mazon-3ve
+- typo: within edit distance 1 of a brand of 5-8 characters, or distance 2
+  of a longer one, with swapped neighbours counted as one edit: amzaon,
+  hdfcbamk
+- contains: the brand as a separate token or a subdomain label, or glued
+  to a word at either end (for brands of 5+ characters): sbi-secure-verify,
+  sbi.kyc-update.in, amazonrefunds
+- tld: exactly a brand's name under a suffix the brand doesn't use, for
+  brands configured with their real domains: amazon.xyz
+
+Brands are given as bare names ("amazon") or as real domains ("sbi.co.in"). A
+real domain is never flagged, and neither is a brand's other official domain
+(OFFICIAL_DOMAINS: amazon.co.uk, amazonaws.com, onlinesbi.com, ...) or
+anything under a suffix the public can't register (gov.in, nic.in, bank.in).
+A bare name can't tell the real site from a copy, so its exact match isn't
+flagged either.
+
+Generic keywords ("bank", "delivery") are matched only as a whole label or
+token, or a homoglyph of one. Typo and glue matching would catch ordinary
+sites such as deliveryhero.com and governmentjobs.com.
+
+Typo candidates come from a deletion-neighbourhood index. Every brand
+skeleton is stored under all its variants with up to its allowed number of
+characters deleted. A lookup generates the same variants of the query and
+verifies the few collisions with an exact distance, so the cost grows with
+the query length and not with the number of brands. Results are cached per
+host.
+"""
+
+import re
+import unicodedata
+from typing import Dict, Iterable, List, NamedTuple, Optional, Set, Tuple
+from urllib.parse import urlsplit
+
+from verdict_cache import LRUCache
+
+# Registrable domains under these are three labels (sbi.co.in), not two
+MULTI_PART_SUFFIXES = frozenset({
+    'co.in', 'net.in', 'org.in', 'firm.in', 'gen.in', 'ind.in', 'ac.in', 'edu.in', 'res.in', 'gov.in',
+    'nic.in', 'bank.in', 'co.uk', 'org.uk', 'ac.uk', 'gov.uk', 'com.au', 'net.au', 'org.au', 'co.nz',
+    'co.za', 'com.br', 'com.sg', 'com.my', 'co.jp', 'com.cn', 'com.hk', 'com.pk', 'com.bd', 'com.np',
+    'com.lk',
+})
+# Suffixes only governments and licensed banks can register under
+TRUSTED_SUFFIXES = ('gov.in', 'nic.in', 'bank.in', 'gov')
+
+DEFAULT_BRANDS = (
+    'sbi.co.in', 'onlinesbi.sbi', 'sbi.bank.in', 'hdfcbank.com', 'icicibank.com', 'axisbank.com',
+    'kotak.com', 'pnbindia.in', 'paytm.com', 'phonepe.com', 'amazon.in', 'amazon.com', 'flipkart.com',
+    'irctc.co.in', 'npci.org.in', 'rbi.org.in', 'indiapost.gov.in', 'incometax.gov.in', 'uidai.gov.in',
+)
+
+# Other registrable domains (country sites, services, subsidiaries) each brand really uses
+OFFICIAL_DOMAINS: Dict[str, Tuple[str, ...]] = {
+    'amazon': ('amazon.co.uk', 'amazon.de', 'amazon.fr', 'amazon.it', 'amazon.es', 'amazon.ca', 'amazon.com.au',
+               'amazon.co.jp', 'amazon.ae', 'amazon.sg', 'amazonaws.com', 'amazonpay.in', 'amazon.jobs'),
+    'sbi': ('sbi.com', 'onlinesbi.com', 'sbicard.com', 'sbilife.co.in', 'sbimf.com', 'sbiyono.sbi'),
+    'hdfcbank': ('hdfc.com', 'hdfcbank.net', 'hdfclife.com', 'hdfcsec.com'),
+    'icicibank': ('icicidirect.com', 'iciciprulife.com', 'icicilombard.com'),
+    'kotak': ('kotaksecurities.com', 'kotakmf.com', 'kotaklife.com'),
+    'paytm': ('paytmbank.com', 'paytm.me', 'paytm.in', 'paytmmoney.com', 'paytmmall.com'),
+    'phonepe': ('phonepe.co.in',),
+    'flipkart': ('flipkartwholesale.com', 'flipkart.net'),
+    'irctc': ('irctc.com', 'irctctourism.com'),
+}
+
+# Confusable characters folded to the ASCII letter they imitate
+HOMOGLYPHS = str.maketrans({
+    '0': 'o', '1': 'l', '3': 'e', '4': 'a', '5': 's', '7': 't', '8': 'b', '|': 'l', '$': 's', '@': 'a',
+    'а': 'a', 'в': 'b', 'е': 'e', 'ё': 'e', 'к': 'k', 'м': 'm', 'н': 'h', 'о': 'o', 'р': 'p', 'с': 'c',
+    'т': 't', 'у': 'y', 'х': 'x', 'ѕ': 's', 'і': 'i', 'ї': 'i', 'ј': 'j', 'ԁ': 'd', 'ԛ': 'q', 'ԝ': 'w',
+    'ɑ': 'a', 'α': 'a', 'β': 'b', 'ε': 'e', 'η': 'n', 'ι': 'i', 'κ': 'k', 'ν': 'v', 'ο': 'o', 'ρ': 'p',
+    'τ': 't', 'υ': 'u', 'χ': 'x', 'ı': 'i', 'ł': 'l', 'ɡ': 'g', 'ɩ': 'i', 'ʏ': 'y',
+})
+MULTI_HOMOGLYPHS = (('rn', 'm'), ('vv', 'w'))
+TOKEN_SPLIT = re.compile(r'[-_\d]+')
+IPV4 = re.compile(r'^[\d.]+$')
+
+MIN_FUZZY_LENGTH = 5
+MIN_TOKEN_LENGTH = 3
+# Preference when several words of one host match
+KIND_RANK = {'homoglyph': 0, 'tld': 1, 'typo': 2, 'contains': 3}
+
+
+class LookalikeMatch(NamedTuple):
+    domain: str     # registrable domain of the checked host, punycode if IDN
+    brand: str      # brand name it imitates
+    kind: str       # homoglyph / typo / contains / tld
+    word: str       # the label or token that matched
+
+
+def skeleton(text: str) -> str:
+    """Fold confusables so visually identical strings compare equal."""
+    if text.isascii():
+        text = text.lower().translate(HOMOGLYPHS)
+    else:
+        text = unicodedata.normalize('NFKD', text.lower()).translate(HOMOGLYPHS)
+        # Drop combining marks left by NFKD (é -> e)
+        text = ''.join(c for c in text if not unicodedata.combining(c))
+    for glyphs, letter in MULTI_HOMOGLYPHS:
+        text = text.replace(glyphs, letter)
+    return text
+
+
+def normalize_host(url: str) -> Optional[str]:
+    """Lowercased Unicode host of a URL (or bare host), punycode decoded."""
+    try:
+        host = urlsplit(url if '//' in url else '//' + url).hostname
+    except ValueError:
+        return None
+    if not host:
+        return None
+    labels = []
+    for label in unicodedata.normalize('NFKC', host).rstrip('.').split('.'):
+        if label.startswith('xn--'):
+            try:
+                label = label.encode('ascii').decode('idna')
+            except UnicodeError:
+                pass
+        labels.append(label)
+    host = '.'.join(labels)
+    return None if IPV4.match(host) else host
+
+
+def split_host(host: str) -> Tuple[List[str], str]:
+    """(labels left of the public suffix, suffix); the last label is the registrable one."""
+    labels = host.split('.')
+    if len(labels) < 2:
+        return labels, ''
+    width = 2 if '.'.join(labels[-2:]) in MULTI_PART_SUFFIXES and len(labels) > 2 else 1
+    return labels[:-width], '.'.join(labels[-width:])
+
+
+def registrable_domain(host: str) -> str:
+    labels, suffix = split_host(host)
+    return f"{labels[-1]}.{suffix}" if suffix else host
+
+
+def ascii_domain(domain: str) -> str:
+    """Punycode form of an IDN, so a homoglyph domain doesn't display as the brand."""
+    if domain.isascii():
+        return domain
+    try:
+        return domain.encode('idna').decode('ascii')
+    except UnicodeError:
+        return domain
+
+
+def allowed_edits(length: int) -> int:
+    if length < MIN_FUZZY_LENGTH:
+        return 0
+    return 1 if length <= 8 else 2
+
+
+def deletions(word: str, edits: int) -> Set[str]:
+    """word with every choice of up to edits characters removed."""
+    out, level = {word}, {word}
+    for _ in range(edits):
+        level = {w[:i] + w[i + 1:] for w in level if len(w) > 1 for i in range(len(w))}
+        out |= level
+    return out
+
+
+def edit_distance(a: str, b: str, limit: int) -> int:
+    """Optimal-string-alignment distance (swaps count once), or limit + 1 if larger."""
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    previous2, previous = None, list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        current = [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            cost = a[i - 1] != b[j - 1]
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                current[j] = min(current[j], previous2[j - 2] + 1)
+        if min(current) > limit:
+            return limit + 1
+        previous2, previous = previous, current
+    return previous[-1]
+
+
+class BrandIndex:
+    """Precomputed lookup structures for a brand list; check() is thread-safe."""
+
+    def __init__(self, brands: Iterable[str] = DEFAULT_BRANDS, keywords: Iterable[str] = (),
+                 official: Dict[str, Iterable[str]] = OFFICIAL_DOMAINS, cache_size: int = 10000):
+        """keywords: generic impersonation words, matched only exactly (or as homoglyphs)."""
+        self.official = set()
+        # brand name -> its configured real domains (empty for bare names)
+        self.brands: Dict[str, Set[str]] = {}
+        for entry in brands:
+            entry = entry.strip().lower()
+            if not entry:
+                continue
+            if '.' in entry:
+                domain = registrable_domain(normalize_host(entry) or entry)
+                self.official.add(domain)
+                self.brands.setdefault(domain.split('.')[0], set()).add(domain)
+            else:
+                self.brands.setdefault(entry, set())
+        for name, domains in official.items():
+            if name in self.brands:
+                self.official.update(registrable_domain(domain.lower()) for domain in domains)
+        self._by_skeleton = {skeleton(name): name for name in self.brands if len(name) >= MIN_TOKEN_LENGTH}
+        self._glue_lengths = sorted({len(s) for s in self._by_skeleton if len(s) >= MIN_FUZZY_LENGTH})
+        self._neighbours: Dict[str, List[str]] = {}
+        for skel in self._by_skeleton:
+            for variant in deletions(skel, allowed_edits(len(skel))):
+                self._neighbours.setdefault(variant, []).append(skel)
+        self._max_length = max((len(s) for s in self._by_skeleton), default=0)
+        self._max_edits = allowed_edits(self._max_length)
+        # Kept apart from _by_skeleton so the typo and glue matching never sees them
+        self._keywords = {}
+        for keyword in keywords:
+            keyword = keyword.strip().lower()
+            if len(keyword) >= MIN_TOKEN_LENGTH and keyword not in self.brands:
+                self.brands[keyword] = set()
+                self._keywords.setdefault(skeleton(keyword), keyword)
+        self._cache = LRUCache(cache_size)
+
+    def __len__(self) -> int:
+        return len(self.brands)
+
+    def check(self, url: str) -> Optional[LookalikeMatch]:
+        """The brand a link's host imitates, or None."""
+        host = normalize_host(url)
+        if host is None:
+            return None
+        match = self._cache.get(host, False)
+        if match is False:
+            match = self._check_host(host)
+            self._cache.put(host, match)
+        return match
+
+    def _check_host(self, host: str) -> Optional[LookalikeMatch]:
+        labels, suffix = split_host(host)
+        domain = registrable_domain(host)
+        if not suffix or domain in self.official or any(
+                suffix == s or suffix.endswith('.' + s) for s in TRUSTED_SUFFIXES):
+            return None
+        best = None
+        for n, label in enumerate(labels):
+            registrable = n == len(labels) - 1
+            tokens = [t for t in TOKEN_SPLIT.split(label) if t]
+            words = [(label, registrable)]
+            if len(tokens) > 1 or (tokens and tokens[0] != label):
+                words += [(token, False) for token in tokens]
+            for word, whole in words:
+                found = self._match_word(word, whole)
+                if found is not None and (best is None or KIND_RANK[found[1]] < KIND_RANK[best[1]]):
+                    best = (found[0], found[1], word)
+        return LookalikeMatch(ascii_domain(domain), *best) if best else None
+
+    def _match_word(self, word: str, whole: bool) -> Optional[Tuple[str, str]]:
+        """(brand, kind) for one label or token; whole means it is the registrable label."""
+        skel = skeleton(word)
+        if len(skel) < MIN_TOKEN_LENGTH:
+            return None
+        name = self._by_skeleton.get(skel) or self._keywords.get(skel)
+        if name is not None:
+            if word != name:
+                return name, 'homoglyph'
+            if not whole:
+                return name, 'contains'
+            # A bare brand name under some suffix: only suspicious if its real domains are known
+            return (name, 'tld') if self.brands[name] else None
+        if MIN_FUZZY_LENGTH - self._max_edits <= len(skel) <= self._max_length + self._max_edits:
+            # Only brands as long as the query give or take an edit or two can match;
+            # deleting more characters than the longest of them allows finds nothing new
+            edits = min(self._max_edits, allowed_edits(len(skel) + self._max_edits))
+            for variant in deletions(skel, edits):
+                for candidate in self._neighbours.get(variant, ()):
+                    edits = allowed_edits(len(candidate))
+                    if edits and edit_distance(skel, candidate, edits) <= edits:
+                        return self._by_skeleton[candidate], 'typo'
+        for length in self._glue_lengths:
+            if length >= len(skel):
+                break
+            name = self._by_skeleton.get(skel[:length]) or self._by_skeleton.get(skel[-length:])
+            if name is not None:
+                return name, 'contains'
+        return None
+
+    def stats(self) -> Dict:
+        return {'brands': len(self.brands), 'official_domains': len(self.official),
+                'index_keys': len(self._neighbours), 'cached_hosts': len(self._cache)}
@@ -0,0 +1,200 @@
+"""
+Lightweight in-process metrics with Prometheus text exposition.
+
+Recording is a lock plus a couple of integer updates; nothing is formatted
+until render() is called by a scrape, so an unscraped process pays almost
+nothing. Metrics are per process: with several gunicorn workers each
+scrape sees the worker that served it.
+"""
+
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Tuple
+
+# Seconds; tuned for sub-millisecond regex stages up to slow callbacks
+DEFAULT_BUCKETS = (0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005,
+                   0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+
+
+def _format_labels(names: Tuple[str, ...], values: Tuple[str, ...], extra: str = '') -> str:
+    pairs = [f'{name}="{value}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _format_value(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    """Monotonic counter, optionally split by label values."""
+
+    kind = 'counter'
+
+    def __init__(self, name: str, help_text: str, labels: Tuple[str, ...] = ()):
+        self.name = name
+        self.help = help_text
+        self.labels = labels
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *label_values: str, amount: int = 1):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def value(self, *label_values: str) -> int:
+        return self._values.get(label_values, 0)
+
+    def values(self) -> Dict[Tuple[str, ...], int]:
+        with self._lock:
+            return dict(self._values)
+
+    def samples(self) -> Iterator[str]:
+        for label_values, value in sorted(self.values().items()):
+            yield f'{self.name}{_format_labels(self.labels, label_values)} {value}'
+
+
+class Gauge:
+    """Point-in-time value read from a callback at scrape time."""
+
+    kind = 'gauge'
+
+    def __init__(self, name: str, help_text: str, read: Callable[[], float]):
+        self.name = name
+        self.help = help_text
+        self.read = read
+
+    def samples(self) -> Iterator[str]:
+        yield f'{self.name} {_format_value(self.read())}'
+
+
+class Histogram:
+    """Fixed-bucket histogram, optionally split by label values."""
+
+    kind = 'histogram'
+
+    def __init__(self, name: str, help_text: str, labels: Tuple[str, ...] = (),
+                 buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.labels = labels
+        self.buckets = tuple(buckets)
+        # label values -> [per-bucket counts (+Inf last), sum, count]
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *label_values: str):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    @contextmanager
+    def time(self, *label_values: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, *label_values)
+
+    def snapshot(self) -> Dict[Tuple[str, ...], Tuple[List[int], float, int]]:
+        with self._lock:
+            return {key: (list(counts), total, count) for key, (counts, total, count) in self._series.items()}
+
+    def samples(self) -> Iterator[str]:
+        for label_values, (counts, total, count) in sorted(self.snapshot().items()):
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += bucket_count
+                le = f'le="{_format_value(bound)}"'
+                yield f'{self.name}_bucket{_format_labels(self.labels, label_values, le)} {cumulative}'
+            yield f'{self.name}_sum{_format_labels(self.labels, label_values)} {total!r}'
+            yield f'{self.name}_count{_format_labels(self.labels, label_values)} {count}'
+
+
+class RollingRate:
+    """Event counts over the last 1m / 5m / 1h in fixed ring buffers.
+
+    Marks and reads touch at most 60 second-slots and 60 minute-slots, so
+    both are constant time regardless of traffic volume.
+    """
+
+    def __init__(self, clock: Callable[[], float] = time.time):
+        self.clock = clock
+        self._seconds = [0] * 60
+        self._second_stamps = [-1] * 60
+        self._minutes = [0] * 60
+        self._minute_stamps = [-1] * 60
+        self._lock = threading.Lock()
+
+    def mark(self, amount: int = 1):
+        second = int(self.clock())
+        minute = second // 60
+        with self._lock:
+            slot = second % 60
+            if self._second_stamps[slot] != second:
+                self._second_stamps[slot] = second
+                self._seconds[slot] = 0
+            self._seconds[slot] += amount
+            slot = minute % 60
+            if self._minute_stamps[slot] != minute:
+                self._minute_stamps[slot] = minute
+                self._minutes[slot] = 0
+            self._minutes[slot] += amount
+
+    def _minutes_total(self, minute: int, span: int) -> int:
+        return sum(count for count, stamp in zip(self._minutes, self._minute_stamps)
+                   if minute - span < stamp <= minute)
+
+    def rates(self) -> Dict[str, float]:
+        """Average events per minute over each window."""
+        second = int(self.clock())
+        minute = second // 60
+        with self._lock:
+            last_minute = sum(count for count, stamp in zip(self._seconds, self._second_stamps)
+                              if second - 60 < stamp <= second)
+            return {
+                '1m': float(last_minute),
+                '5m': round(self._minutes_total(minute, 5) / 5, 2),
+                '1h': round(self._minutes_total(minute, 60) / 60, 2)
+            }
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, name: str, help_text: str, labels: Tuple[str, ...] = ()) -> Counter:
+        return self.register(Counter(name, help_text, labels))
+
+    def gauge(self, name: str, help_text: str, read: Callable[[], float]) -> Gauge:
+        return self.register(Gauge(name, help_text, read))
+
+    def histogram(self, name: str, help_text: str, labels: Tuple[str, ...] = (),
+                  buckets: Tuple[float, ...] = DEFAULT_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, help_text, labels, buckets))
+
+    def render(self) -> str:
+        """Prometheus text exposition format (version 0.0.4)."""
+        lines = []
+        for metric in self._metrics:
+            lines.append(f'# HELP {metric.name} {metric.help}')
+            lines.append(f'# TYPE {metric.name} {metric.kind}')
+            lines.extend(metric.samples())
+        return '\n'.join(lines) + '\n'
+
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
@@ -0,0 +1,168 @@
+"""
+Optional ML scorer: hashed character n-grams + a linear (logistic) model.
+
+Pure NumPy. Messages are normalized (lowercased, digits folded to 0,
+whitespace collapsed), cut into character n-grams, and each n-gram is
+hashed into a fixed 2**bits weight vector. A whole batch is featurized on
+one concatenated code-point array and scored as a single sparse
+matrix-vector product (gather + bincount).
+
+A trained model is two files written by train_model.py:
+    <path>.npy   float32 weights, memory-mapped on load
+    <path>.json  metadata (bits, n-gram range, bias, threshold)
+
+NumPy is only imported when a model is first used, so workers that run in
+keyword-only mode never pay for it.
+"""
+
+import json
+import logging
+import os
+import re
+import threading
+from typing import List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+DIGITS = re.compile(r'\d')
+SPACES = re.compile(r'\s+')
+HASH_MULTIPLIER = 0x9E3779B97F4A7C15  # 64-bit golden ratio, for Fibonacci hashing
+ROLL_BASE = 1000003
+
+
+def normalize(text: str) -> str:
+    # NUL separates messages in HashedNgramFeaturizer.transform, so none may remain
+    text = text.replace('\x00', ' ')
+    return ' ' + SPACES.sub(' ', DIGITS.sub('0', text.lower())).strip() + ' '
+
+
+class HashedNgramFeaturizer:
+    """Maps texts to sparse (row, column, value) triples over 2**bits columns."""
+
+    def __init__(self, bits: int = 18, ngram_range: Sequence[int] = (2, 4)):
+        self.bits = bits
+        self.ngram_range = tuple(ngram_range)
+
+    def transform(self, texts: Sequence[str]):
+        """Returns (rows, columns, values) for len(texts) rows; values are tf / sqrt(n-grams)."""
+        import numpy as np
+
+        # Code points of all messages, separated by 0 so n-grams never span two messages
+        normalized = [normalize(t) for t in texts]
+        joined = '\x00'.join(normalized)
+        codes = np.frombuffer(joined.encode('utf-32-le'), dtype=np.uint32).astype(np.uint64)
+        separator = (codes == 0).astype(np.int64)
+        separator_cum = np.concatenate(([0], np.cumsum(separator)))
+        # Row of every position: number of separators before it
+        row_of = separator_cum[:-1]
+
+        rows, columns = [], []
+        low, high = self.ngram_range
+        for n in range(low, high + 1):
+            count = len(codes) - n + 1
+            if count <= 0:
+                continue
+            h = np.zeros(count, dtype=np.uint64)
+            for k in range(n):
+                h = h * np.uint64(ROLL_BASE) + codes[k:k + count]
+            h = (h + np.uint64(n)) * np.uint64(HASH_MULTIPLIER)
+            valid = (separator_cum[n:n + count] - separator_cum[:count]) == 0
+            rows.append(row_of[:count][valid])
+            columns.append((h[valid] >> np.uint64(64 - self.bits)).astype(np.int64))
+
+        if rows:
+            rows = np.concatenate(rows)
+            columns = np.concatenate(columns)
+        else:
+            rows = np.zeros(0, dtype=np.int64)
+            columns = np.zeros(0, dtype=np.int64)
+        per_row = np.bincount(rows, minlength=len(texts)).astype(np.float32)
+        values = 1.0 / np.sqrt(np.maximum(per_row, 1.0))[rows]
+        return rows, columns, values.astype(np.float32)
+
+
+class LinearModel:
+    def __init__(self, weights, bias: float, threshold: float, featurizer: HashedNgramFeaturizer):
+        self.weights = weights
+        self.bias = bias
+        self.threshold = threshold
+        self.featurizer = featurizer
+
+    @classmethod
+    def load(cls, path: str) -> 'LinearModel':
+        import numpy as np
+
+        with open(path + '.json') as f:
+            meta = json.load(f)
+        weights = np.load(path + '.npy', mmap_mode='r')
+        featurizer = HashedNgramFeaturizer(meta['bits'], meta['ngram_range'])
+        return cls(weights, meta['bias'], meta['threshold'], featurizer)
+
+    def save(self, path: str, **extra_meta):
+        import numpy as np
+
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        np.save(path + '.npy', np.asarray(self.weights, dtype=np.float32))
+        meta = {'bits': self.featurizer.bits, 'ngram_range': list(self.featurizer.ngram_range),
+                'bias': float(self.bias), 'threshold': float(self.threshold), **extra_meta}
+        with open(path + '.json', 'w') as f:
+            json.dump(meta, f, indent=2)
+
+    def predict_proba(self, texts: Sequence[str]):
+        """Scam probability for every text, computed as one sparse X @ w."""
+        import numpy as np
+
+        rows, columns, values = self.featurizer.transform(texts)
+        logits = np.bincount(rows, weights=self.weights[columns] * values, minlength=len(texts)) + self.bias
+        assert len(logits) == len(texts), "featurizer rows out of step with the batch"
+        return 1.0 / (1.0 + np.exp(-logits))
+
+
+class MLScorer:
+    """Lazily loads a LinearModel on first use; degrades to None when unavailable.
+
+    mode is 'keyword' (ML off), 'ml' (model probability only) or 'blend'
+    (blend_weight * probability + (1 - blend_weight) * keyword score).
+    """
+
+    def __init__(self, path: str, mode: str = 'keyword', blend_weight: float = 0.5):
+        self.path = path
+        self.mode = mode
+        self.blend_weight = blend_weight
+        self._model = None
+        self._failed = False
+        self._lock = threading.Lock()
+
+    @property
+    def loaded(self) -> bool:
+        return self._model is not None
+
+    def model(self) -> Optional[LinearModel]:
+        if self._model is None and not self._failed:
+            with self._lock:
+                if self._model is None and not self._failed:
+                    try:
+                        self._model = LinearModel.load(self.path)
+                        logger.info("Loaded ML scoring model from %s", self.path)
+                    except (ImportError, OSError, ValueError, KeyError) as e:
+                        self._failed = True
+                        logger.warning("ML scorer unavailable, using keyword scores only: %s", e)
+        return self._model
+
+    def score_batch(self, texts: Sequence[str]) -> Optional[List[float]]:
+        model = self.model() if self.mode != 'keyword' else None
+        if model is None or not texts:
+            return None
+        return model.predict_proba(texts).tolist()
+
+    def combine(self, keyword_score: float, keyword_threshold: float,
+                probability: Optional[float]) -> Tuple[float, float]:
+        """Returns (score, threshold) for the configured mode, falling back to keywords."""
+        if probability is None:
+            return keyword_score, keyword_threshold
+        threshold = self._model.threshold
+        if self.mode == 'ml':
+            return probability, threshold
+        w = self.blend_weight
+        return (w * probability + (1 - w) * keyword_score,
+                w * threshold + (1 - w) * keyword_threshold)
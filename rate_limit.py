@@ -0,0 +1,285 @@
+"""
+Per-client rate limiting and load shedding for the analyze endpoints.
+
+Token buckets are keyed by API key, source IP and session id. A request
+without an API key is charged the key limit against an anonymous bucket
+for its source IP, so leaving the header out doesn't lift the limit. Each bucket
+refills at `rate` tokens per second up to `burst`. take() is
+all-or-nothing across the buckets it is given, so a request refused by
+its key bucket does not also drain its IP bucket.
+
+Two bucket backends share one interface, mirroring session_store:
+- TokenBuckets: in-process (pairs with the memory session backend)
+- SQLiteTokenBuckets: a table in the session database, so every gunicorn
+  worker on the node draws from the same buckets
+
+LoadShedder caps requests in flight per worker and refuses a request
+before any parsing once it has waited too long, counting time spent in
+an upstream queue (X-Request-Start) plus time waiting for a slot.
+"""
+
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, NamedTuple, Optional, Sequence, Tuple
+
+
+class Limit(NamedTuple):
+    rate: float     # tokens per second
+    burst: float    # bucket capacity
+
+    @property
+    def idle_seconds(self) -> float:
+        """After this long untouched the bucket is full again and can be forgotten."""
+        return self.burst / self.rate
+
+
+# (bucket key, limit, tokens to take)
+Charge = Tuple[str, Limit, float]
+
+
+def refill(tokens: float, stamp: float, limit: Limit, now: float) -> float:
+    return min(limit.burst, tokens + max(0.0, now - stamp) * limit.rate)
+
+
+class TokenBuckets:
+    """In-process buckets, LRU-bounded to max_keys.
+
+    Dropping the least recently used key is the same as that bucket being
+    full, so the bound can only make limiting more lenient, never stricter.
+    """
+
+    def __init__(self, max_keys: int = 100000, clock: Callable[[], float] = time.monotonic):
+        self.max_keys = max_keys
+        self.clock = clock
+        self._buckets = OrderedDict()  # key -> [tokens, stamp]
+        self._lock = threading.Lock()
+
+    def take(self, charges: Sequence[Charge]) -> Optional[Tuple[str, float]]:
+        """Take tokens from every bucket, or from none.
+
+        Returns None when allowed, else (key, seconds until it would be).
+        """
+        with self._lock:
+            now = self.clock()
+            levels = []
+            for key, limit, cost in charges:
+                bucket = self._buckets.get(key)
+                tokens = limit.burst if bucket is None else refill(bucket[0], bucket[1], limit, now)
+                if tokens < cost:
+                    return key, (cost - tokens) / limit.rate
+                levels.append((key, tokens - cost))
+            for key, tokens in levels:
+                self._buckets[key] = [tokens, now]
+                self._buckets.move_to_end(key)
+            while len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        return None
+
+    def stats(self) -> Dict:
+        return {'backend': 'memory', 'tracked_keys': len(self._buckets), 'max_keys': self.max_keys}
+
+
+class SQLiteTokenBuckets:
+    """Buckets in a WAL-mode SQLite table shared by every worker process.
+
+    Each take() is one BEGIN IMMEDIATE transaction. Rows idle for longer
+    than prune_after seconds (by then the bucket is full) are deleted every
+    PRUNE_EVERY calls.
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS rate_buckets (
+            key TEXT PRIMARY KEY,
+            tokens REAL NOT NULL,
+            stamp REAL NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS rate_buckets_stamp ON rate_buckets(stamp);
+    """
+    PRUNE_EVERY = 1000
+
+    def __init__(self, path: str, prune_after: float = 3600, clock: Callable[[], float] = time.time):
+        self.path = path
+        self.prune_after = prune_after
+        self.clock = clock
+        self._local = threading.local()
+        self._calls = 0
+        self._conn().executescript(self.SCHEMA)
+
+    def _conn(self) -> sqlite3.Connection:
+        # A connection must not cross a fork: a child opens its own
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None, check_same_thread=False)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            conn.execute('PRAGMA busy_timeout=30000')
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def take(self, charges: Sequence[Charge]) -> Optional[Tuple[str, float]]:
+        conn = self._conn()
+        self._calls += 1
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            now = self.clock()
+            levels = []
+            for key, limit, cost in charges:
+                row = conn.execute('SELECT tokens, stamp FROM rate_buckets WHERE key = ?', (key,)).fetchone()
+                tokens = limit.burst if row is None else refill(row[0], row[1], limit, now)
+                if tokens < cost:
+                    conn.execute('ROLLBACK')
+                    return key, (cost - tokens) / limit.rate
+                levels.append((key, tokens - cost, now))
+            conn.executemany('INSERT OR REPLACE INTO rate_buckets (key, tokens, stamp) VALUES (?, ?, ?)', levels)
+            if self._calls % self.PRUNE_EVERY == 0:
+                conn.execute('DELETE FROM rate_buckets WHERE stamp < ?', (now - self.prune_after,))
+            conn.execute('COMMIT')
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+        return None
+
+    def stats(self) -> Dict:
+        tracked = self._conn().execute('SELECT COUNT(*) FROM rate_buckets').fetchone()[0]
+        return {'backend': 'sqlite', 'tracked_keys': tracked}
+
+
+def create_buckets(backend: str = 'memory', path: str = 'honeypot_sessions.db', prune_after: float = 3600):
+    """Buckets shared the same way as the configured session backend."""
+    if backend == 'sqlite':
+        return SQLiteTokenBuckets(path, prune_after=prune_after)
+    return TokenBuckets()
+
+
+class RateLimiter:
+    """Applies the per-key, per-IP and per-session limits; a None limit is off."""
+
+    def __init__(self, buckets, key_limit: Optional[Limit] = None, ip_limit: Optional[Limit] = None,
+                 session_limit: Optional[Limit] = None):
+        self.buckets = buckets
+        self.key_limit = key_limit
+        self.ip_limit = ip_limit
+        self.session_limit = session_limit
+
+    def check_client(self, api_key: Optional[str], ip: Optional[str],
+                     cost: float = 1) -> Optional[Tuple[str, float]]:
+        """Returns None if allowed, else ('key' | 'ip', retry_after seconds).
+
+        Keyless requests count against the key limit under 'a:<ip>'.
+
+        cost is capped at each bucket's burst so a large batch can still pass
+        from a full bucket.
+        """
+        charges = []
+        if self.key_limit is not None:
+            client = 'k:' + api_key if api_key else 'a:' + (ip or '')
+            charges.append((client, self.key_limit, min(cost, self.key_limit.burst)))
+        if self.ip_limit is not None and ip:
+            charges.append(('i:' + ip, self.ip_limit, min(cost, self.ip_limit.burst)))
+        if not charges:
+            return None
+        refused = self.buckets.take(charges)
+        if refused is None:
+            return None
+        key, retry_after = refused
+        return ('ip' if key.startswith('i:') else 'key'), retry_after
+
+    def check_session(self, session_id: str) -> Optional[float]:
+        """Returns None if the session may take another turn, else retry_after seconds."""
+        if self.session_limit is None:
+            return None
+        refused = self.buckets.take([('s:' + session_id, self.session_limit, 1)])
+        return None if refused is None else refused[1]
+
+    def stats(self) -> Dict:
+        def describe(limit: Optional[Limit]):
+            return None if limit is None else {'rate_per_sec': limit.rate, 'burst': limit.burst}
+        return {
+            'per_api_key': describe(self.key_limit),
+            'per_ip': describe(self.ip_limit),
+            'per_session': describe(self.session_limit),
+            **self.buckets.stats()
+        }
+
+
+def limit_from(rate: float, burst: float) -> Optional[Limit]:
+    """Build a Limit from config values; a rate of 0 disables it."""
+    if rate <= 0:
+        return None
+    return Limit(rate, max(burst, 1.0))
+
+
+# ==================== LOAD SHEDDING ====================
+
+def upstream_queue_delay(header: Optional[str], now: Optional[float] = None) -> float:
+    """Seconds a request spent queued upstream, from an X-Request-Start header.
+
+    Accepts nginx's "t=<seconds.millis>" and Heroku's epoch milliseconds
+    (microseconds too); anything unparseable counts as no delay.
+    """
+    if not header:
+        return 0.0
+    try:
+        start = float(header.strip().lstrip('t='))
+    except ValueError:
+        return 0.0
+    if start > 1e14:
+        start /= 1e6
+    elif start > 1e11:
+        start /= 1e3
+    return max(0.0, (time.time() if now is None else now) - start)
+
+
+class LoadShedder:
+    """Bounds requests in flight per worker and sheds those that queued too long.
+
+    acquire() returns True with a slot held (release() it when done) or
+    False when the request should get a fast refusal instead. A
+    max_in_flight of 0 turns the slot cap off and a max_wait of 0 turns the
+    queue-delay check off (a full worker then refuses immediately).
+    """
+
+    def __init__(self, max_in_flight: int = 0, max_wait: float = 0.1):
+        self.max_in_flight = max_in_flight
+        self.max_wait = max_wait
+        self._slots = threading.BoundedSemaphore(max_in_flight) if max_in_flight > 0 else None
+        self._lock = threading.Lock()
+        self.in_flight = 0
+        self.admitted = 0
+        self.shed = 0
+        self.peak_in_flight = 0
+
+    def acquire(self, queued_for: float = 0.0, block: bool = True) -> bool:
+        """block=False never waits for a slot (for event-loop callers)."""
+        admitted = not (self.max_wait > 0 and queued_for >= self.max_wait)
+        if admitted and self._slots is not None:
+            wait = self.max_wait - queued_for if block else 0
+            admitted = self._slots.acquire(timeout=wait) if wait > 0 else self._slots.acquire(blocking=False)
+        with self._lock:
+            if not admitted:
+                self.shed += 1
+                return False
+            self.admitted += 1
+            self.in_flight += 1
+            self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+        return True
+
+    def release(self):
+        with self._lock:
+            self.in_flight -= 1
+        if self._slots is not None:
+            self._slots.release()
+
+    def stats(self) -> Dict:
+        return {
+            'max_in_flight': self.max_in_flight,
+            'max_queue_wait_ms': round(self.max_wait * 1000, 1),
+            'in_flight': self.in_flight,
+            'peak_in_flight': self.peak_in_flight,
+            'admitted': self.admitted,
+            'shed': self.shed
+        }
@@ -0,0 +1,458 @@
+"""
+Versioned detection and reply rules, compiled once and hot-swapped.
+
+A rules file (JSON, or YAML when PyYAML is installed) holds the keyword
+categories and weights, the URL / 10-digit / lookalike-domain signal
+weights, the protected brands, the scam threshold and the turn-scripted
+reply table:
+
+    {
+      "version": "2026-10-18.1",
+      "threshold": 0.25,
+      "signals": {"url": 0.15, "digits": 0.05, "lookalike": 0.05},
+      "brands": ["sbi.co.in", "amazon.in", "paytm", ...],
+      "categories": {"urgency": {"weight": 0.15, "patterns": ["urgent", "now"]}, ...},
+      "replies": {
+        "empty": "Hello?",
+        "turns": {"1": [{"any": ["block", "suspend"], "reply": "Why is my account blocked?"},
+                        {"reply": "What is this about?"}], ...},
+        "default": [{"reply": "Can you send official email? What's your email address?"}]
+      }
+    }
+
+compile_rules() validates everything before anything is installed. That
+includes rejecting regexes that could backtrack catastrophically, so a bad
+edit is refused and the running rules stay active. The result is one
+immutable RuleSet, with its lookalike.BrandIndex built from the brands
+plus the impersonation category's keywords. Swapping it in is a single
+reference assignment (ScamDetector.install_rules), so a request never sees
+half of an update.
+RuleManager reloads the file when its mtime changes, or on demand.
+"""
+
+import json
+import logging
+import os
+import re
+import threading
+import time
+from typing import Callable, Dict, Iterable, NamedTuple, Optional, Tuple
+
+from lookalike import DEFAULT_BRANDS, BrandIndex
+
+try:
+    from re import _constants as sre_constants, _parser as sre_parse
+except ImportError:  # Python < 3.11
+    import sre_constants
+    import sre_parse
+
+logger = logging.getLogger(__name__)
+
+REGEX_META = frozenset('.^$*+?{}[]\\|()')
+MAX_PATTERN_LENGTH = 200
+MAX_COUNTED_REPEAT = 1000
+# Adversarial inputs each pattern must finish scanning within PROBE_BUDGET seconds
+# of CPU time; the structural checks run first and this only backs them up
+PROBE_START_LENGTH = 32
+PROBE_LENGTH = 5000
+PROBE_BUDGET = 0.05
+# Character classes wider than this count as "any character" for overlap checks
+MAX_CLASS_SPAN = 256
+# Literal keywords of this category are protected brand names too
+IMPERSONATION_CATEGORY = 'impersonation'
+
+DEFAULT_REPLIES = {
+    'empty': "Hello?",
+    'turns': {
+        '1': [{'any': ['block', 'suspend'], 'reply': "Why is my account blocked?"},
+              {'any': ['won', 'prize'], 'reply': "Really? How do I claim it?"},
+              {'any': ['verify'], 'reply': "How do I verify? What info do you need?"},
+              {'reply': "What is this about?"}],
+        '2': [{'any': ['link', 'click'], 'reply': "I'm worried about links. Can you give me details?"},
+              {'any': ['call'], 'reply': "What number should I call?"},
+              {'any': ['upi', 'payment'], 'reply': "Where should I send payment? What's your UPI?"},
+              {'reply': "Can you give me your contact information?"}],
+        '3': [{'reply': "I'm nervous. What's your company name and employee ID?"}],
+        '4': [{'reply': "How much do I pay? What's your account number?"}]
+    },
+    'default': [{'reply': "Can you send official email? What's your email address?"}]
+}
+
+
+class RuleError(ValueError):
+    """A rules document failed validation; the message says where."""
+
+
+class RuleSet(NamedTuple):
+    version: str
+    # (category, weight, literal keywords, compiled regex or None) per category
+    categories: Tuple
+    url_weight: float
+    digits_weight: float
+    lookalike_weight: float
+    threshold: float
+    # turn -> ((keywords, reply), ...); an empty keyword tuple always matches
+    replies: Dict[int, Tuple]
+    default_replies: Tuple
+    empty_reply: str
+    # Source tables, kept for introspection and ScamDetector's legacy attributes
+    patterns: Dict[str, list]
+    weights: Dict[str, float]
+    reply_rules: Dict
+    brands: Tuple[str, ...]
+    brand_index: BrandIndex
+
+
+# ==================== VALIDATION ====================
+
+REPEAT_OPS = {sre_constants.MAX_REPEAT, sre_constants.MIN_REPEAT}
+if hasattr(sre_constants, 'POSSESSIVE_REPEAT'):
+    REPEAT_OPS.add(sre_constants.POSSESSIVE_REPEAT)
+GROUPREF_OPS = {sre_constants.GROUPREF, sre_constants.GROUPREF_EXISTS}
+
+
+ANY_CHAR = None
+ZERO_WIDTH_OPS = {sre_constants.AT, sre_constants.ASSERT, sre_constants.ASSERT_NOT}
+
+
+def _first_chars(items) -> Tuple[Optional[frozenset], bool]:
+    """(characters a match of items can start with, or ANY_CHAR if unknown; whether items can match empty)."""
+    chars = set()
+    for op, av in items:
+        nullable = False
+        if op == sre_constants.LITERAL:
+            first = {av}
+        elif op == sre_constants.IN:
+            first = set()
+            for kind, value in av:
+                if kind == sre_constants.LITERAL:
+                    first.add(value)
+                elif kind == sre_constants.RANGE and value[1] - value[0] <= MAX_CLASS_SPAN:
+                    first.update(range(value[0], value[1] + 1))
+                else:
+                    return ANY_CHAR, False
+        elif op == sre_constants.SUBPATTERN:
+            first, nullable = _first_chars(av[-1])
+        elif op == sre_constants.BRANCH:
+            first, nullable = set(), False
+            for branch in av[1]:
+                found, empty = _first_chars(branch)
+                if found is ANY_CHAR:
+                    return ANY_CHAR, False
+                first |= found
+                nullable = nullable or empty
+        elif op in REPEAT_OPS:
+            first, nullable = _first_chars(av[2])
+            nullable = nullable or av[0] == 0
+        elif op in ZERO_WIDTH_OPS:
+            first, nullable = set(), True
+        else:
+            return ANY_CHAR, False
+        if first is ANY_CHAR:
+            return ANY_CHAR, False
+        chars |= first
+        if not nullable:
+            return frozenset(chars), False
+    return frozenset(chars), True
+
+
+def _overlapping(branches, follow) -> bool:
+    """Whether two alternatives can start with the same character.
+
+    An alternative that can match empty starts with whatever follows it.
+    """
+    seen = set()
+    for branch in branches:
+        first, nullable = _first_chars(branch)
+        if nullable and first is not ANY_CHAR:
+            first = ANY_CHAR if follow is ANY_CHAR else first | follow
+        if first is ANY_CHAR or seen & first:
+            return True
+        seen |= first
+    return False
+
+
+def _then(rest, follow):
+    """Characters that can come next: those rest starts with, plus follow if rest can be empty."""
+    first, nullable = _first_chars(rest)
+    if first is ANY_CHAR or not nullable:
+        return first
+    return ANY_CHAR if follow is ANY_CHAR else first | follow
+
+
+def _check_tree(items, inside_unbounded: bool, pattern: str, follow=frozenset()):
+    """follow: characters that can come after items (under an unbounded repeat, the next iteration)."""
+    for n, (op, av) in enumerate(items):
+        if op in REPEAT_OPS:
+            low, high, sub = av
+            unbounded = high == sre_constants.MAXREPEAT
+            if not unbounded and high > MAX_COUNTED_REPEAT:
+                raise RuleError(f"pattern {pattern!r}: counted repeat {{{low},{high}}} is too large")
+            if inside_unbounded and (unbounded or high > 1):
+                raise RuleError(f"pattern {pattern!r}: nested quantifiers can backtrack exponentially")
+            if unbounded:
+                _check_tree(sub, True, pattern, _first_chars(sub)[0])
+            else:
+                _check_tree(sub, inside_unbounded, pattern, _then(items[n + 1:], follow))
+        elif op in GROUPREF_OPS:
+            raise RuleError(f"pattern {pattern!r}: backreferences are not allowed")
+        elif op == sre_constants.SUBPATTERN:
+            _check_tree(av[-1], inside_unbounded, pattern, _then(items[n + 1:], follow))
+        elif op == sre_constants.BRANCH:
+            after = _then(items[n + 1:], follow)
+            if inside_unbounded and _overlapping(av[1], after):
+                raise RuleError(f"pattern {pattern!r}: overlapping alternatives under a repeat "
+                                f"can backtrack exponentially")
+            for branch in av[1]:
+                _check_tree(branch, inside_unbounded, pattern, after)
+        elif op in (sre_constants.ASSERT, sre_constants.ASSERT_NOT):
+            _check_tree(av[1], inside_unbounded, pattern)
+
+
+def validate_pattern(pattern: str) -> Optional['re.Pattern']:
+    """Reject regexes that are invalid or could blow up matching time.
+
+    Returns the compiled regex, or None for a plain keyword.
+    """
+    if not isinstance(pattern, str) or not pattern:
+        raise RuleError(f"pattern {pattern!r}: must be a non-empty string")
+    if len(pattern) > MAX_PATTERN_LENGTH:
+        raise RuleError(f"pattern {pattern[:40]!r}...: longer than {MAX_PATTERN_LENGTH} characters")
+    if not REGEX_META.intersection(pattern):
+        return None
+    try:
+        compiled = re.compile(pattern)
+        tree = sre_parse.parse(pattern)
+    except re.error as e:
+        raise RuleError(f"pattern {pattern!r}: {e}")
+    _check_tree(tree, False, pattern)
+
+    # Fallback for what the static checks can't see, like (a|aa)*: time
+    # near-miss inputs built from the pattern's own characters. Probes double
+    # in length, so an exponential pattern is caught while still short. The
+    # clock is this thread's CPU time and a slow probe is run again, so a
+    # busy host doesn't reject a safe pattern
+    letters = ''.join(sorted({c for c in pattern.lower() if c.isalnum()})) or 'a'
+    length = PROBE_START_LENGTH
+    while True:
+        for probe in (letters[0] * length + '!', (letters * length)[:length] + '!',
+                      ' ' * length + '!', '0' * length + 'x'):
+            if _probe_seconds(compiled, probe) > PROBE_BUDGET and _probe_seconds(compiled, probe) > PROBE_BUDGET:
+                raise RuleError(f"pattern {pattern!r}: too slow on adversarial input")
+        if length >= PROBE_LENGTH:
+            return compiled
+        length = min(length * 2, PROBE_LENGTH)
+
+
+def _probe_seconds(compiled, probe: str) -> float:
+    start = time.thread_time()
+    compiled.search(probe)
+    return time.thread_time() - start
+
+
+def _number(doc: Dict, key: str, default: float, where: str) -> float:
+    value = doc.get(key, default)
+    if isinstance(value, bool) or not isinstance(value, (int, float)) or not 0 <= value <= 1:
+        raise RuleError(f"{where}.{key}: must be a number between 0 and 1")
+    return float(value)
+
+
+def _compile_replies(rows, where: str) -> Tuple:
+    if not isinstance(rows, list) or not rows:
+        raise RuleError(f"{where}: must be a non-empty list of rules")
+    compiled = []
+    for n, row in enumerate(rows):
+        if not isinstance(row, dict) or not isinstance(row.get('reply'), str):
+            raise RuleError(f"{where}[{n}]: needs a 'reply' string")
+        keywords = row.get('any', [])
+        if not isinstance(keywords, list) or not all(isinstance(k, str) and k for k in keywords):
+            raise RuleError(f"{where}[{n}].any: must be a list of keywords")
+        compiled.append((tuple(k.lower() for k in keywords), row['reply']))
+    if compiled[-1][0]:
+        raise RuleError(f"{where}: the last rule must have no 'any' so every message gets a reply")
+    return tuple(compiled)
+
+
+# ==================== COMPILATION ====================
+
+def compile_rules(doc: Dict) -> RuleSet:
+    """Validate a rules document and compile it into a RuleSet."""
+    if not isinstance(doc, dict):
+        raise RuleError("rules document must be an object")
+    categories = doc.get('categories')
+    if not isinstance(categories, dict) or not categories:
+        raise RuleError("categories: must be a non-empty object")
+
+    plan, patterns, weights = [], {}, {}
+    for category, spec in categories.items():
+        where = f"categories.{category}"
+        if not isinstance(spec, dict) or not isinstance(spec.get('patterns'), list) or not spec['patterns']:
+            raise RuleError(f"{where}.patterns: must be a non-empty list")
+        weight = _number(spec, 'weight', 0.1, where)
+        literals, regexes = [], []
+        for pattern in spec['patterns']:
+            if validate_pattern(pattern) is None:
+                literals.append(pattern.lower())
+            else:
+                regexes.append(pattern)
+        compiled = re.compile('|'.join(f'(?:{p})' for p in regexes)) if regexes else None
+        plan.append((category, weight, tuple(literals), compiled))
+        patterns[category] = list(spec['patterns'])
+        weights[category] = weight
+
+    signals = doc.get('signals', {})
+    replies = doc.get('replies', DEFAULT_REPLIES)
+    if not isinstance(signals, dict) or not isinstance(replies, dict):
+        raise RuleError("signals and replies must be objects")
+    turns = replies.get('turns', {})
+    if not isinstance(turns, dict) or not all(str(t).isdigit() for t in turns):
+        raise RuleError("replies.turns: keys must be turn numbers")
+    empty_reply = replies.get('empty', DEFAULT_REPLIES['empty'])
+    if not isinstance(empty_reply, str):
+        raise RuleError("replies.empty: must be a string")
+    brands = doc.get('brands', DEFAULT_BRANDS)
+    if not isinstance(brands, (list, tuple)) or not all(isinstance(b, str) and b.strip() for b in brands):
+        raise RuleError("brands: must be a list of brand names or domains")
+    keywords = next((literals for category, _, literals, _ in plan if category == IMPERSONATION_CATEGORY), ())
+
+    return RuleSet(
+        version=str(doc.get('version', 'unversioned')),
+        categories=tuple(plan),
+        url_weight=_number(signals, 'url', 0.15, 'signals'),
+        digits_weight=_number(signals, 'digits', 0.05, 'signals'),
+        lookalike_weight=_number(signals, 'lookalike', 0.05, 'signals'),
+        threshold=_number(doc, 'threshold', 0.25, 'rules'),
+        replies={int(turn): _compile_replies(rows, f"replies.turns.{turn}") for turn, rows in turns.items()},
+        default_replies=_compile_replies(replies.get('default', DEFAULT_REPLIES['default']), "replies.default"),
+        empty_reply=empty_reply,
+        patterns=patterns,
+        weights=weights,
+        reply_rules=replies,
+        brands=tuple(brands),
+        brand_index=BrandIndex(brands, keywords)
+    )
+
+
+def rules_document(patterns: Dict[str, list], weights: Dict[str, float], url_weight: float,
+                   digits_weight: float, threshold: float, replies: Optional[Dict] = None,
+                   version: str = 'builtin', lookalike_weight: float = 0.05,
+                   brands: Iterable[str] = DEFAULT_BRANDS) -> Dict:
+    """Build a rules document from in-code tables (ScamDetector's class attributes)."""
+    return {
+        'version': version,
+        'threshold': threshold,
+        'signals': {'url': url_weight, 'digits': digits_weight, 'lookalike': lookalike_weight},
+        'brands': list(brands),
+        'categories': {category: {'weight': weights.get(category, 0.1), 'patterns': list(values)}
+                       for category, values in patterns.items()},
+        'replies': replies or DEFAULT_REPLIES
+    }
+
+
+def load_rules_file(path: str) -> RuleSet:
+    with open(path, encoding='utf-8') as f:
+        if path.endswith(('.yaml', '.yml')):
+            try:
+                import yaml
+            except ImportError:
+                raise RuleError("YAML rules need PyYAML (pip install pyyaml); or use JSON")
+            try:
+                doc = yaml.safe_load(f)
+            except (yaml.YAMLError, UnicodeDecodeError) as e:
+                raise RuleError(f"invalid YAML: {e}")
+        else:
+            try:
+                doc = json.load(f)
+            except ValueError as e:
+                raise RuleError(f"invalid JSON: {e}")
+    return compile_rules(doc)
+
+
+# ==================== HOT RELOAD ====================
+
+class RuleManager:
+    """Loads a rules file and re-installs it whenever it changes.
+
+    install(rule_set) must swap the rules in atomically. A file that fails
+    validation is logged and counted, and the running rules stay in place.
+    """
+
+    def __init__(self, path: str, install: Callable[[RuleSet], None], poll_seconds: float = 2.0):
+        self.path = path
+        self.install = install
+        self.poll_seconds = poll_seconds
+        self.version = None
+        self.loaded_at = None
+        self.reloads = 0
+        self.rejected = 0
+        self.last_error = None
+        self._mtime = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def load(self, force: bool = False) -> bool:
+        """(Re)load the file if it changed; returns True when new rules were installed."""
+        with self._lock:
+            try:
+                mtime = os.stat(self.path).st_mtime_ns
+            except OSError:
+                return False
+            if not force and mtime == self._mtime:
+                return False
+            self._mtime = mtime
+            try:
+                rule_set = load_rules_file(self.path)
+            except (OSError, RuleError) as e:
+                self.rejected += 1
+                self.last_error = str(e)
+                logger.error("Rules file %s rejected, keeping version %s: %s", self.path, self.version, e)
+                return False
+            self._installed(rule_set)
+            return True
+
+    def install_document(self, doc: Dict) -> RuleSet:
+        """Validate and install a rules document pushed through the admin API."""
+        with self._lock:
+            try:
+                rule_set = compile_rules(doc)
+            except RuleError as e:
+                self.rejected += 1
+                self.last_error = str(e)
+                raise
+            self._installed(rule_set)
+            return rule_set
+
+    def _installed(self, rule_set: RuleSet):
+        self.install(rule_set)
+        self.version = rule_set.version
+        self.loaded_at = time.time()
+        self.reloads += 1
+        self.last_error = None
+        logger.info("Installed rules version %s", rule_set.version)
+
+    def start(self):
+        if self.poll_seconds > 0 and self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='rules-watcher', daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        while not self._stop.wait(self.poll_seconds):
+            # Whatever goes wrong with one poll, hot reload must keep running
+            try:
+                self.load()
+            except Exception:
+                logger.exception("Rules reload of %s failed, will retry", self.path)
+
+    def status(self) -> Dict:
+        return {
+            'path': self.path,
+            'version': self.version,
+            'loaded_at': self.loaded_at,
+            'reloads': self.reloads,
+            'rejected': self.rejected,
+            'last_error': self.last_error
+        }
@@ -0,0 +1,79 @@
+"""
+Linear-time, input-bounded regex matching for untrusted message text.
+
+Python's re engine backtracks, and a pattern that is fast on real SMS can
+go quadratic on crafted input. HoneyPotAgent.INTEL_SCANNER's UPI branch,
+for example, rescans a whole dotted run such as "a.a.a.a..." from every
+word boundary inside it. Three tools here bound that:
+
+- compile_linear(): compiles with RE2 (the `re2` module from google-re2)
+  when installed, which is linear by construction. Without it, the caller's
+  rewrite of the pattern is compiled with re instead. The rewrite is built
+  so that no two match attempts rescan the same text.
+- scan_chunks(): splits a long body into pieces at whitespace that no
+  extracted entity can span, so scanning piece by piece finds exactly
+  what one scan of the whole body would.
+- windows(): overlapping slices for searches that only need a yes/no
+  answer, like the scoring category regexes.
+"""
+
+import re
+from typing import Iterator, Optional, Tuple
+
+try:
+    import re2
+except ImportError:
+    re2 = None
+
+ENGINE = 're' if re2 is None else 're2'
+
+# A whitespace character preceded by something that can't be in a phone
+# number ([\d\s\-.]); URLs, UPI ids and IFSC codes never contain whitespace
+SAFE_CUT = re.compile(r'[^\d\s.\-]\s')
+
+
+def compile_linear(pattern: str, fallback: Optional[str] = None):
+    """pattern under RE2 if available, else fallback (or pattern) under re.
+
+    RE2 rejects lookarounds and backreferences, so a fallback may use them
+    but pattern must not. RE2's \\d, \\s and \\b are ASCII-only.
+    """
+    if re2 is not None:
+        try:
+            return re2.compile(pattern)
+        except Exception:
+            pass
+    return re.compile(fallback or pattern)
+
+
+def scan_chunks(text: str, size: int) -> Iterator[Tuple[int, str]]:
+    """(offset, piece) covering text, each piece at most about size characters.
+
+    A cut is placed at the last SAFE_CUT position in the second half of the
+    window. With no such position (one giant token), the cut is hard: a
+    match across it may be split, and only adversarial input looks like that.
+    """
+    if size <= 0 or len(text) <= size:
+        yield 0, text
+        return
+    start = 0
+    while len(text) - start > size:
+        cut = None
+        for match in SAFE_CUT.finditer(text, start + size // 2, start + size):
+            cut = match.start() + 1
+        if cut is None:
+            cut = start + size
+        yield start, text[start:cut]
+        start = cut
+    yield start, text[start:]
+
+
+def windows(text: str, size: int, overlap: int) -> Iterator[str]:
+    """Slices of size + overlap characters starting every size characters."""
+    if size <= 0 or len(text) <= size + overlap:
+        yield text
+        return
+    for start in range(0, len(text), size):
+        yield text[start:start + size + overlap]
+        if start + size + overlap >= len(text):
+            return
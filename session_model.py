@@ -0,0 +1,228 @@
+"""
+Compact in-memory representation of a conversation session.
+
+A session used to be a dict holding a list of {'sender', 'text'} dicts
+and one {value: turn} dict per intel type, with every bot reply stored
+as its own copy of the same few strings. Here each session is one slotted
+object:
+
+- MessageLog keeps all message text in a single UTF-8 buffer, with one
+  packed int per message (sender id + reply id). Bot replies come from the
+  rules' fixed reply table, so they are stored as small ids into the
+  process-wide REPLIES table and not as text.
+- Intel is one insertion-ordered dict from interned value to a packed int
+  (type + first-seen turn), so a repeat is found in O(1). A value recorded
+  under a second type (rare) is keyed by (type id, value) instead. The
+  same UPI handle or phone number seen in a thousand sessions is a single
+  string object.
+
+to_dict() produces exactly the dict shape the API, the journal and the
+SQLite backend have always used, and from_dict() reads it back.
+"""
+
+import sys
+import threading
+from array import array
+from typing import Dict, Iterator, List, NamedTuple, Optional, Tuple, Union
+
+INTEL_KEYS = ('phoneNumbers', 'upiIds', 'phishingLinks', 'bankAccounts', 'lookalikeDomains')
+INTEL_TYPE_IDS = {key: n for n, key in enumerate(INTEL_KEYS)}
+INTEL_TYPE_BITS = 3
+INTEL_TYPE_MASK = (1 << INTEL_TYPE_BITS) - 1
+
+# The honeypot persona speaks as 'user'; its messages are table replies
+REPLY_SENDER = 'user'
+SENDERS = ['scammer', REPLY_SENDER]
+SENDER_BITS = 4
+MAX_SENDERS = 1 << SENDER_BITS
+
+
+class Message(NamedTuple):
+    sender: str
+    text: str
+
+
+class ReplyTable:
+    """Append-only text <-> id table for bot replies, shared by all sessions.
+
+    The reply scripts are small (a few dozen strings per rules version), so
+    the table is capped; a reply that doesn't fit is stored inline instead.
+    """
+
+    MAX_REPLIES = 1 << 16
+
+    def __init__(self):
+        self._ids = {}
+        self._texts = []
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._texts)
+
+    def intern(self, text: str) -> Optional[int]:
+        reply_id = self._ids.get(text)
+        if reply_id is None:
+            with self._lock:
+                reply_id = self._ids.get(text)
+                if reply_id is None:
+                    if len(self._texts) >= self.MAX_REPLIES:
+                        return None
+                    reply_id = len(self._texts)
+                    self._texts.append(text)
+                    self._ids[text] = reply_id
+        return reply_id
+
+    def text(self, reply_id: int) -> str:
+        return self._texts[reply_id]
+
+
+REPLIES = ReplyTable()
+
+
+SENDER_IDS = {sender: n for n, sender in enumerate(SENDERS)}
+_senders_lock = threading.Lock()
+
+
+def sender_id(sender: str) -> int:
+    code = SENDER_IDS.get(sender)
+    if code is None:
+        with _senders_lock:
+            code = SENDER_IDS.get(sender)
+            if code is None:
+                if len(SENDERS) >= MAX_SENDERS:
+                    raise ValueError(f"too many distinct senders (max {MAX_SENDERS})")
+                code = SENDER_IDS[sender] = len(SENDERS)
+                SENDERS.append(sender)
+    return code
+
+
+class MessageLog:
+    """Append-only message history in one text buffer.
+
+    Message i is _codes[i]: sender id in the low SENDER_BITS bits and
+    (reply id + 1) above them, or 0 there when its text is inline.
+    The inline text ends at _ends[i] in _buf.
+    """
+
+    __slots__ = ('_codes', '_ends', '_buf')
+
+    def __init__(self):
+        self._codes = array('I')
+        self._ends = array('I')
+        self._buf = bytearray()
+
+    def __len__(self) -> int:
+        return len(self._codes)
+
+    def append(self, sender: str, text: str):
+        code = sender_id(sender)
+        reply_id = REPLIES.intern(text) if sender == REPLY_SENDER else None
+        if reply_id is not None:
+            code |= (reply_id + 1) << SENDER_BITS
+        else:
+            self._buf += text.encode('utf-8')
+        self._codes.append(code)
+        self._ends.append(len(self._buf))
+
+    def __iter__(self) -> Iterator[Message]:
+        start = 0
+        buf = self._buf
+        for code, end in zip(self._codes, self._ends):
+            reply = code >> SENDER_BITS
+            text = REPLIES.text(reply - 1) if reply else buf[start:end].decode('utf-8')
+            yield Message(SENDERS[code & (MAX_SENDERS - 1)], text)
+            start = end
+
+    def trim(self, keep: int) -> int:
+        """Drop the oldest messages so at most keep remain; returns how many were dropped."""
+        drop = len(self._codes) - keep
+        if drop <= 0:
+            return 0
+        cut = self._ends[drop - 1]
+        del self._buf[:cut]
+        self._ends = array('I', (end - cut for end in self._ends[drop:]))
+        del self._codes[:drop]
+        return drop
+
+    def to_list(self) -> List[Dict[str, str]]:
+        return [{'sender': sender, 'text': text} for sender, text in self]
+
+
+class Session:
+    """One conversation: scalar fields as slots, messages and intel packed."""
+
+    __slots__ = ('id', 'turns', 'is_scam', 'created_at', 'updated_at', 'messages',
+                 '_intel')
+
+    def __init__(self, session_id: str, now: float):
+        self.id = session_id
+        self.turns = 0
+        self.is_scam = False
+        self.created_at = now
+        self.updated_at = now
+        self.messages = MessageLog()
+        # Created on the first entity; most sessions never get one
+        self._intel: Optional[Dict[Union[str, Tuple[int, str]], int]] = None
+
+    def add_message(self, sender: str, text: str):
+        self.messages.append(sender, text)
+
+    def add_intel(self, kind: str, value: str, turn: int) -> bool:
+        """Record an entity first seen in turn; False if the session already has it."""
+        type_id = INTEL_TYPE_IDS[kind]
+        code = turn << INTEL_TYPE_BITS | type_id
+        if self._intel is None:
+            self._intel = {sys.intern(value): code}
+            return True
+        existing = self._intel.get(value)
+        if existing is None:
+            self._intel[sys.intern(value)] = code
+            return True
+        if existing & INTEL_TYPE_MASK == type_id or (type_id, value) in self._intel:
+            return False
+        self._intel[type_id, sys.intern(value)] = code
+        return True
+
+    def _intel_items(self) -> Iterator[Tuple[int, str, int]]:
+        """(type id, value, first-seen turn) in first-seen order."""
+        for key, code in (self._intel or {}).items():
+            yield code & INTEL_TYPE_MASK, key if isinstance(key, str) else key[1], code >> INTEL_TYPE_BITS
+
+    def intel(self, kind: str) -> Dict[str, int]:
+        """{value: first-seen turn} for one type, in first-seen order."""
+        type_id = INTEL_TYPE_IDS[kind]
+        return {value: turn for kind_id, value, turn in self._intel_items() if kind_id == type_id}
+
+    def intel_map(self) -> Dict[str, Dict[str, int]]:
+        intel = {key: {} for key in INTEL_KEYS}
+        for type_id, value, turn in self._intel_items():
+            intel[INTEL_KEYS[type_id]][value] = turn
+        return intel
+
+    def to_dict(self) -> Dict:
+        """The session's JSON shape (API responses, journal snapshots, SQLite rows)."""
+        return {
+            'id': self.id,
+            'messages': self.messages.to_list(),
+            # value -> turn it was first seen in (insertion ordered, deduplicated)
+            'intel': self.intel_map(),
+            'turns': self.turns,
+            'is_scam': self.is_scam,
+            'created_at': self.created_at,
+            'updated_at': self.updated_at
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> 'Session':
+        session = cls(data['id'], data['created_at'])
+        session.turns = data['turns']
+        session.is_scam = data['is_scam']
+        session.updated_at = data['updated_at']
+        for message in data['messages']:
+            session.messages.append(message['sender'], message['text'])
+        for key, values in data['intel'].items():
+            # Rows written before first-seen tracking stored plain lists
+            items = values.items() if isinstance(values, dict) else ((value, 0) for value in values)
+            for value, turn in items:
+                session.add_intel(key, value, turn)
+        return session
@@ -0,0 +1,523 @@
+"""
+Bounded conversation session store for the AI Honey-Pot API.
+
+Live sessions are session_model.Session objects kept in LRU order; get()
+and snapshot() hand out plain dict copies (Session.to_dict()).
+The store enforces a max session count, an idle TTL and a per-session
+message-history cap, and hands evicted sessions to an on_evict callback
+so scam conversations can be flushed before they are dropped.
+
+Two backends share the same interface:
+- SessionStore: in-process memory (default, used by tests)
+- SQLiteSessionStore: one WAL-mode SQLite file shared by every gunicorn
+  worker on the node, so any worker can serve any turn of a conversation
+
+export() pages through live sessions in (updated_at, id) order, starting
+strictly after a given key, so a bulk reader can stop anywhere and resume
+from the last key it saw. A session updated during an export gets a newer
+key and is returned, with its new state, by the export that resumes.
+
+intel_index() returns the matching cross-session intel index: a
+per-process IntelIndex for memory, or a view of the SQLite store's own
+intel table, which every worker shares.
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from itertools import islice
+from operator import itemgetter
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+from intel_index import IntelIndex, SQLiteIntelIndex
+from session_model import INTEL_KEYS, Session
+
+# Export order and resume position: (updated_at, session id)
+ExportKey = Tuple[float, str]
+
+
+class StripedLocks:
+    """A fixed array of locks; a key always maps to the same one.
+
+    Gives per-session mutual exclusion without a lock object per session.
+    Unrelated sessions share a stripe only by hash collision.
+    """
+
+    def __init__(self, stripes: int = 64):
+        self._locks = [threading.Lock() for _ in range(max(1, stripes))]
+
+    def __len__(self) -> int:
+        return len(self._locks)
+
+    def lock(self, key: str) -> threading.Lock:
+        return self._locks[hash(key) % len(self._locks)]
+
+    @contextmanager
+    def all(self):
+        """Hold every stripe (always taken in index order, so this cannot deadlock)."""
+        for lock in self._locks:
+            lock.acquire()
+        try:
+            yield
+        finally:
+            for lock in reversed(self._locks):
+                lock.release()
+
+
+class SessionStore:
+    """In-memory LRU + TTL session store.
+
+    All mutation goes through `with store.session(sid) as session:`, which
+    holds that session's stripe lock for the read-modify-write and applies
+    the limits on exit. The store lock itself is only held to look the
+    session up and to update LRU order and counters, so turns of different
+    sessions run in parallel. A session in the middle of a turn is never
+    evicted. Readers take the stripe too, so they never see half a turn.
+
+    Evicted sessions are passed to on_evict(session, reason) after the
+    locks are released, reason being 'lru' or 'ttl'. on_create(session_id)
+    fires for every newly created session.
+
+    Lock order is stripe, then store lock.
+    """
+
+    def __init__(self, max_sessions: int = 10000, ttl_seconds: float = 3600,
+                 max_messages: int = 100,
+                 on_evict: Optional[Callable[[Dict, str], None]] = None,
+                 on_create: Optional[Callable[[str], None]] = None,
+                 clock: Callable[[], float] = time.time,
+                 lock_stripes: int = 64):
+        self.max_sessions = max_sessions
+        self.ttl_seconds = ttl_seconds
+        self.max_messages = max_messages
+        self.on_evict = on_evict
+        self.on_create = on_create
+        self.clock = clock
+        self._sessions = OrderedDict()
+        self._lock = threading.Lock()
+        self._stripes = StripedLocks(lock_stripes)
+        # Sessions whose stripe is held by session(); eviction skips them
+        self._busy = set()
+        self.scam_sessions = 0
+        self.evictions = {'lru': 0, 'ttl': 0}
+        self.trimmed_messages = 0
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    def __contains__(self, session_id: str) -> bool:
+        return self.get(session_id) is not None
+
+    @contextmanager
+    def session(self, session_id: str) -> Iterator[Session]:
+        """Get-or-create a session and hold its stripe lock while the caller mutates it."""
+        evicted = []
+        with self._stripes.lock(session_id):
+            with self._lock:
+                now = self.clock()
+                evicted.extend(self._expire(now))
+                session = self._sessions.get(session_id)
+                created = session is None
+                if created:
+                    session = Session(session_id, now)
+                    self._sessions[session_id] = session
+                else:
+                    self._sessions.move_to_end(session_id)
+                    # Stamped on entry too, so a slow turn never looks idle to the TTL sweep
+                    session.updated_at = now
+                was_scam = session.is_scam
+                self._busy.add(session_id)
+
+            try:
+                yield session
+            finally:
+                trimmed = session.messages.trim(self.max_messages)
+                with self._lock:
+                    self._busy.discard(session_id)
+                    # Other turns may have finished meanwhile; keep LRU order == updated_at order
+                    session.updated_at = max(now, self.clock())
+                    self._sessions.move_to_end(session_id)
+                    if session.is_scam and not was_scam:
+                        self.scam_sessions += 1
+                    self.trimmed_messages += trimmed
+                    while len(self._sessions) > self.max_sessions:
+                        # The head is only busy when more turns are in flight than
+                        # max_sessions allows; overshoot until they finish
+                        if next(iter(self._sessions)) in self._busy:
+                            break
+                        _, oldest = self._sessions.popitem(last=False)
+                        evicted.append(self._evicted(oldest, 'lru'))
+        if created and self.on_create is not None:
+            self.on_create(session_id)
+        self._flush(evicted)
+
+    def get(self, session_id: str) -> Optional[Dict]:
+        """Snapshot of a live session, or None if unknown or expired."""
+        evicted = []
+        with self._stripes.lock(session_id), self._lock:
+            session = self._sessions.get(session_id)
+            if session is not None and self._is_expired(session, self.clock()):
+                del self._sessions[session_id]
+                evicted.append(self._evicted(session, 'ttl'))
+                session = None
+            snapshot = session.to_dict() if session is not None else None
+        self._flush(evicted)
+        return snapshot
+
+    def export(self, after: Optional[ExportKey] = None, scam_only: bool = False,
+               page_size: int = 500) -> Iterator[List[Tuple[ExportKey, Dict]]]:
+        """Pages of (key, session dict) with key > after, in key order.
+
+        The LRU order is already updated_at order, so the (updated_at, id,
+        session) index is read newest first, stopping at the resume key, and
+        only sessions after it are visited. Equal timestamps sit in arrival
+        order, not id order; the sort that fixes them up runs over
+        presorted data in linear time. Each session is copied under its
+        stripe; sessions updated or evicted since the export began are
+        skipped there.
+        """
+        index = []
+        with self._lock:
+            for session in reversed(self._sessions.values()):
+                if after is not None and session.updated_at < after[0]:
+                    break
+                if after is None or (session.updated_at, session.id) > after:
+                    index.append((session.updated_at, session.id, session))
+        index.reverse()
+        index.sort(key=itemgetter(0, 1))
+        for offset in range(0, len(index), page_size):
+            page = []
+            for updated_at, session_id, session in islice(index, offset, offset + page_size):
+                with self._stripes.lock(session_id), self._lock:
+                    if session.updated_at != updated_at or self._sessions.get(session_id) is not session:
+                        continue
+                    if (scam_only and not session.is_scam) or self._is_expired(session, self.clock()):
+                        continue
+                    page.append(((updated_at, session_id), session.to_dict()))
+            yield page
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                'total_sessions': len(self._sessions),
+                'scam_sessions': self.scam_sessions,
+                'max_sessions': self.max_sessions,
+                'ttl_seconds': self.ttl_seconds,
+                'max_messages': self.max_messages,
+                'evicted_lru': self.evictions['lru'],
+                'evicted_ttl': self.evictions['ttl'],
+                'trimmed_messages': self.trimmed_messages
+            }
+
+    def snapshot(self, hook: Optional[Callable[[], None]] = None) -> List[Dict]:
+        """Copies of every live session, oldest first.
+
+        hook runs while every lock is held, so no turn can land between it and
+        the copy (the journal uses this to start a new segment at the cut).
+        """
+        with self._stripes.all(), self._lock:
+            if hook is not None:
+                hook()
+            return [session.to_dict() for session in self._sessions.values()]
+
+    def restore(self, sessions: List[Session]) -> int:
+        """Bulk-load recovered sessions without firing callbacks; returns the live session count."""
+        now = self.clock()
+        with self._lock:
+            for session in sorted(sessions, key=lambda s: s.updated_at):
+                if self._is_expired(session, now):
+                    continue
+                previous = self._sessions.pop(session.id, None)
+                if previous is not None and previous.is_scam:
+                    self.scam_sessions -= 1
+                session.messages.trim(self.max_messages)
+                self._sessions[session.id] = session
+                if session.is_scam:
+                    self.scam_sessions += 1
+            while len(self._sessions) > self.max_sessions:
+                _, oldest = self._sessions.popitem(last=False)
+                if oldest.is_scam:
+                    self.scam_sessions -= 1
+            return len(self._sessions)
+
+    def intel_index(self, types) -> IntelIndex:
+        """A per-process index; the caller adds intel and drops evicted sessions."""
+        return IntelIndex(types)
+
+    def sweep(self) -> int:
+        """Drop every expired session now; returns how many were evicted."""
+        with self._lock:
+            evicted = self._expire(self.clock())
+        self._flush(evicted)
+        return len(evicted)
+
+    def _is_expired(self, session: Session, now: float) -> bool:
+        return self.ttl_seconds > 0 and now - session.updated_at > self.ttl_seconds
+
+    def _expire(self, now: float) -> List[Tuple[Session, str]]:
+        # LRU order == last-update order, so expired sessions are all at the head
+        expired = []
+        while self._sessions:
+            session_id, oldest = next(iter(self._sessions.items()))
+            if not self._is_expired(oldest, now) or session_id in self._busy:
+                break
+            del self._sessions[session_id]
+            expired.append(self._evicted(oldest, 'ttl'))
+        return expired
+
+    def _evicted(self, session: Session, reason: str) -> Tuple[Session, str]:
+        """Account for a session leaving the store. Caller holds the lock."""
+        self.evictions[reason] += 1
+        if session.is_scam:
+            self.scam_sessions -= 1
+        return session, reason
+
+    def _flush(self, evicted: List[Tuple[Session, str]]):
+        if self.on_evict is None:
+            return
+        for session, reason in evicted:
+            self.on_evict(session, reason)
+
+
+def session_to_json(session: Session) -> str:
+    return json.dumps(session.to_dict(), separators=(',', ':'))
+
+
+def session_from_json(raw: str) -> Session:
+    return Session.from_dict(json.loads(raw))
+
+
+class SQLiteSessionStore:
+    """Session store backed by a SQLite database in WAL mode.
+
+    Each `session()` block runs inside BEGIN IMMEDIATE, so the
+    read-modify-write of one turn is atomic across threads and processes.
+    Session and eviction counts live in a counters table updated in the
+    same transactions, so stats() is identical from every worker. So do
+    intel postings: a turn inserts its session's entities into the intel
+    table and an eviction deletes them.
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS sessions (
+            id TEXT PRIMARY KEY,
+            data TEXT NOT NULL,
+            is_scam INTEGER NOT NULL DEFAULT 0,
+            updated_at REAL NOT NULL
+        );
+        DROP INDEX IF EXISTS sessions_updated_at;
+        CREATE INDEX IF NOT EXISTS sessions_updated_id ON sessions(updated_at, id);
+        CREATE TABLE IF NOT EXISTS counters (
+            name TEXT PRIMARY KEY,
+            value INTEGER NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS intel (
+            kind TEXT NOT NULL,
+            value TEXT NOT NULL,
+            session_id TEXT NOT NULL,
+            UNIQUE (kind, value, session_id)
+        );
+        CREATE INDEX IF NOT EXISTS intel_session ON intel(session_id);
+    """
+    COUNTERS = ('total_sessions', 'scam_sessions', 'evicted_lru', 'evicted_ttl', 'trimmed_messages')
+    EXPIRE_BATCH = 100
+
+    def __init__(self, path: str, max_sessions: int = 10000, ttl_seconds: float = 3600,
+                 max_messages: int = 100,
+                 on_evict: Optional[Callable[[Dict, str], None]] = None,
+                 on_create: Optional[Callable[[str], None]] = None,
+                 clock: Callable[[], float] = time.time):
+        self.path = path
+        self.max_sessions = max_sessions
+        self.ttl_seconds = ttl_seconds
+        self.max_messages = max_messages
+        self.on_evict = on_evict
+        self.on_create = on_create
+        self.clock = clock
+        self._local = threading.local()
+
+        conn = self._conn()
+        conn.executescript(self.SCHEMA)
+        conn.executemany('INSERT OR IGNORE INTO counters (name, value) VALUES (?, 0)',
+                         [(name,) for name in self.COUNTERS])
+
+    def _conn(self) -> sqlite3.Connection:
+        # A connection must not cross a fork: a child opens its own
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None,
+                                   check_same_thread=False)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            conn.execute('PRAGMA busy_timeout=30000')
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def __len__(self) -> int:
+        return self._counter(self._conn(), 'total_sessions')
+
+    def __contains__(self, session_id: str) -> bool:
+        return self.get(session_id) is not None
+
+    @contextmanager
+    def session(self, session_id: str) -> Iterator[Session]:
+        conn = self._conn()
+        evicted = []
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            now = self.clock()
+            evicted.extend(self._expire(conn, now))
+            row = conn.execute('SELECT data FROM sessions WHERE id = ?', (session_id,)).fetchone()
+            created = row is None
+            session = Session(session_id, now) if created else session_from_json(row[0])
+            was_scam = session.is_scam
+
+            yield session
+
+            session.updated_at = now
+            overflow = session.messages.trim(self.max_messages)
+            if overflow:
+                self._bump(conn, 'trimmed_messages', overflow)
+            conn.execute('INSERT OR REPLACE INTO sessions (id, data, is_scam, updated_at) VALUES (?, ?, ?, ?)',
+                         (session_id, session_to_json(session), int(session.is_scam), now))
+            conn.executemany('INSERT OR IGNORE INTO intel (kind, value, session_id) VALUES (?, ?, ?)',
+                             [(kind, value, session_id)
+                              for kind, values in session.intel_map().items() for value in values])
+            if created:
+                self._bump(conn, 'total_sessions', 1)
+            if session.is_scam and not was_scam:
+                self._bump(conn, 'scam_sessions', 1)
+
+            overflow = self._counter(conn, 'total_sessions') - self.max_sessions
+            if overflow > 0:
+                rows = conn.execute('SELECT id, data FROM sessions WHERE id != ? ORDER BY updated_at LIMIT ?',
+                                    (session_id, overflow)).fetchall()
+                evicted.extend(self._delete(conn, rows, 'lru'))
+            conn.execute('COMMIT')
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+        if created and self.on_create is not None:
+            self.on_create(session_id)
+        self._flush(evicted)
+
+    def get(self, session_id: str) -> Optional[Dict]:
+        conn = self._conn()
+        row = conn.execute('SELECT data FROM sessions WHERE id = ?', (session_id,)).fetchone()
+        if row is None:
+            return None
+        session = session_from_json(row[0])
+        if self.ttl_seconds > 0 and self.clock() - session.updated_at > self.ttl_seconds:
+            self.sweep()
+            return None
+        return session.to_dict()
+
+    def export(self, after: Optional[ExportKey] = None, scam_only: bool = False,
+               page_size: int = 500) -> Iterator[List[Tuple[ExportKey, Dict]]]:
+        """Pages of (key, session dict) with key > after; one indexed range read per page.
+
+        Rows updated after the export began are left for the next one.
+        """
+        horizon = self._conn().execute('SELECT MAX(updated_at) FROM sessions').fetchone()[0]
+        if horizon is None:
+            return
+        while True:
+            where, params = ['updated_at <= ?'], [horizon]
+            if after is not None:
+                where.append('(updated_at, id) > (?, ?)')
+                params.extend(after)
+            if scam_only:
+                where.append('is_scam = 1')
+            if self.ttl_seconds > 0:
+                where.append('updated_at >= ?')
+                params.append(self.clock() - self.ttl_seconds)
+            # Connections are per thread, and a consumer may read each page from a different one
+            rows = self._conn().execute(
+                'SELECT updated_at, id, data FROM sessions WHERE ' + ' AND '.join(where) +
+                ' ORDER BY updated_at, id LIMIT ?', (*params, page_size)).fetchall()
+            yield [((updated_at, session_id), json.loads(raw)) for updated_at, session_id, raw in rows]
+            if len(rows) < page_size:
+                return
+            after = rows[-1][0], rows[-1][1]
+
+    def stats(self) -> Dict:
+        conn = self._conn()
+        counters = dict(conn.execute('SELECT name, value FROM counters').fetchall())
+        return {
+            'total_sessions': counters['total_sessions'],
+            'scam_sessions': counters['scam_sessions'],
+            'max_sessions': self.max_sessions,
+            'ttl_seconds': self.ttl_seconds,
+            'max_messages': self.max_messages,
+            'evicted_lru': counters['evicted_lru'],
+            'evicted_ttl': counters['evicted_ttl'],
+            'trimmed_messages': counters['trimmed_messages']
+        }
+
+    def intel_index(self, types) -> SQLiteIntelIndex:
+        """Queries over the shared intel table; this store keeps it current."""
+        return SQLiteIntelIndex(types, self._conn)
+
+    def sweep(self) -> int:
+        conn = self._conn()
+        evicted = []
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            while True:
+                batch = self._expire(conn, self.clock())
+                evicted.extend(batch)
+                if len(batch) < self.EXPIRE_BATCH:
+                    break
+            conn.execute('COMMIT')
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+        self._flush(evicted)
+        return len(evicted)
+
+    def _counter(self, conn: sqlite3.Connection, name: str) -> int:
+        return conn.execute('SELECT value FROM counters WHERE name = ?', (name,)).fetchone()[0]
+
+    def _bump(self, conn: sqlite3.Connection, name: str, delta: int):
+        conn.execute('UPDATE counters SET value = value + ? WHERE name = ?', (delta, name))
+
+    def _expire(self, conn: sqlite3.Connection, now: float) -> List[Tuple[Session, str]]:
+        if self.ttl_seconds <= 0:
+            return []
+        rows = conn.execute('SELECT id, data FROM sessions WHERE updated_at < ? ORDER BY updated_at LIMIT ?',
+                            (now - self.ttl_seconds, self.EXPIRE_BATCH)).fetchall()
+        return self._delete(conn, rows, 'ttl')
+
+    def _delete(self, conn: sqlite3.Connection, rows, reason: str) -> List[Tuple[Session, str]]:
+        evicted = []
+        for session_id, raw in rows:
+            session = session_from_json(raw)
+            conn.execute('DELETE FROM sessions WHERE id = ?', (session_id,))
+            conn.execute('DELETE FROM intel WHERE session_id = ?', (session_id,))
+            self._bump(conn, 'total_sessions', -1)
+            if session.is_scam:
+                self._bump(conn, 'scam_sessions', -1)
+            self._bump(conn, 'evicted_' + reason, 1)
+            evicted.append((session, reason))
+        return evicted
+
+    _flush = SessionStore._flush
+
+
+def create_session_store(backend: str = 'memory', path: str = 'honeypot_sessions.db',
+                         lock_stripes: int = 64, **kwargs):
+    """Build the configured session store ('memory' or 'sqlite').
+
+    lock_stripes only applies to memory; SQLite turns are already serialized
+    by their BEGIN IMMEDIATE transaction.
+    """
+    if backend == 'sqlite':
+        return SQLiteSessionStore(path, **kwargs)
+    if backend == 'memory':
+        return SessionStore(lock_stripes=lock_stripes, **kwargs)
+    raise ValueError(f"Unknown session backend: {backend}")
@@ -0,0 +1,107 @@
+"""
+Structured, sampled request logging for the AI Honey-Pot API.
+
+Log lines are emitted as one JSON object per line (LOG_FORMAT=json) with
+the event name in "msg" and request fields alongside it. Per-request events
+go through RequestLog, whose sample() check is done before any fields are
+built, so a suppressed level or a sampled-out request costs one comparison.
+Message text is truncated and digit runs (phones, accounts, OTPs) redacted
+before it is logged.
+"""
+
+import json
+import logging
+import random
+import re
+from datetime import datetime, timezone
+from typing import Optional
+
+try:
+    import orjson
+
+    def _dumps(obj) -> str:
+        return orjson.dumps(obj, default=str).decode('utf-8')
+except ImportError:
+    def _dumps(obj) -> str:
+        return json.dumps(obj, default=str, separators=(',', ':'))
+
+DIGIT_RUN = re.compile(r'\d{4,}')
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per record; fields passed as extra={'fields': {...}} are merged in."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            'ts': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'msg': record.getMessage()
+        }
+        fields = getattr(record, 'fields', None)
+        if fields:
+            entry.update(fields)
+        if record.exc_info:
+            entry['exc'] = self.formatException(record.exc_info)
+        return _dumps(entry)
+
+
+class TextFormatter(logging.Formatter):
+    """Classic 'LEVEL:logger:message' lines with fields appended as key=value."""
+
+    def __init__(self):
+        super().__init__('%(levelname)s:%(name)s:%(message)s')
+
+    def format(self, record: logging.LogRecord) -> str:
+        line = super().format(record)
+        fields = getattr(record, 'fields', None)
+        if fields:
+            line += ' ' + ' '.join(f'{key}={value!r}' for key, value in fields.items())
+        return line
+
+
+def configure(log_format: str = 'json', level: str = 'INFO'):
+    """Install a single stderr handler on the root logger."""
+    handler = logging.StreamHandler()
+    handler.setFormatter(JsonFormatter() if log_format == 'json' else TextFormatter())
+    root = logging.getLogger()
+    root.handlers[:] = [handler]
+    root.setLevel(level.upper())
+
+
+class RequestLog:
+    """Sampled per-request event logging.
+
+    Call sites guard with sample() so no dict or string is built for
+    requests that will not be logged:
+
+        if request_log.sample():
+            request_log.event('analyze', session=sid, text=request_log.clip(text))
+    """
+
+    def __init__(self, logger: logging.Logger, sample_rate: float = 1.0,
+                 max_text: int = 80, redact: bool = True, level: int = logging.INFO):
+        self.logger = logger
+        self.sample_rate = sample_rate
+        self.max_text = max_text
+        self.redact = redact
+        self.level = level
+
+    def sample(self) -> bool:
+        if not self.logger.isEnabledFor(self.level):
+            return False
+        return self.sample_rate >= 1.0 or random.random() < self.sample_rate
+
+    def clip(self, text: Optional[str]) -> Optional[str]:
+        """Truncate and redact message text for logging."""
+        if not text:
+            return text
+        clipped = text[:self.max_text]
+        if self.redact:
+            clipped = DIGIT_RUN.sub(lambda m: '#' * len(m.group()), clipped)
+        if len(text) > self.max_text:
+            clipped += f'...(+{len(text) - self.max_text})'
+        return clipped
+
+    def event(self, name: str, **fields):
+        self.logger.log(self.level, name, extra={'fields': fields})
@@ -6,6 +6,8 @@ Run this file to test all functionality
 import requests
 import json
 import time
+import threading
+from http.server import BaseHTTPRequestHandler, HTTPServer
 
 # API Base URL - Change this to your deployed URL
 BASE_URL = "http://localhost:5000"
@@ -104,19 +106,807 @@ def test_session_retrieval():
         "message": "Your package is waiting. Pay delivery fee of Rs. 500 to 9876543210 or visit http://fake-delivery.com",
         "session_id": session_id
     }
-    requests.post(f"{BASE_URL}/api/analyze", json=data)
+    requests.post(f"{BASE_URL}/api/analyze/batch", json=[data])
     
     # Now retrieve it
     response = requests.get(f"{BASE_URL}/api/session/{session_id}")
     print_response("Session Retrieval", response)
     return response.status_code == 200
 
+def test_batch_analyze():
+    """Test 7: Batched Analysis"""
+    session_id = f"test_batch_{int(time.time())}"
+    data = {
+        "items": [
+            {"sessionId": session_id, "message": "Your SBI account is blocked. Verify immediately at http://sbi-verify.com"},
+            {"sessionId": "test_batch_other", "message": "Hey, lunch tomorrow?"},
+            {"sessionId": session_id, "message": "Call us now at 9876543210 to avoid legal action"}
+        ]
+    }
+    response = requests.post(f"{BASE_URL}/api/analyze/batch", json=data)
+    print_response("Batched Analysis", response)
+    results = response.json()["results"]
+    assert len(results) == 3
+    assert results[0]["scamDetected"] and results[0]["turn"] == 1
+    assert results[2]["turn"] == 2
+    assert "9876543210" in "".join(results[2]["extractedIntelligence"]["phoneNumbers"])
+    
+    # In-process: a failing item (or session) gets an error entry; the rest of the batch still applies
+    import app as honeypot
+    score_message = honeypot.score_message
+    
+    def flaky(text, probability=None):
+        if text == "boom":
+            raise RuntimeError("boom")
+        return score_message(text, probability)
+    
+    honeypot.score_message = flaky
+    try:
+        items = [(0, data["items"][0]["message"], None), (1, "boom", None), (2, data["items"][2]["message"], None)]
+        applied = dict(honeypot.guarded_session_batch(f"{session_id}_flaky", items))
+    finally:
+        honeypot.score_message = score_message
+    assert applied[1]["status"] == "error" and (applied[0]["turn"], applied[2]["turn"]) == (1, 2), applied
+    
+    def store_down(session_id, items):
+        raise OSError("session store unavailable")
+    
+    process_session_batch = honeypot.process_session_batch
+    honeypot.process_session_batch = store_down
+    try:
+        failed = honeypot.guarded_session_batch("test_batch_failed", [(4, "hi", None), (5, "there", None)])
+    finally:
+        honeypot.process_session_batch = process_session_batch
+    assert [(index, item["status"]) for index, item in failed] == [(4, "error"), (5, "error")]
+    return response.status_code == 200
+
 def test_stats():
-    """Test 7: Statistics Endpoint"""
+    """Test 8: Statistics Endpoint"""
     response = requests.get(f"{BASE_URL}/api/stats")
     print_response("Overall Statistics", response)
     return response.status_code == 200
 
+def test_callback_dispatcher():
+    """Test 9: Callback Dispatcher against a local stub server"""
+    from callback_dispatcher import CallbackDispatcher
+    
+    received = []
+    
+    class StubHandler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            body = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+            received.append(body)
+            # Fail the very first delivery so the retry path is exercised
+            self.send_response(503 if len(received) == 1 else 200)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+        
+        def log_message(self, *args):
+            pass
+    
+    server = HTTPServer(('127.0.0.1', 0), StubHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    
+    dispatcher = CallbackDispatcher(f"http://127.0.0.1:{server.server_port}/callback",
+                                    workers=1, backoff_base=0.01)
+    for turn in range(1, 4):
+        dispatcher.submit("stub_session", {"sessionId": "stub_session", "totalMessagesExchanged": turn})
+    dispatcher.submit("other_session", {"sessionId": "other_session", "totalMessagesExchanged": 1})
+    drained = dispatcher.shutdown(timeout=5)
+    server.shutdown()
+    
+    stats = dispatcher.stats()
+    print(f"\nDispatcher stats: {json.dumps(stats, indent=2)}")
+    assert drained
+    assert stats['retries'] == 1 and stats['failed'] == 0
+    assert len(received) == stats['succeeded'] + stats['retries']
+    delivered = [r for r in received if r['sessionId'] == 'stub_session']
+    assert delivered[-1]['totalMessagesExchanged'] == 3
+    
+    # Two workers: an update that arrives while a retry is backing off waits for it, never overtakes it
+    class Response:
+        def __init__(self, status_code):
+            self.status_code = status_code
+    
+    class FlakyHTTP:
+        def __init__(self):
+            self.posts, self.active, self.overlaps, self.lock = [], set(), 0, threading.Lock()
+        
+        def post(self, url, json, timeout):
+            with self.lock:
+                self.overlaps += json['sessionId'] in self.active
+                self.active.add(json['sessionId'])
+                self.posts.append(json['totalMessagesExchanged'])
+                first = len(self.posts) == 1
+            time.sleep(0.01)
+            with self.lock:
+                self.active.discard(json['sessionId'])
+            return Response(503 if first else 200)
+    
+    http = FlakyHTTP()
+    pair = CallbackDispatcher("http://callback.invalid/", workers=2, backoff_base=0.1, http=http)
+    pair.submit("busy_session", {"sessionId": "busy_session", "totalMessagesExchanged": 1})
+    time.sleep(0.05)
+    pair.submit("busy_session", {"sessionId": "busy_session", "totalMessagesExchanged": 2})
+    assert pair.shutdown(timeout=5)
+    print(f"Two-worker posts: {http.posts}")
+    assert http.posts == [1, 1, 2] and http.overlaps == 0
+    return stats['queue_depth'] == 0
+
+def test_asgi_contract():
+    """Test 10: ASGI entry point serves the same contract (in-process)"""
+    import asyncio
+    from asgi_app import app as asgi_app
+    
+    async def call(method, path, body=None):
+        raw = json.dumps(body).encode() if body is not None else b''
+        sent = []
+        
+        async def receive():
+            return {'type': 'http.request', 'body': raw, 'more_body': False}
+        
+        async def send(message):
+            sent.append(message)
+        
+        scope = {'type': 'http', 'method': method, 'path': path,
+                 'headers': [(b'content-type', b'application/json')]}
+        await asgi_app(scope, receive, send)
+        return sent[0]['status'], json.loads(sent[1]['body'])
+    
+    async def scenario():
+        session_id = f"test_asgi_{int(time.time())}"
+        assert (await call('GET', '/health'))[1]['status'] == 'healthy'
+        message = "Your bank account is blocked. Verify immediately at http://fake-bank.com"
+        status, result = await call('POST', '/api/analyze', {"sessionId": session_id, "message": message})
+        assert status == 200 and result['reply'] == "Why is my account being suspended?"
+        # The single-message endpoint doesn't engage; the batch route does
+        status, result = await call('POST', '/api/analyze/batch', [{"sessionId": session_id, "message": message}])
+        assert status == 200 and result['results'][0]['reply'] == "Why is my account blocked?"
+        assert (await call('POST', '/api/analyze/batch', {"items": "nope"}))[0] == 400
+        status, session = await call('GET', f'/api/session/{session_id}')
+        assert status == 200 and session['turns'] == 1
+        assert (await call('GET', '/api/session/missing_session'))[0] == 404
+        return (await call('GET', '/api/stats'))[1]['total_sessions'] >= 1
+    
+    result = asyncio.run(scenario())
+    print(f"\nASGI contract: {'OK' if result else 'FAILED'}")
+    return result
+
+def test_metrics_endpoint():
+    """Test 11: Prometheus Metrics"""
+    requests.post(f"{BASE_URL}/api/analyze/batch", json=[{
+        "sessionId": "test_metrics_session",
+        "message": "URGENT: verify your bank account now or it will be blocked"
+    }])
+    response = requests.get(f"{BASE_URL}/metrics")
+    print(f"\n{'='*60}\nTEST: Prometheus Metrics\n{'='*60}")
+    print(f"Status Code: {response.status_code}")
+    print("\n".join(response.text.splitlines()[:10]))
+    assert 'honeypot_stage_seconds_bucket{stage="score"' in response.text
+    assert 'honeypot_verdicts_total{verdict="scam"}' in response.text
+    return response.status_code == 200
+
+def test_ml_scorer():
+    """Test 12: ML scorer batch parity, mmap round trip and keyword fallback (in-process)"""
+    import tempfile
+    from ml_scorer import HashedNgramFeaturizer, LinearModel, MLScorer
+    from train_model import fit
+    
+    texts = ["URGENT: your SBI account is blocked, share OTP now",
+             "Congratulations! You won a lottery prize, pay fee via UPI",
+             "Are we still meeting for lunch today?",
+             "I'll pay you back for the tickets tomorrow"]
+    labels = [1, 1, 0, 0]
+    featurizer = HashedNgramFeaturizer(bits=12)
+    weights, bias = fit(featurizer, texts, labels, epochs=200, learning_rate=2.0, l2=0.0)
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        path = f"{tmp}/model"
+        LinearModel(weights, bias, 0.5, featurizer).save(path)
+        scorer = MLScorer(path, mode='ml')
+        assert not scorer.loaded
+        batch = scorer.score_batch(texts)
+        single = [scorer.score_batch([t])[0] for t in texts]
+        assert scorer.loaded
+        assert all(abs(a - b) < 1e-6 for a, b in zip(batch, single))
+        assert [p >= 0.5 for p in batch] == [True, True, False, False]
+        # A NUL inside a message must not shift later rows onto the wrong items
+        nul = [texts[2], "share\x00OTP\x00now", texts[0]]
+        probabilities = scorer.score_batch(nul)
+        assert len(probabilities) == 3
+        assert all(abs(a - scorer.score_batch([t])[0]) < 1e-6 for a, t in zip(probabilities, nul))
+    
+    missing = MLScorer(f"{tmp}/missing", mode='blend')
+    assert missing.score_batch(texts) is None
+    assert missing.combine(0.3, 0.25, None) == (0.3, 0.25)
+    print(f"\nML scorer: OK ({[round(p, 3) for p in batch]})")
+    return True
+
+def test_verdict_cache():
+    """Test 13: Repeated templated messages hit the verdict cache"""
+    before = requests.get(f"{BASE_URL}/api/stats").json()['verdict_cache']
+    for n in range(3):
+        requests.post(f"{BASE_URL}/api/analyze/batch", json=[{
+            "sessionId": f"test_cache_{n}_{int(time.time())}",
+            "message": f"Your KYC is pending, account will be BLOCKED today. Call 98765{43210 + n}"
+        }])
+    after = requests.get(f"{BASE_URL}/api/stats").json()['verdict_cache']
+    templates = requests.get(f"{BASE_URL}/api/templates", params={'limit': 5}).json()['templates']
+    print(f"\n{'='*60}\nTEST: Verdict Cache\n{'='*60}")
+    print(f"Before: {before}\nAfter: {after}")
+    assert after['hits'] - before['hits'] >= 2
+    assert any('kyc is pending' in t['sample'] and t['hits'] >= 3 for t in templates)
+    
+    # Intel depends on the rules' brand list, so a new rule set drops cached intel too
+    from verdict_cache import VerdictCache
+    cache, old_rules, new_rules = VerdictCache(), object(), object()
+    text = "Verify at https://hdfcbamk-login.com now"
+    assert cache.intel(text, old_rules, lambda t: {'lookalikeDomains': []}) == {'lookalikeDomains': []}
+    assert cache.intel(text, old_rules, lambda t: {'lookalikeDomains': ['x']}) == {'lookalikeDomains': []}
+    fresh = cache.intel(text, new_rules, lambda t: {'lookalikeDomains': ['hdfcbamk-login.com']})
+    assert fresh == {'lookalikeDomains': ['hdfcbamk-login.com']} and cache.stats()['invalidations'] == 1
+    
+    # A lookup still computing under the old rules when they are replaced isn't cached
+    cache = VerdictCache()
+    cache.categories("warm up", old_rules, lambda t: {})
+    
+    def slow_old_compute(normalized):
+        cache.invalidate(new_rules)
+        return {'stale': 1.0}
+    
+    assert cache.categories("account blocked", old_rules, slow_old_compute) == {'stale': 1.0}
+    assert cache.categories("account blocked", new_rules, lambda t: {'fresh': 1.0}) == {'fresh': 1.0}
+    cache.invalidate(old_rules)
+    assert cache.intel("pay x@ybl", old_rules, lambda t: cache.invalidate(new_rules) or {'upiIds': ['old']})
+    assert cache.intel("pay x@ybl", new_rules, lambda t: {'upiIds': ['new']}) == {'upiIds': ['new']}
+    return True
+
+def test_intel_index():
+    """Test 14: Cross-session intel lookup and top-K"""
+    upi = f"campaign{int(time.time())}@ybl"
+    for n in range(2):
+        requests.post(f"{BASE_URL}/api/analyze/batch", json=[{
+            "sessionId": f"test_intel_{n}_{upi}",
+            "message": f"URGENT: account blocked. Pay the fee to {upi} immediately"
+        }])
+    lookup = requests.get(f"{BASE_URL}/api/intel/upi/{upi.upper()}").json()
+    top = requests.get(f"{BASE_URL}/api/intel/top", params={'type': 'upi', 'limit': 100}).json()
+    bad = requests.get(f"{BASE_URL}/api/intel/top", params={'type': 'nope'})
+    print(f"\n{'='*60}\nTEST: Intel Index\n{'='*60}")
+    print(f"Lookup: {lookup}\nTop: {top['top'][:3]}")
+    assert lookup['value'] == upi and lookup['count'] == 2
+    assert {'value': upi, 'sessions': 2} in top['top']
+    
+    # SQLite: two workers share one index, and either one's eviction prunes it
+    import os
+    import tempfile
+    from session_store import SQLiteSessionStore
+    with tempfile.TemporaryDirectory() as directory:
+        clock = [1000.0]
+        path = os.path.join(directory, 'intel.db')
+        workers = [SQLiteSessionStore(path, ttl_seconds=60, clock=lambda: clock[0]) for _ in range(2)]
+        indexes = [store.intel_index(['upiIds', 'phoneNumbers']) for store in workers]
+        for n, store in enumerate(workers):
+            with store.session(f"s{n}") as session:
+                session.add_intel('upiIds', 'shared@ybl', 1)
+                session.add_intel('phoneNumbers', f"+9198765432{n}0", 1)
+        assert indexes[1].sessions_for('upiIds', 'shared@ybl') == {'count': 2, 'sessions': ['s0', 's1']}
+        assert indexes[0].top('upiIds') == [{'value': 'shared@ybl', 'sessions': 2}]
+        clock[0] += 120
+        assert workers[1].sweep() == 2
+        assert indexes[0].sessions_for('upiIds', 'shared@ybl')['count'] == 0
+        assert indexes[0].stats()['postings'] == 0 and indexes[0].top('nope') is None
+    return bad.status_code == 400
+
+def test_journal_recovery():
+    """Test 15: Journal replay rebuilds sessions from snapshot + tail (in-process)"""
+    import os
+    import tempfile
+    from journal import Journal, JournalLocked, open_slot, replay
+    from session_store import SessionStore
+    
+    with tempfile.TemporaryDirectory() as directory:
+        store = SessionStore()
+        journal = Journal(directory, fsync_interval=0.01, snapshot_source=store.snapshot)
+        assert journal.open() == []
+        
+        def turn(session_id, text, upi):
+            with store.session(session_id) as session:
+                session.is_scam = True
+                session.turns += 1
+                session.add_message('scammer', text)
+                session.add_message('user', 'ok')
+                session.add_intel('upiIds', upi, session.turns)
+                journal.record_turn(session, [('scammer', text), ('user', 'ok')], {'upiIds': [upi]})
+        
+        turn('a', 'pay now', 'a1@ybl')
+        turn('b', 'verify otp', 'b1@ybl')
+        journal.snapshot()
+        turn('a', 'pay again', 'a2@ybl')
+        journal.sync()
+        
+        try:
+            Journal(directory).open()
+            locked = False
+        except JournalLocked:
+            locked = True
+        
+        # Replay while the writer is still open, as after a crash
+        recovered, info = replay(directory)
+        recovered = {s.id: s.to_dict() for s in recovered}
+        expected = {s['id']: s for s in store.snapshot()}
+        print(f"\nJournal replay: {info}")
+        assert info['snapshot_sessions'] == 2 and info['events'] == 1
+        for session_id in expected:
+            for key in ('messages', 'intel', 'turns', 'is_scam'):
+                assert recovered[session_id][key] == expected[session_id][key], (session_id, key)
+        
+        # A second worker gets its own slot; once the first exits, a restart takes its slot back
+        second, second_recovered = open_slot(directory, fsync_interval=0)
+        assert second.directory == os.path.join(directory, 'worker-1') and second_recovered == []
+        journal.close()
+        restarted, restarted_recovered = open_slot(directory, fsync_interval=0)
+        assert restarted.directory == directory and {s.id for s in restarted_recovered} == {'a', 'b'}
+        restarted.close()
+        second.close()
+    return locked
+
+def test_rules_reload():
+    """Test 16: Rules file hot reload; unsafe regexes are rejected and old rules kept"""
+    import os
+    import tempfile
+    from app import HoneyPotAgent, ScamDetector
+    import rules as rules_module
+    from rules import RuleError, RuleManager, load_rules_file, validate_pattern
+    
+    # Backtracking shapes are refused by structure alone, whatever the probe timings say
+    budget, rules_module.PROBE_BUDGET = rules_module.PROBE_BUDGET, float('inf')
+    try:
+        for unsafe in (r'(a+)+$', r'(?:[a-z]+\.)+com', r'(ab|a.)*c', r'(a|aa)*b'):
+            try:
+                validate_pattern(unsafe)
+                raise AssertionError(f"{unsafe} accepted")
+            except RuleError as e:
+                assert 'too slow' not in str(e), e
+        assert validate_pattern(r'(cat|catalog)+') is not None
+    finally:
+        rules_module.PROBE_BUDGET = budget
+    
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'rules.json')
+        doc = {'version': 'v1', 'threshold': 0.3,
+               'categories': {'crypto': {'weight': 0.4, 'patterns': ['bitcoin', r'usdt\s*wallet']}},
+               'replies': {'turns': {'1': [{'any': ['wallet'], 'reply': 'Which wallet?'},
+                                           {'reply': 'Tell me more'}]},
+                           'default': [{'reply': 'Send your details'}]}}
+        with open(path, 'w') as f:
+            json.dump(doc, f)
+        installed = []
+        manager = RuleManager(path, installed.append, poll_seconds=0)
+        assert manager.load() and not manager.load()
+        rules = installed[-1]
+        hits = ScamDetector().match_categories("Deposit to my USDT  wallet", rules)
+        assert hits == {'crypto': 0.4} and rules.threshold == 0.3
+        assert HoneyPotAgent().generate_response("your wallet", 1, rules) == 'Which wallet?'
+        assert HoneyPotAgent().generate_response("hi", 7, rules) == 'Send your details'
+        
+        doc['version'] = 'v2'
+        doc['categories']['crypto']['patterns'].append(r'(a+)+$')
+        with open(path, 'w') as f:
+            json.dump(doc, f)
+        os.utime(path, ns=(0, 1))
+        assert not manager.load()
+        print(f"\nRejected rules: {manager.last_error}")
+        assert manager.version == 'v1' and manager.rejected == 1 and len(installed) == 1
+        
+        # Malformed YAML is a rejected file, and a failing poll doesn't stop the watcher
+        yaml_path = os.path.join(directory, 'rules.yaml')
+        with open(yaml_path, 'w') as f:
+            f.write("categories: [unclosed\n")
+        broken = RuleManager(yaml_path, installed.append, poll_seconds=0.01)
+        assert not broken.load() and broken.rejected == 1 and 'invalid YAML' in broken.last_error
+        polls = []
+        
+        def failing_load(force: bool = False):
+            polls.append(force)
+            raise RuntimeError("disk gone")
+        
+        broken.load = failing_load
+        broken.start()
+        time.sleep(0.2)
+        broken.stop()
+        assert len(polls) >= 2, polls
+    
+    # The shipped rules file compiles, and the server refuses a bad push
+    assert load_rules_file(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'rules.json'))
+    response = requests.post(f"{BASE_URL}/api/admin/rules/reload", json={'categories': {'x': {'patterns': ['(x*)*y']}}},
+                             headers={'x-api-key': 'hackathon_2024_ai_honeypot_secure_key'})
+    print_response("Rejected Rules Push", response)
+    return response.status_code == 400
+
+def test_rate_limits():
+    """Test 17: Token buckets (memory + shared SQLite), load shedding, per-session turn cap"""
+    import os
+    import tempfile
+    from rate_limit import Limit, LoadShedder, RateLimiter, SQLiteTokenBuckets, TokenBuckets
+    
+    now = [0.0]
+    limiter = RateLimiter(TokenBuckets(clock=lambda: now[0]), key_limit=Limit(1, 3), ip_limit=Limit(10, 10))
+    assert [limiter.check_client('k', '1.2.3.4') for _ in range(3)] == [None] * 3
+    scope, retry_after = limiter.check_client('k', '1.2.3.4')
+    assert scope == 'key' and abs(retry_after - 1) < 1e-9
+    # The refused call took nothing from the IP bucket (7 tokens left)
+    assert limiter.check_client('k2', '1.2.3.4', cost=7) is None
+    assert limiter.check_client('k3', '1.2.3.4')[0] == 'ip'
+    now[0] += 1
+    assert limiter.check_client('k', None) is None
+    
+    # Leaving out the key doesn't escape the limit: keyless callers get a bucket per IP
+    keyless = RateLimiter(TokenBuckets(clock=lambda: now[0]), key_limit=Limit(1, 3))
+    flood = [keyless.check_client(None, '5.6.7.8') for _ in range(5)]
+    assert flood[:3] == [None] * 3 and flood[3][0] == flood[4][0] == 'key'
+    assert keyless.check_client(None, '9.9.9.9') is None and keyless.check_client('k', '5.6.7.8') is None
+    
+    # Two "workers" over one database draw from the same bucket
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'limits.db')
+        workers = [SQLiteTokenBuckets(path), SQLiteTokenBuckets(path)]
+        limit = Limit(0.001, 4)
+        taken = [workers[n % 2].take([('i:x', limit, 1)]) is None for n in range(6)]
+        assert taken == [True] * 4 + [False] * 2
+    
+    shedder = LoadShedder(max_in_flight=1, max_wait=0.01)
+    assert shedder.acquire() and not shedder.acquire() and not shedder.acquire(block=False)
+    shedder.release()
+    assert not shedder.acquire(queued_for=0.05) and shedder.acquire()
+    assert shedder.stats()['shed'] == 3
+    
+    # Bogus keys are refused before any bucket exists for them
+    tracked = requests.get(f"{BASE_URL}/api/stats").json()['rate_limits']['tracked_keys']
+    statuses = {requests.post(f"{BASE_URL}/api/analyze", headers={'x-api-key': f"bogus-{n}"},
+                              json={"message": "hi"}).status_code for n in range(5)}
+    assert statuses == {401}
+    assert requests.get(f"{BASE_URL}/api/stats").json()['rate_limits']['tracked_keys'] == tracked
+    
+    session_id = f"flood_{time.time()}"
+    replies = requests.post(f"{BASE_URL}/api/analyze/batch",
+                            json=[{"sessionId": session_id, "message": "hello"}] * 22).json()['results']
+    stats = requests.get(f"{BASE_URL}/api/stats").json()
+    print(f"\nRate limits: {stats['rate_limits']}\nLoad shedding: {stats['load_shedding']}")
+    return replies[0]['reply'] != replies[-1]['reply'] and stats['rate_limits']['throttled'].get('session', 0) >= 2
+
+def test_session_model():
+    """Test 18: Slotted Session keeps the dict JSON shape, trims and shares reply text"""
+    from session_model import REPLIES, Session
+    
+    session = Session('compact', 1.0)
+    for turn in range(1, 4):
+        session.turns = turn
+        session.add_message('scammer', f"pay ₹{turn}00 to scam@ybl now")
+        session.add_message('user', "What is this about?")
+        assert session.add_intel('upiIds', 'scam@ybl', turn) == (turn == 1)
+    session.add_intel('phoneNumbers', '+919876543210', 3)
+    
+    data = session.to_dict()
+    assert data['messages'][0] == {'sender': 'scammer', 'text': "pay ₹100 to scam@ybl now"}
+    assert data['intel'] == {'phoneNumbers': {'+919876543210': 3}, 'upiIds': {'scam@ybl': 1},
+                             'phishingLinks': {}, 'bankAccounts': {}, 'lookalikeDomains': {}}
+    assert Session.from_dict(json.loads(json.dumps(data))).to_dict() == data
+    
+    # Repeat checks are O(1): a long session with many entities stays fast, types are kept apart
+    busy = Session('busy', 1.0)
+    start = time.perf_counter()
+    added = sum(busy.add_intel('phoneNumbers', str(n % 20000), 1) for n in range(40000))
+    assert added == 20000 and time.perf_counter() - start < 2.0
+    assert busy.add_intel('bankAccounts', '7', 2) and busy.intel('bankAccounts') == {'7': 2}
+    
+    # Replies are ids into the shared table, not per-message copies
+    replies = len(REPLIES)
+    assert session.messages.trim(3) == 3 and len(REPLIES) == replies
+    assert [m['text'] for m in session.to_dict()['messages']] == [
+        "What is this about?", "pay ₹300 to scam@ybl now", "What is this about?"]
+    return True
+
+def test_app_factory():
+    """Test 19: Importing app starts no threads; create_app(preload=True) serves after start_worker"""
+    import subprocess
+    import sys
+    
+    # A preloading master must not own threads or open files that a fork would inherit
+    probe = ("import sys, threading, app; "
+             "assert threading.active_count() == 1, threading.enumerate(); "
+             "assert 'requests' not in sys.modules and app.journal is None; "
+             "flask_app = app.create_app(preload=True); "
+             "assert 'requests' in sys.modules and threading.active_count() == 1; "
+             "response = flask_app.test_client().get('/health'); "
+             "assert response.status_code == 200 and response.get_json()['status'] == 'healthy'; "
+             "assert threading.active_count() > 1")
+    subprocess.run([sys.executable, '-c', probe], check=True, capture_output=True, timeout=60)
+    return True
+
+def test_session_export():
+    """Test 20: Export pages resume by cursor on both backends; NDJSON stream and report endpoint"""
+    import os
+    import tempfile
+    from session_store import SQLiteSessionStore, SessionStore
+    
+    with tempfile.TemporaryDirectory() as directory:
+        for backend in ('memory', 'sqlite'):
+            clock = [100.0]
+            if backend == 'memory':
+                store = SessionStore(ttl_seconds=0, clock=lambda: clock[0])
+            else:
+                store = SQLiteSessionStore(os.path.join(directory, 'export.db'), ttl_seconds=0, clock=lambda: clock[0])
+            # Three sessions share a timestamp, so a page has to end on a tie boundary
+            for n, sid in enumerate(['c', 'a', 'b', 'd', 'e']):
+                clock[0] = 100.0 + min(n, 2)
+                with store.session(sid) as session:
+                    session.is_scam = sid != 'd'
+            
+            pages = store.export(page_size=2)
+            assert [key[1] for key, _ in next(pages)] == ['c', 'a']
+            # Sessions updated mid-export are left for the export that resumes
+            clock[0] = 200.0
+            for sid in ('b', 'c'):
+                with store.session(sid) as session:
+                    session.turns = 5
+            rest = [key for page in pages for key, _ in page]
+            assert [sid for _, sid in rest] == ['d', 'e'], (backend, rest)
+            resumed = [(key[1], s['turns']) for page in store.export(rest[-1]) for key, s in page]
+            assert resumed == [('b', 5), ('c', 5)], (backend, resumed)
+            scams = [key[1] for page in store.export((101.0, 'a'), scam_only=True) for key, _ in page]
+            assert scams == ['e', 'b', 'c'], (backend, scams)
+    
+    # A resumed page reads only the sessions after its cursor, not the whole store
+    clock = [0.0]
+    store = SessionStore(max_sessions=20000, ttl_seconds=0, clock=lambda: clock[0])
+    for n in range(20000):
+        clock[0] = float(n)
+        with store.session(f"s{n}"):
+            pass
+    start = time.perf_counter()
+    for _ in range(1000):
+        tail = [key for page in store.export((19997.0, 's19997')) for key, _ in page]
+    assert tail == [(19998.0, 's19998'), (19999.0, 's19999')] and time.perf_counter() - start < 1.0
+    
+    # Over HTTP: stream the export, resume after our session, then fetch its report
+    key = {'x-api-key': 'hackathon_2024_ai_honeypot_secure_key'}
+    sid = f"export-{time.time()}"
+    requests.post(f"{BASE_URL}/api/analyze/batch", headers=key, json=[{
+        'sessionId': sid, 'message': {'text': "URGENT: account blocked, pay to refund@ybl now"}}])
+    since = time.time() - 60
+    response = requests.get(f"{BASE_URL}/api/sessions/export", headers=key, stream=True,
+                            params={'scam_only': '1', 'updated_since': since})
+    lines = [json.loads(line) for line in response.iter_lines() if line]
+    trailer = lines.pop()
+    ours = [line for line in lines if line['id'] == sid]
+    assert trailer['complete'] and trailer['exported'] == len(lines) and len(ours) == 1
+    assert ours[0]['intel']['upiIds'] == {'refund@ybl': 1}
+    rest = requests.get(f"{BASE_URL}/api/sessions/export", headers=key, params={'cursor': ours[0]['cursor']})
+    assert sid not in rest.text
+    assert requests.get(f"{BASE_URL}/api/sessions/export").status_code == 401
+    assert requests.get(f"{BASE_URL}/api/sessions/export", headers=key, params={'cursor': 'x'}).status_code == 400
+    
+    report = requests.get(f"{BASE_URL}/api/session/{sid}/report")
+    print_response("Session Report", report)
+    body = report.json()
+    return (report.status_code == 200 and body['extracted_intelligence']['upi_ids'] == ['refund@ybl']
+            and body['summary']['scam_type'] is not None)
+
+def test_concurrent_session_turns():
+    """Test 21: Many threads on a few sessions: no lost turns, no torn reads, busy sessions survive eviction"""
+    import sys
+    from session_store import SessionStore
+    
+    store = SessionStore(max_sessions=1000, ttl_seconds=0, max_messages=10 ** 6, lock_stripes=8)
+    sessions = [f"hot-{n}" for n in range(4)]
+    threads, turns_per_thread = 16, 200
+    errors = []
+    
+    def turn(sid: str, n: int):
+        with store.session(sid) as session:
+            session.turns += 1
+            session.add_message('scammer', f"turn {session.turns} from {n}")
+            time.sleep(0)  # invite a thread switch mid-turn
+            session.add_message('user', f"reply to turn {session.turns}")
+            session.add_intel('upiIds', f"{sid}-{n}@ybl", session.turns)
+    
+    def worker(n: int):
+        try:
+            for i in range(turns_per_thread):
+                turn(sessions[(n + i) % len(sessions)], n)
+        except Exception as e:
+            errors.append(e)
+    
+    def reader():
+        while any(t.is_alive() for t in pool):
+            for sid in sessions:
+                snapshot = store.get(sid)
+                if snapshot is not None and len(snapshot['messages']) != 2 * snapshot['turns']:
+                    errors.append(AssertionError(f"torn read of {sid}"))
+    
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-5)
+    try:
+        pool = [threading.Thread(target=worker, args=(n,)) for n in range(threads)]
+        watcher = threading.Thread(target=reader)
+        for t in pool:
+            t.start()
+        watcher.start()
+        for t in pool + [watcher]:
+            t.join()
+    finally:
+        sys.setswitchinterval(interval)
+    assert not errors, errors[:3]
+    
+    total = 0
+    for sid in sessions:
+        snapshot = store.get(sid)
+        total += snapshot['turns']
+        texts = [m['text'] for m in snapshot['messages']]
+        # Every reply follows its own scammer message and turn numbers never repeat
+        for number, (asked, replied) in enumerate(zip(texts[::2], texts[1::2]), 1):
+            assert asked.startswith(f"turn {number} ") and replied == f"reply to turn {number}", (sid, number)
+        assert len(snapshot['intel']['upiIds']) == threads
+    assert total == threads * turns_per_thread
+    
+    # A session mid-turn is not evicted, even when LRU pressure says it should be
+    small = SessionStore(max_sessions=2, ttl_seconds=0)
+    inside, release = threading.Event(), threading.Event()
+    
+    def slow_turn():
+        with small.session('busy') as session:
+            session.turns += 1
+            inside.set()
+            release.wait(5)
+    
+    holder = threading.Thread(target=slow_turn)
+    holder.start()
+    inside.wait(5)
+    # Stripes are picked by str hash, which varies per run; skip ids that would wait on busy's stripe
+    churn = [sid for sid in (f"churn-{n}" for n in range(50))
+             if small._stripes.lock(sid) is not small._stripes.lock('busy')][:5]
+    for sid in churn:
+        with small.session(sid) as session:
+            session.turns += 1
+    release.set()
+    holder.join()
+    return small.get('busy') is not None and small.get('busy')['turns'] == 1
+
+def test_regex_hardening():
+    """Test 22: Hardened scanning matches legacy on normal text and stays fast on crafted input"""
+    from app import HoneyPotAgent, ScamDetector
+    from safe_regex import scan_chunks
+    
+    legacy, hardened = HoneyPotAgent(hardened=False), HoneyPotAgent(hardened=True, chunk_chars=64)
+    thread = " ".join([
+        "URGENT: SBI account blocked, pay to verify@ybl or call +91 98765-43210.",
+        "Visit http://sbi-kyc.in/verify?id=1 now.",
+        "Send Rs 5000 to account 123456789012 IFSC SBIN0001234 today.",
+    ] * 20)
+    assert list(hardened.scan_entities(thread)) == list(legacy.scan_entities(thread))
+    # Pieces cover the text exactly
+    assert "".join(piece for _, piece in scan_chunks(thread, 64)) == thread
+    
+    start = time.perf_counter()
+    assert HoneyPotAgent(hardened=True).extract_intelligence("a." * 20000 + "@")['upiIds'] == []
+    elapsed = time.perf_counter() - start
+    assert elapsed < 0.5, f"crafted input took {elapsed:.2f}s"
+    
+    # A malformed bracketed host is kept as written instead of failing the turn
+    malformed = "URGENT: account blocked, verify at http://[abc now or pay to fix@ybl"
+    for agent in (legacy, hardened):
+        intel = agent.extract_intelligence(malformed)
+        assert intel['phishingLinks'] == ['http://[abc'] and intel['upiIds'] == ['fix@ybl'], intel
+    
+    # Category regexes still fire deep inside a long body
+    detector = ScamDetector(hardened=True, chunk_chars=64)
+    body = ("hello there " * 50 + "your account is blocked").lower()
+    return detector.match_categories(body, ScamDetector.matcher()) == \
+        ScamDetector(hardened=False).match_categories(body, ScamDetector.matcher())
+
+def test_lookalike_domains():
+    """Test 23: Lookalike brand domains are flagged, scored and recorded as intel; real domains are not"""
+    from app import HoneyPotAgent, ScamDetector
+    from lookalike import BrandIndex
+    
+    index = BrandIndex(['sbi.co.in', 'amazon.in', 'hdfcbank.com', 'paytm'])
+    expected = {
+        'http://sbi-secure-verify.com/login': ('sbi', 'contains'),
+        'http://sbi.kyc-update.in': ('sbi', 'contains'),
+        'https://amaz0n.in/refund': ('amazon', 'homoglyph'),
+        'http://xn--mazon-3ve.in': ('amazon', 'homoglyph'),
+        'http://secure.hdfcbamk.com': ('hdfcbank', 'typo'),
+        'http://amazon.xyz': ('amazon', 'tld'),
+        'http://paytmkyc.in': ('paytm', 'contains'),
+    }
+    for url, (brand, kind) in expected.items():
+        match = index.check(url)
+        assert match is not None and (match.brand, match.kind) == (brand, kind), (url, match)
+    for url in ('https://sbi.co.in/x', 'https://www.amazon.in', 'http://paytm.com', 'http://google.com',
+                'http://uidai.gov.in', 'http://10.0.0.1/a'):
+        assert index.check(url) is None, url
+    assert index.check('http://xn--mazon-3ve.in').domain == 'xn--mazon-3ve.in'
+    
+    # Brands' other official domains and sites that merely use a generic keyword are not lookalikes
+    shipped = ScamDetector.matcher().brand_index
+    for domain in ('amazon.co.uk', 'amazon.de', 'amazonaws.com', 'amazonpay.in', 'paytmbank.com', 'paytm.me',
+                   'kotaksecurities.com', 'onlinesbi.com', 'sbi.com', 'irctc.com', 'phonepe.co.in',
+                   'flipkartwholesale.com', 'deliveryhero.com', 'deliverr.com', 'governmentjobs.com'):
+        assert shipped.check(f"https://{domain}/") is None, (domain, shipped.check(f"https://{domain}/"))
+    assert shipped.check('http://delivery-update.in').brand == 'delivery'
+    # A lookalike link alone doesn't make a scam; it adds to other evidence
+    detector = ScamDetector()
+    assert not detector.is_scam("Your contract note is ready at https://www.kotaksecurities.com/notes")
+    assert not detector.is_scam("Statement ready at https://hdfcbamk-login.com")
+    assert detector.is_scam("Urgent: statement ready at https://hdfcbamk-login.com")
+    
+    message = "Your KYC is pending, update at http://sbi-secure-verify.com today"
+    hits = ScamDetector().match_categories(message)
+    intel = HoneyPotAgent().extract_intelligence(message)
+    return 'lookalike' in hits and intel['lookalikeDomains'] == ['sbi-secure-verify.com'] and \
+        'lookalike' not in ScamDetector().match_categories("Pay at https://www.onlinesbi.sbi")
+
+def test_campaigns():
+    """Test 24: Template variants share a campaign, confident campaigns skip scoring, idle ones age out"""
+    from campaigns import CampaignIndex
+    
+    now = [1000.0]
+    index = CampaignIndex(max_campaigns=100, max_age_seconds=60, confident_size=3, clock=lambda: now[0])
+    template = "Dear {}, your SBI account is BLOCKED. Update KYC at http://sbi-kyc{}.in or call {} now"
+    variants = [index.assign(template.format(name, n, 9876543200 + n))
+                for n, name in enumerate(['Ravi', 'Priya', 'Amit', 'Sunita'])]
+    other = index.assign("Congratulations! You won Rs 25,00,000 in the lottery. Share your PAN to claim")
+    assert len({c.id for c in variants}) == 1 and other.id != variants[0].id, [c.id for c in variants]
+    
+    rules, categories = object(), {'kyc': 0.3, 'url': 0.2}
+    for _ in range(2):
+        index.record(variants[0], rules, 0.5, True, categories)
+    assert index.verdict(variants[0], rules, categories) is None
+    index.record(variants[0], rules, 0.5, True, categories)
+    assert index.verdict(variants[0], rules, categories) == (0.5, True)
+    assert index.verdict(variants[0], object(), categories) is None
+    # A member whose keyword, link or number hits differ is scored
+    assert index.verdict(variants[0], rules, {'kyc': 0.3, 'url': 0.2, 'lookalike': 0.05}) is None
+    # Every recheck_every-th reusable member is scored too, so votes keep coming in
+    reused = [index.verdict(variants[0], rules, categories) for _ in range(18)]
+    assert reused.count(None) == 1 and reused[8] is None and index.stats()['rechecks'] == 1
+    
+    # A confidently benign campaign reuses its verdict only for members that hit the same categories
+    from app import campaign_index, score_message
+    tag = ''.join(chr(97 + int(d)) for d in str(int(time.time())))
+    benign = ("Hi {}, your monthly statement " + tag + " for the savings plan is ready to view at {} whenever "
+              "you like. You can also download it from the app later this week. Thanks and have a nice day")
+    scored = [score_message(benign.format(name, f"https://www.example.org/statements/{n}"))
+              for n, name in enumerate(['Ravi', 'Priya', 'Amit', 'Sunita', 'Neha', 'Arjun'])]
+    assert not any(s['is_scam'] for s in scored) and len({s['campaign'] for s in scored}) == 1
+    assert campaign_index.stats()['short_circuits'] >= 1
+    reused = campaign_index.stats()['short_circuits']
+    # A scam suffix joins the campaign but hits new keywords, so it is scored in full
+    suffixed = score_message(benign.format('Ravi', "https://www.example.org/statements/0") + " urgent verify otp blocked")
+    assert suffixed['campaign'] == scored[0]['campaign'] and suffixed['is_scam'], suffixed
+    # Identical to the first member once links are masked, but the lookalike link is a new hit
+    phish = score_message(benign.format('Ravi', 'https://hdfcbamk-login.com'))
+    assert phish['campaign'] == scored[0]['campaign'] and phish['score'] > scored[0]['score'], phish
+    assert campaign_index.stats()['short_circuits'] == reused
+    
+    now[0] += 61
+    index.assign("Hi, running late, will be there by 7")
+    assert len(index) == 1 and index.stats()['evicted'] == 2
+    
+    message = "URGENT: your electricity connection will be cut tonight. Pay the pending bill at {} to 98{}"
+    for n in range(3):
+        requests.post(f"{BASE_URL}/api/analyze/batch", json=[{
+            "sessionId": f"test_campaign_{n}_{int(time.time())}",
+            "message": message.format(f"http://power-bill{n}.in", 76543210 + n)
+        }])
+    payload = requests.get(f"{BASE_URL}/api/campaigns", params={'limit': 100}).json()
+    print(f"\n{'='*60}\nTEST: Campaigns\n{'='*60}")
+    print(f"Stats: { {k: v for k, v in payload.items() if k != 'campaigns'} }")
+    found = [c for c in payload['campaigns'] if 'electricity connection' in c['sample']]
+    assert found and found[0]['size'] >= 3 and found[0]['verdict'] == 'scam', found
+    return 'phishingLinks' in found[0]['shared_intel'] and found[0]['sessions'] >= 3
+
 def run_all_tests():
     """Run all test cases"""
     print("\n")
@@ -133,6 +923,23 @@ def run_all_tests():
         ("Legitimate Message", test_legitimate_message),
         ("Multi-turn Conversation", test_conversation_flow),
         ("Session Retrieval", test_session_retrieval),
+        ("Batched Analysis", test_batch_analyze),
+        ("Callback Dispatcher", test_callback_dispatcher),
+        ("ASGI Contract", test_asgi_contract),
+        ("Prometheus Metrics", test_metrics_endpoint),
+        ("ML Scorer", test_ml_scorer),
+        ("Verdict Cache", test_verdict_cache),
+        ("Intel Index", test_intel_index),
+        ("Journal Recovery", test_journal_recovery),
+        ("Rules Hot Reload", test_rules_reload),
+        ("Rate Limits", test_rate_limits),
+        ("Session Model", test_session_model),
+        ("App Factory", test_app_factory),
+        ("Session Export", test_session_export),
+        ("Concurrent Session Turns", test_concurrent_session_turns),
+        ("Regex Hardening", test_regex_hardening),
+        ("Lookalike Domains", test_lookalike_domains),
+        ("Campaigns", test_campaigns),
         ("Statistics", test_stats)
     ]
     
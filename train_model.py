@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+Train the optional ML scorer (see ml_scorer.py) from a labeled JSONL corpus.
+
+Each line is one message:
+
+    {"text": "Your SBI account is blocked, share OTP now", "label": 1}
+    {"text": "Running a bit late, save me a seat", "label": "benign"}
+
+"text" may also be "message"; "label" accepts 1/0, true/false or
+"scam"/"benign". A logistic regression over hashed character n-grams is fit
+with full-batch gradient descent, the decision threshold is picked on a
+held-out split, and the model is written as <out>.npy + <out>.json:
+
+    python train_model.py data/labeled.jsonl --out models/scam_model
+    SCORER_MODE=blend ML_MODEL_PATH=models/scam_model python app.py
+"""
+
+import argparse
+import json
+import random
+import sys
+from typing import List, Tuple
+
+import numpy as np
+
+from ml_scorer import HashedNgramFeaturizer, LinearModel
+
+SCAM_LABELS = {'1', 'true', 'scam', 'spam', 'fraud'}
+
+
+def load_corpus(path: str) -> Tuple[List[str], List[int]]:
+    texts, labels = [], []
+    with open(path, encoding='utf-8') as f:
+        for line_no, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            row = json.loads(line)
+            text = row.get('text') or row.get('message')
+            if not isinstance(text, str) or 'label' not in row:
+                print(f"skipping line {line_no}: needs 'text' and 'label'", file=sys.stderr)
+                continue
+            texts.append(text)
+            labels.append(1 if str(row['label']).strip().lower() in SCAM_LABELS else 0)
+    return texts, labels
+
+
+def fit(featurizer: HashedNgramFeaturizer, texts: List[str], labels: List[int],
+        epochs: int, learning_rate: float, l2: float) -> Tuple[np.ndarray, float]:
+    rows, columns, values = featurizer.transform(texts)
+    y = np.asarray(labels, dtype=np.float64)
+    n = len(texts)
+    weights = np.zeros(1 << featurizer.bits, dtype=np.float64)
+    bias = 0.0
+    for _ in range(epochs):
+        logits = np.bincount(rows, weights=weights[columns] * values, minlength=n) + bias
+        error = 1.0 / (1.0 + np.exp(-logits)) - y
+        gradient = np.bincount(columns, weights=error[rows] * values, minlength=len(weights)) / n
+        weights -= learning_rate * (gradient + l2 * weights)
+        bias -= learning_rate * error.mean()
+    return weights.astype(np.float32), bias
+
+
+def best_threshold(probabilities: np.ndarray, labels: np.ndarray) -> Tuple[float, float]:
+    """Threshold maximizing F1 on the given split; returns (threshold, f1)."""
+    best = (0.5, -1.0)
+    for threshold in np.linspace(0.05, 0.95, 91):
+        predicted = probabilities >= threshold
+        tp = int(np.sum(predicted & (labels == 1)))
+        fp = int(np.sum(predicted & (labels == 0)))
+        fn = int(np.sum(~predicted & (labels == 1)))
+        f1 = 2 * tp / (2 * tp + fp + fn) if tp else 0.0
+        if f1 > best[1]:
+            best = (float(threshold), f1)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('corpus', help='labeled JSONL file')
+    parser.add_argument('--out', default='models/scam_model', help='output path without extension')
+    parser.add_argument('--bits', type=int, default=18, help='hash space is 2**bits weights')
+    parser.add_argument('--ngram-min', type=int, default=2)
+    parser.add_argument('--ngram-max', type=int, default=4)
+    parser.add_argument('--epochs', type=int, default=300)
+    parser.add_argument('--learning-rate', type=float, default=2.0)
+    parser.add_argument('--l2', type=float, default=1e-4)
+    parser.add_argument('--holdout', type=float, default=0.2, help='fraction held out to pick the threshold')
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    texts, labels = load_corpus(args.corpus)
+    if len(set(labels)) < 2:
+        sys.exit("corpus needs both scam and benign examples")
+
+    order = list(range(len(texts)))
+    random.Random(args.seed).shuffle(order)
+    cut = int(len(order) * (1 - args.holdout)) if len(order) > 10 else len(order)
+    train, held = order[:cut], order[cut:] or order
+
+    featurizer = HashedNgramFeaturizer(args.bits, (args.ngram_min, args.ngram_max))
+    weights, bias = fit(featurizer, [texts[i] for i in train], [labels[i] for i in train],
+                        args.epochs, args.learning_rate, args.l2)
+    model = LinearModel(weights, bias, 0.5, featurizer)
+
+    held_labels = np.asarray([labels[i] for i in held])
+    probabilities = model.predict_proba([texts[i] for i in held])
+    model.threshold, f1 = best_threshold(probabilities, held_labels)
+    accuracy = float(np.mean((probabilities >= model.threshold) == (held_labels == 1)))
+
+    model.save(args.out, trained_on=len(train), held_out=len(held),
+               holdout_accuracy=round(accuracy, 4), holdout_f1=round(f1, 4))
+    print(f"trained on {len(train)} messages, held out {len(held)}: "
+          f"accuracy={accuracy:.3f} f1={f1:.3f} threshold={model.threshold:.2f}")
+    print(f"wrote {args.out}.npy and {args.out}.json")
+
+
+if __name__ == '__main__':
+    main()
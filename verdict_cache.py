@@ -0,0 +1,176 @@
+"""
+Verdict cache for the analyze pipeline.
+
+Scam campaigns send the same templated text to thousands of numbers, so
+most messages have been scored before. Two bounded LRU maps sit in front
+of the detector and the intel extractor:
+
+- category hits, keyed on the normalized message (case-folded,
+  whitespace-collapsed, digits masked to 0). The pipeline always scores the
+  normalized form, so a hit returns exactly what a miss would compute.
+- extracted intel, keyed on the exact message, since phone numbers, UPI
+  ids and links differ between otherwise identical blasts.
+
+Both depend on the rule set (intel through its brand index for lookalike
+domains), so both are dropped when the rules change. A result computed
+under rules that were replaced while it ran is returned but not stored.
+
+Each lookup is also counted against a template hash (normalized text with
+URLs and digit runs masked), which groups a campaign's variants together.
+Cached values are shared between requests and must be treated as read-only.
+"""
+
+import hashlib
+import re
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List
+
+WHITESPACE = re.compile(r'\s+')
+DIGIT = re.compile(r'\d')
+URL = re.compile(r'http[s]?://\S+')
+DIGIT_RUN = re.compile(r'0+')
+
+
+class LRUCache:
+    """Thread-safe bounded mapping; max_entries=0 disables storage."""
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            value = self._data.get(key, default)
+            if value is not default:
+                self._data.move_to_end(key)
+            return value
+
+    def put(self, key, value):
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def items(self) -> List:
+        with self._lock:
+            return list(self._data.items())
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+class VerdictCache:
+    def __init__(self, max_entries: int = 10000, max_text: int = 2000, mask_digits: bool = True):
+        self.max_text = max_text
+        self.mask_digits = mask_digits
+        self._categories = LRUCache(max_entries)
+        self._intel = LRUCache(max_entries)
+        # template hash -> [lookups, sample normalized text]
+        self._templates = LRUCache(max_entries)
+        self._version = None
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.intel_hits = 0
+        self.intel_misses = 0
+        self.invalidations = 0
+
+    def normalize(self, text: str) -> str:
+        key = WHITESPACE.sub(' ', text.casefold()).strip()
+        return DIGIT.sub('0', key) if self.mask_digits else key
+
+    @staticmethod
+    def template_of(normalized: str) -> str:
+        masked = DIGIT_RUN.sub('#', URL.sub('<url>', DIGIT.sub('0', normalized)))
+        return hashlib.blake2b(masked.encode('utf-8'), digest_size=8).hexdigest()
+
+    def invalidate(self, version: Any = None):
+        """Drop cached verdicts and intel, e.g. after SCAM_PATTERNS or the brand list changes."""
+        with self._lock:
+            if self._version is not None:
+                self.invalidations += 1
+            self._version = version
+            self._categories.clear()
+            self._intel.clear()
+
+    def categories(self, text: str, version: Any, compute: Callable[[str], Dict[str, float]]) -> Dict[str, float]:
+        """Category hits for text; version identifies the pattern set that compute() uses."""
+        if version is not self._version:
+            self.invalidate(version)
+        normalized = self.normalize(text)
+        if len(normalized) > self.max_text:
+            return compute(normalized)
+
+        self._count_template(normalized)
+        cached = self._categories.get(normalized)
+        if cached is not None:
+            with self._lock:
+                self.hits += 1
+            return cached
+        with self._lock:
+            self.misses += 1
+        result = compute(normalized)
+        self._store(self._categories, normalized, result, version)
+        return result
+
+    def intel(self, text: str, version: Any, compute: Callable[[str], Dict[str, List[str]]]) -> Dict[str, List[str]]:
+        """Extracted intel for text; version identifies the rule set that compute() uses."""
+        if version is not self._version:
+            self.invalidate(version)
+        if len(text) > self.max_text:
+            return compute(text)
+        cached = self._intel.get(text)
+        if cached is not None:
+            with self._lock:
+                self.intel_hits += 1
+            return cached
+        with self._lock:
+            self.intel_misses += 1
+        result = compute(text)
+        self._store(self._intel, text, result, version)
+        return result
+
+    def _store(self, cache: LRUCache, key: str, result, version: Any):
+        # Checked under the lock invalidate() clears with, so a stale result can't land after the clear
+        with self._lock:
+            if version is self._version:
+                cache.put(key, result)
+
+    def _count_template(self, normalized: str):
+        template = self.template_of(normalized)
+        entry = self._templates.get(template)
+        if entry is None:
+            self._templates.put(template, [1, normalized[:120]])
+        else:
+            with self._lock:
+                entry[0] += 1
+
+    def top_templates(self, limit: int = 10) -> List[Dict]:
+        """Most frequently seen templates among those still tracked."""
+        entries = self._templates.items()
+        entries.sort(key=lambda item: item[1][0], reverse=True)
+        return [{'template': template, 'hits': hits, 'sample': sample}
+                for template, (hits, sample) in entries[:limit]]
+
+    def stats(self) -> Dict:
+        lookups = self.hits + self.misses
+        return {
+            'entries': len(self._categories),
+            'intel_entries': len(self._intel),
+            'templates': len(self._templates),
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+            'intel_hits': self.intel_hits,
+            'intel_misses': self.intel_misses,
+            'invalidations': self.invalidations
+        }